@@ -233,6 +233,16 @@ class GCToo(object):
         self.multi_index_cov_df = pd.DataFrame(data=self.cov_df.values, index=row_index, columns=col_index)
 
 
+def make_missing_plane_df(index, columns):
+    """
+    Makes the all-NaN float32 DataFrame that stands in for a data plane (meth_df or
+    cov_df) that was not read. Its values are a single NaN broadcast to the full
+    shape, so it takes no memory whatever its size; it is read-only.
+    """
+    values = np.broadcast_to(np.float32(np.nan), (len(index), len(columns)))
+    return pd.DataFrame(values, index=index, columns=columns, copy=False)
+
+
 def multi_index_df_to_component_dfs(multi_index_df, rid="rid", cid="cid"):
     """ Convert a multi-index df into 3 component dfs. """
 
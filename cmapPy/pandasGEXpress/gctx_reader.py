@@ -0,0 +1,186 @@
+"""
+gctx_reader.py
+
+Reusable reader for .gctx files that are sliced many times. A GCTXReader parses
+the row and column metadata of its file once and keeps them, with their
+id-to-position lookups, so each slice only reads the requested data. The open
+HDF5 handles are shared through a process-wide pool (handle_pool) that keeps
+at most max_open_files of them open, closing the least recently used first.
+
+ex:
+    reader = gctx_reader.GCTXReader("big.gctx")
+    for (rids, cids) in requests:
+        my_gctoo = reader.slice(rid=rids, cid=cids)
+
+N.B. The reader assumes its file is not rewritten while it is in use.
+"""
+import logging
+import os
+import threading
+import collections
+import h5py
+import numpy as np
+import cmapPy.pandasGEXpress.setup_GCToo_logger as setup_logger
+import cmapPy.pandasGEXpress.GCToo as GCToo
+import cmapPy.pandasGEXpress.parse_gctx as parse_gctx
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+# default number of .gctx files the handle pool keeps open at once
+max_open_files = 16
+
+
+class HandlePool(object):
+    """Process-wide LRU pool of read-only h5py File handles, keyed by path.
+
+    Handles in use (acquired and not yet released) are never closed, so the pool
+    can briefly hold more than max_open handles when they are all in use.
+    """
+    def __init__(self, max_open=max_open_files):
+        self.max_open = max_open
+        self.handles = collections.OrderedDict()
+        self.in_use = collections.Counter()
+        self.lock = threading.Lock()
+
+    def acquire(self, path):
+        """ Returns an open handle on path; give it back with release(path). """
+        with self.lock:
+            if path in self.handles:
+                self.handles.move_to_end(path)
+            else:
+                self.handles[path] = h5py.File(path, "r")
+            self.in_use[path] += 1
+            self.evict()
+            return self.handles[path]
+
+    def release(self, path):
+        with self.lock:
+            self.in_use[path] -= 1
+            if self.in_use[path] <= 0:
+                del self.in_use[path]
+            self.evict()
+
+    def evict(self):
+        """ Closes least recently used handles that are not in use while more than max_open are open. """
+        for path in list(self.handles.keys()):
+            if len(self.handles) <= self.max_open:
+                break
+            if path not in self.in_use:
+                self.handles.pop(path).close()
+
+    def close(self, path=None):
+        """ Closes the handle on path, or all handles, that are not in use. """
+        with self.lock:
+            for open_path in list(self.handles.keys()):
+                if (path is None or open_path == path) and open_path not in self.in_use:
+                    self.handles.pop(open_path).close()
+
+    def __len__(self):
+        return len(self.handles)
+
+
+handle_pool = HandlePool()
+
+
+class GCTXReader(object):
+    """Slices a .gctx file repeatedly, reading its metadata only once."""
+    def __init__(self, file_path, convert_neg_666=False, row_meta_fields=None, col_meta_fields=None,
+                 categorical_meta_fields=None, n_threads=1, validate="full", pool=handle_pool,
+                 rdcc_nbytes=None, rdcc_nslots=None, rdcc_w0=None):
+        self.file_path = os.path.abspath(os.path.expanduser(file_path))
+        if not os.path.exists(self.file_path):
+            msg = "The given path to the gctx file cannot be found. full_path: {}".format(self.file_path)
+            logger.error(msg)
+            raise Exception("GCTXReader " + msg)
+        self.n_threads = n_threads
+        self.validate = validate
+        self.pool = pool
+        # chunk cache settings of each slice, see parse_gctx.open_data_dset
+        self.chunk_cache = (rdcc_nbytes, rdcc_nslots, rdcc_w0)
+
+        gctx_file = self.pool.acquire(self.file_path)
+        try:
+            self.row_metadata_df = parse_gctx.parse_metadata_df(
+                "row", gctx_file[parse_gctx.row_meta_group_node], convert_neg_666,
+                fields=row_meta_fields, categorical_fields=categorical_meta_fields)
+            self.col_metadata_df = parse_gctx.parse_metadata_df(
+                "col", gctx_file[parse_gctx.col_meta_group_node], convert_neg_666,
+                fields=col_meta_fields, categorical_fields=categorical_meta_fields)
+            version = gctx_file.attrs[parse_gctx.version_node]
+            self.version = version[0] if type(version) == np.ndarray else version
+        finally:
+            self.pool.release(self.file_path)
+
+        # build the id-to-position hashtables now rather than on the first slice
+        for meta_df in [self.row_metadata_df, self.col_metadata_df]:
+            meta_df.index.get_indexer(meta_df.index[:1])
+        logger.info("Opened GCTX reader: {}".format(self.file_path))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """ Closes the pooled handle on this file unless another reader is using it. """
+        self.pool.close(self.file_path)
+
+    @property
+    def shape(self):
+        return (self.row_metadata_df.shape[0], self.col_metadata_df.shape[0])
+
+    def slice(self, rid=None, cid=None, ridx=None, cidx=None, sort_row_meta=True, sort_col_meta=True,
+              layers=parse_gctx.data_layers):
+        """
+        Reads a subset of the file into a GCToo.
+
+        Input:
+            - rid (list of strings): row ids to keep. Default=None (all rows)
+            - cid (list of strings): col ids to keep. Default=None (all columns)
+            - ridx (list of integers): row positions to keep, instead of rid. Default=None
+            - cidx (list of integers): col positions to keep, instead of cid. Default=None
+            - sort_row_meta (bool): whether rows are returned in file order (True) or in
+                the order requested (False). Default=True
+            - sort_col_meta (bool): as sort_row_meta, for columns. Default=True
+            - layers (str or tuple of str): planes of the data matrix to read, "meth", "cov"
+                or both; see parse_gctx.parse. Default = both
+        Output:
+            - my_gctoo (GCToo)
+        """
+        out_ridx = self.get_positions(self.row_metadata_df, rid, ridx, sort_row_meta)
+        out_cidx = self.get_positions(self.col_metadata_df, cid, cidx, sort_col_meta)
+
+        gctx_file = self.pool.acquire(self.file_path)
+        try:
+            data_dset = parse_gctx.open_data_dset(gctx_file, out_ridx, out_cidx, *self.chunk_cache)
+            (meth_df, cov_df) = parse_gctx.parse_data_df(
+                data_dset, out_ridx, out_cidx, self.row_metadata_df,
+                self.col_metadata_df, n_threads=self.n_threads, validate=self.validate,
+                layers=layers)
+        finally:
+            self.pool.release(self.file_path)
+
+        return GCToo.GCToo(meth_df=meth_df, cov_df=cov_df,
+                           row_metadata_df=self.row_metadata_df.iloc[out_ridx],
+                           col_metadata_df=self.col_metadata_df.iloc[out_cidx],
+                           src=self.file_path, version=self.version)
+
+    @staticmethod
+    def get_positions(meta_df, ids, idx, sort_idx):
+        """ Positions of ids (or idx) in meta_df, found with its cached index hashtable. """
+        (id_type, id_list) = parse_gctx.check_id_idx_exclusivity(ids, idx)
+        if id_type is None:
+            return list(range(meta_df.shape[0]))
+        if id_type == "id":
+            id_list = parse_gctx.convert_ids_to_meta_type(id_list, meta_df)
+            positions = meta_df.index.get_indexer(id_list)
+            if (positions < 0).any():
+                # raises, listing the ids not found
+                parse_gctx.check_id_validity(id_list, meta_df)
+        else:
+            parse_gctx.check_idx_validity(id_list, meta_df, True)
+            positions = np.asarray(id_list, dtype=np.int64)
+        if sort_idx:
+            positions = np.sort(positions)
+        return list(positions)
@@ -0,0 +1,321 @@
+"""
+gctx_writer.py
+
+Incremental writer for .gctx files. GCTXWriter creates (or reopens) a .gctx whose
+data matrix and metadata datasets are resizable, and appends new columns (samples)
+or rows to it, writing only the new data. Files it writes are regular GCTX files
+that parse_gctx.parse can read.
+
+ex:
+    with gctx_writer.GCTXWriter("project.gctx", access_pattern="by-sample") as writer:
+        for plate in plates:
+            writer.append_columns(plate.meth_df, plate.cov_df, plate.col_metadata_df)
+
+N.B. Files written by write_gctx.write have fixed-size datasets and cannot be appended to.
+"""
+import logging
+import os
+import h5py
+import numpy
+import pandas as pd
+import cmapPy.pandasGEXpress.setup_GCToo_logger as setup_logger
+import cmapPy.pandasGEXpress.write_gctx as write_gctx
+import cmapPy.pandasGEXpress.index_gctx as index_gctx
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+# CMap null value used for metadata fields missing from an appended block
+metadata_null = "-666"
+
+# string metadata datasets are padded to a power-of-two width of at least this many bytes, so that
+# appending longer strings only rarely (log2 of the longest string times) rewrites a dataset
+min_string_itemsize = 16
+
+
+class GCTXWriter(object):
+    """Appends columns or rows to a .gctx file with resizable datasets."""
+    def __init__(self, file_path, access_pattern="default", max_chunk_kb=1024, matrix_dtype=numpy.float32,
+                 data_compression="gzip", data_shuffle=True, gzip_compression_level=6, cov_dtype=None,
+                 id_index=True):
+        self.file_path = write_gctx.add_gctx_to_out_name(file_path)
+        self.access_pattern = access_pattern
+        self.max_chunk_kb = max_chunk_kb
+        self.matrix_dtype = matrix_dtype
+        self.data_compression = data_compression
+        self.data_shuffle = data_shuffle
+        self.gzip_compression_level = gzip_compression_level
+        self.cov_dtype = cov_dtype
+        self.id_index = id_index
+        if cov_dtype is not None:
+            write_gctx.check_cov_dtype(cov_dtype)
+        if access_pattern == "contiguous":
+            msg = "access_pattern 'contiguous' cannot be used, since appending requires a chunked data matrix"
+            logger.error(msg)
+            raise Exception("GCTXWriter " + msg)
+
+        if os.path.exists(self.file_path):
+            self.hdf5_file = h5py.File(self.file_path, "r+")
+            # the layout of an existing file wins over cov_dtype
+            if write_gctx.cov_matrix_node in self.hdf5_file:
+                self.cov_dtype = self.hdf5_file[write_gctx.cov_matrix_node].dtype.type
+            elif write_gctx.data_matrix_node in self.hdf5_file:
+                self.cov_dtype = None
+            if write_gctx.data_matrix_node in self.hdf5_file:
+                maxshape = self.hdf5_file[write_gctx.data_matrix_node].maxshape
+                if maxshape[-1] is not None or maxshape[-2] is not None:
+                    self.hdf5_file.close()
+                    msg = ("the data matrix of {} is not resizable; only files created by GCTXWriter " +
+                           "can be appended to").format(self.file_path)
+                    logger.error(msg)
+                    raise Exception("GCTXWriter " + msg)
+            logger.info("Appending to GCTX: {}".format(self.file_path))
+        else:
+            self.hdf5_file = h5py.File(self.file_path, "w")
+            write_gctx.write_version(self.hdf5_file)
+            self.hdf5_file.attrs[write_gctx.src_attr] = self.file_path
+            logger.info("Creating GCTX: {}".format(self.file_path))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        # appends leave the id index behind the ids, so it is rebuilt once here
+        if self.id_index and write_gctx.data_matrix_node in self.hdf5_file:
+            for dim in ["row", "col"]:
+                if not index_gctx.has_index(self.hdf5_file, dim):
+                    index_gctx.write_index(self.hdf5_file, dim, gzip_compression=self.gzip_compression_level)
+        self.hdf5_file.close()
+
+    @property
+    def shape(self):
+        """ (number of rows, number of columns) written so far. """
+        if write_gctx.data_matrix_node not in self.hdf5_file:
+            return (0, 0)
+        data_shape = self.hdf5_file[write_gctx.data_matrix_node].shape
+        return (data_shape[-1], data_shape[-2])
+
+    def read_ids(self, dim):
+        """ Returns the ids written so far for dim ("row" or "col") as a pandas Index of str. """
+        node = (write_gctx.row_meta_group_node if dim == "row" else write_gctx.col_meta_group_node) + "/id"
+        if node not in self.hdf5_file:
+            return pd.Index([], dtype=str)
+        return pd.Index(self.hdf5_file[node][...].astype(str))
+
+    def append_columns(self, meth_df, cov_df, col_metadata_df=None, row_metadata_df=None):
+        """
+        Appends columns (samples) to the file.
+
+        Input:
+            - meth_df (pandas DataFrame): methylation values of the new columns; its rows must be
+                the rids already in the file (in any order)
+            - cov_df (pandas DataFrame): coverage values, same index and columns as meth_df
+            - col_metadata_df (pandas DataFrame): metadata of the new columns. Default = ids only
+            - row_metadata_df (pandas DataFrame): row metadata; only used for the first block
+                written to a new file. Default = ids only
+        """
+        self.append(meth_df, cov_df, "col", col_metadata_df, row_metadata_df)
+
+    def append_rows(self, meth_df, cov_df, row_metadata_df=None, col_metadata_df=None):
+        """
+        Appends rows to the file.
+
+        Input:
+            - meth_df (pandas DataFrame): methylation values of the new rows; its columns must be
+                the cids already in the file (in any order)
+            - cov_df (pandas DataFrame): coverage values, same index and columns as meth_df
+            - row_metadata_df (pandas DataFrame): metadata of the new rows. Default = ids only
+            - col_metadata_df (pandas DataFrame): column metadata; only used for the first block
+                written to a new file. Default = ids only
+        """
+        self.append(meth_df, cov_df, "row", row_metadata_df, col_metadata_df)
+
+    def append(self, meth_df, cov_df, dim, new_metadata_df, other_metadata_df):
+        if not (meth_df.index.equals(cov_df.index) and meth_df.columns.equals(cov_df.columns)):
+            msg = "meth_df and cov_df must have the same index and columns"
+            logger.error(msg)
+            raise Exception("GCTXWriter.append " + msg)
+
+        if dim == "col":
+            (row_metadata_df, col_metadata_df) = (other_metadata_df, new_metadata_df)
+        else:
+            (row_metadata_df, col_metadata_df) = (new_metadata_df, other_metadata_df)
+        if row_metadata_df is None:
+            row_metadata_df = pd.DataFrame(index=meth_df.index)
+        if col_metadata_df is None:
+            col_metadata_df = pd.DataFrame(index=meth_df.columns)
+
+        if write_gctx.data_matrix_node not in self.hdf5_file:
+            self.create(meth_df, cov_df, row_metadata_df, col_metadata_df)
+            return
+
+        # line the fixed axis up with what is already in the file
+        (fixed_dim, fixed_axis) = ("row", 0) if dim == "col" else ("col", 1)
+        existing_fixed_ids = self.read_ids(fixed_dim)
+        block_fixed_ids = pd.Index([str(x) for x in meth_df.axes[fixed_axis]])
+        positions = block_fixed_ids.get_indexer(existing_fixed_ids)
+        if len(block_fixed_ids) != len(existing_fixed_ids) or numpy.any(positions < 0):
+            msg = "the {}s of the appended block must match the {} ids already in the file".format(
+                fixed_dim, fixed_dim)
+            logger.error(msg)
+            raise Exception("GCTXWriter.append " + msg)
+
+        new_ids = pd.Index([str(x) for x in meth_df.axes[1 - fixed_axis]])
+        duplicated_ids = new_ids.intersection(self.read_ids(dim))
+        if len(duplicated_ids) > 0 or not new_ids.is_unique:
+            msg = "the following {} ids are already in the file or repeated: {}".format(
+                dim, list(duplicated_ids) + list(new_ids[new_ids.duplicated()]))
+            logger.error(msg)
+            raise Exception("GCTXWriter.append " + msg)
+
+        (n_rows, n_cols) = self.shape
+        if dim == "col":
+            meth_values = meth_df.values[positions, :].transpose()
+            cov_values = cov_df.values[positions, :].transpose()
+            (axis, new_cells) = (1, (slice(n_cols, None), slice(None)))
+        else:
+            meth_values = meth_df.values[:, positions].transpose()
+            cov_values = cov_df.values[:, positions].transpose()
+            (axis, new_cells) = (2, (slice(None), slice(n_rows, None)))
+
+        plane_writes = self.get_plane_writes(meth_values, cov_values)
+        for dset in set(dset for (dset, _, _) in plane_writes):
+            dset.resize(dset.shape[axis] + len(new_ids), axis=axis)
+        for (dset, plane, values) in plane_writes:
+            dset[(plane,) + new_cells] = values
+
+        if dim == "col":
+            self.append_metadata("col", col_metadata_df.reindex(meth_df.columns))
+        else:
+            self.append_metadata("row", row_metadata_df.reindex(meth_df.index))
+
+        logger.info("Appended {} {}s to {}; shape is now {}".format(
+            len(new_ids), dim, self.file_path, self.shape))
+
+    def create(self, meth_df, cov_df, row_metadata_df, col_metadata_df):
+        """ Writes the first block, creating resizable data and metadata datasets. """
+        elem_per_kb = write_gctx.calculate_elem_per_kb(self.max_chunk_kb, self.matrix_dtype)
+
+        # both axes can grow, so chunks are sized as if neither was capped by this first block
+        elem_per_chunk = int(self.max_chunk_kb * elem_per_kb)
+        growth_shape = (max(meth_df.shape[0], elem_per_chunk), max(meth_df.shape[1], elem_per_chunk))
+        chunks = write_gctx.set_data_matrix_chunks(growth_shape, self.access_pattern,
+                                                   self.max_chunk_kb, elem_per_kb)
+
+        meth_values = meth_df.transpose().values
+        cov_values = cov_df.transpose().values
+        if self.cov_dtype is None:
+            merged_array = numpy.array([meth_values, cov_values])
+        else:
+            merged_array = numpy.array([meth_values])
+            write_gctx.create_data_matrix(self.hdf5_file, merged_array.shape, self.cov_dtype, chunks,
+                                          self.data_compression, self.gzip_compression_level, self.data_shuffle,
+                                          self.access_pattern, maxshape=(1, None, None),
+                                          data=numpy.array([write_gctx.encode_coverage(cov_values, self.cov_dtype)]),
+                                          node=write_gctx.cov_matrix_node)
+        write_gctx.create_data_matrix(self.hdf5_file, merged_array.shape, self.matrix_dtype, chunks,
+                                      self.data_compression, self.gzip_compression_level, self.data_shuffle,
+                                      self.access_pattern, data=merged_array,
+                                      maxshape=(merged_array.shape[0], None, None))
+
+        self.append_metadata("row", row_metadata_df.reindex(meth_df.index))
+        self.append_metadata("col", col_metadata_df.reindex(meth_df.columns))
+
+    def get_plane_writes(self, meth_values, cov_values):
+        """ (dataset, plane, values) triples that store meth_values and cov_values in this file's layout. """
+        data_dset = self.hdf5_file[write_gctx.data_matrix_node]
+        if self.cov_dtype is None:
+            return [(data_dset, 0, meth_values), (data_dset, 1, cov_values)]
+        cov_dset = self.hdf5_file[write_gctx.cov_matrix_node]
+        return [(data_dset, 0, meth_values), (cov_dset, 0, write_gctx.encode_coverage(cov_values, self.cov_dtype))]
+
+    def append_metadata(self, dim, metadata_df):
+        """
+        Appends metadata_df to the metadata datasets of dim. Fields missing from
+        metadata_df are filled with -666, and fields new to the file are back-filled
+        with -666 for the entries already written.
+        """
+        node = write_gctx.row_meta_group_node if dim == "row" else write_gctx.col_meta_group_node
+        group = self.hdf5_file.require_group(node)
+        n_existing = group["id"].shape[0] if "id" in group else 0
+        n_new = metadata_df.shape[0]
+
+        new_values = {"id": numpy.array([str(x) for x in metadata_df.index]).astype("S")}
+        for field in [entry for entry in metadata_df.columns if entry != "ind"]:
+            new_values[str(field)] = get_storage_array(metadata_df.loc[:, field])
+
+        for field in set(group.keys()) - set(new_values.keys()):
+            new_values[field] = get_null_array(group[field].dtype, n_new)
+
+        for (field, values) in new_values.items():
+            if field not in group:
+                # a new field only needs -666 (and so possibly a wider dtype) to back-fill entries
+                initial_values = get_null_array(values.dtype, n_existing) if n_existing > 0 else values[:0]
+                group.create_dataset(field, data=initial_values.astype(get_padded_dtype(initial_values.dtype)),
+                                     maxshape=(None,), chunks=True, compression=self.gzip_compression_level)
+            append_to_dataset(group, field, values, self.gzip_compression_level)
+
+
+def get_storage_array(series):
+    """ Converts a metadata column to the array stored in the file, as write_gctx.write_metadata does. """
+    values = numpy.array(series)
+    if values.dtype.type in (numpy.str_, numpy.object_):
+        return values.astype("S")
+    return values
+
+
+def get_null_array(dtype, n):
+    """
+    Array of n CMap null values (-666) of the given dtype, or of the narrowest wider dtype
+    that can hold -666 (e.g. int64 for uint32); append_to_dataset then widens the dataset.
+    """
+    if dtype.kind == "S":
+        return numpy.full(n, metadata_null, dtype="S" + str(max(dtype.itemsize, len(metadata_null))))
+    return numpy.full(n, -666, dtype=numpy.result_type(dtype, numpy.min_scalar_type(-666)))
+
+
+def get_padded_dtype(dtype):
+    """ Dtype a metadata dataset is stored with: strings are padded (see min_string_itemsize). """
+    if dtype.kind != "S":
+        return dtype
+    return numpy.dtype("S" + str(max(min_string_itemsize, 1 << (dtype.itemsize - 1).bit_length())))
+
+
+def append_to_dataset(group, field, values, gzip_compression_level):
+    """
+    Appends values to the resizable 1-D dataset group[field]. If the stored dtype
+    cannot hold the new values (strings longer than the padded width, floats into an
+    int field, strings into a numeric field), the dataset is rewritten with a wider
+    dtype first; each field can only be widened a few times.
+    """
+    dset = group[field]
+    old_dtype = dset.dtype
+    old_values = None
+    if old_dtype.kind == "S" and values.dtype.kind == "S":
+        if values.dtype.itemsize <= old_dtype.itemsize:
+            new_dtype = old_dtype
+        else:
+            new_dtype = get_padded_dtype(values.dtype)
+    elif old_dtype.kind == "S" or values.dtype.kind == "S":
+        # mixed strings and numbers: store everything as strings, as the GCT parser would see them
+        old_values = dset[...]
+        if old_dtype.kind != "S":
+            old_values = old_values.astype(str).astype("S")
+        if values.dtype.kind != "S":
+            values = values.astype(str).astype("S")
+        new_dtype = get_padded_dtype(numpy.dtype("S" + str(max(old_values.dtype.itemsize, values.dtype.itemsize))))
+    else:
+        new_dtype = numpy.result_type(old_dtype, values.dtype)
+
+    if new_dtype != old_dtype:
+        if old_values is None:
+            old_values = dset[...]
+        del group[field]
+        dset = group.create_dataset(field, data=old_values.astype(new_dtype), maxshape=(None,), chunks=True,
+                                    compression=gzip_compression_level)
+
+    n_existing = dset.shape[0]
+    dset.resize(n_existing + len(values), axis=0)
+    dset[n_existing:] = values.astype(new_dtype)
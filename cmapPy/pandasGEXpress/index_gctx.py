@@ -0,0 +1,145 @@
+"""
+Command-line script to add a persistent rid/cid index to an existing .gctx file.
+
+The index lets parse_gctx map a few ids to positions without reading and
+decoding every id in the file. For each dimension it stores, under
+/0/INDEX/ROW (or /0/INDEX/COL):
+    - sorted_id: the ids, sorted, in blocks of block_size
+    - position: position in the file of each entry of sorted_id
+    - fence: the first id of each block of sorted_id
+A lookup binary searches the (small) fence array, then reads only the blocks
+of sorted_id and position that can hold the requested ids, so looking up k
+ids costs O(k log n) comparisons and at most k block reads.
+
+write_gctx.write builds the index by default; this script adds (or rebuilds)
+it for files written without one.
+"""
+import sys
+import logging
+import argparse
+import h5py
+import numpy as np
+import cmapPy.pandasGEXpress.setup_GCToo_logger as setup_logger
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+id_nodes = {"row": "/0/META/ROW/id", "col": "/0/META/COL/id"}
+index_group_nodes = {"row": "/0/INDEX/ROW", "col": "/0/INDEX/COL"}
+sorted_id_name = "sorted_id"
+position_name = "position"
+fence_name = "fence"
+block_size_attr = "block_size"
+
+# number of ids per block of the index; one block is read per looked up id at most
+index_block_size = 4096
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    # required
+    parser.add_argument("-filename", "-f", required=True,
+                        help=".gctx file to add the index to; it is modified in place")
+    # optional
+    parser.add_argument("-dims", nargs="+", choices=["row", "col"], default=["row", "col"],
+                        help="which ids to index")
+    parser.add_argument("-verbose", "-v",
+                        help="Whether to print a bunch of output.", action="store_true", default=False)
+    return parser
+
+
+def main():
+    args = build_parser().parse_args(sys.argv[1:])
+    setup_logger.setup(verbose=args.verbose)
+    index_gctx_main(args)
+
+
+def index_gctx_main(args):
+    """ Separate from main() in order to make command-line tool. """
+    hdf5_file = h5py.File(args.filename, "r+")
+    for dim in args.dims:
+        write_index(hdf5_file, dim)
+        logger.info("Wrote {} id index of {}".format(dim, args.filename))
+    hdf5_file.close()
+
+
+def write_index(hdf5_file, dim, gzip_compression=6):
+    """
+    Builds the id index of dim from the ids stored in hdf5_file, replacing any
+    existing one.
+
+    Input:
+        - hdf5_file (h5py File): file open for writing
+        - dim (str): "row" or "col"
+        - gzip_compression (int): gzip level of the index datasets
+    """
+    ids = hdf5_file[id_nodes[dim]][...]
+    order = np.argsort(ids, kind="mergesort")
+    n_ids = len(ids)
+
+    if index_group_nodes[dim] in hdf5_file:
+        del hdf5_file[index_group_nodes[dim]]
+    group = hdf5_file.create_group(index_group_nodes[dim])
+
+    chunks = (min(index_block_size, n_ids),) if n_ids > 0 else None
+    group.create_dataset(sorted_id_name, data=ids[order], chunks=chunks,
+                         compression=gzip_compression if chunks else None)
+    group.create_dataset(position_name, data=order.astype(np.int64), chunks=chunks,
+                         compression=gzip_compression if chunks else None)
+    group.create_dataset(fence_name, data=ids[order][::index_block_size])
+    group.attrs[block_size_attr] = index_block_size
+
+
+def has_index(hdf5_file, dim):
+    """
+    Whether hdf5_file has an id index of dim that matches its ids. An index left
+    behind by a tool that added ids without updating it is not used.
+    """
+    if index_group_nodes[dim] not in hdf5_file:
+        return False
+    return hdf5_file[index_group_nodes[dim]][position_name].shape == hdf5_file[id_nodes[dim]].shape
+
+
+def lookup_positions(hdf5_file, dim, ids):
+    """
+    Finds the positions of ids in the file using the id index.
+
+    Input:
+        - hdf5_file (h5py File): open file with an index of dim (see has_index)
+        - dim (str): "row" or "col"
+        - ids (list): ids to look up
+    Output:
+        - positions (numpy array of int64): position of each id, in the order of ids;
+            -1 for ids that are not in the file
+    """
+    group = hdf5_file[index_group_nodes[dim]]
+    block_size = int(group.attrs[block_size_attr])
+    sorted_id_dset = group[sorted_id_name]
+    position_dset = group[position_name]
+
+    query = np.array([str(x) for x in ids]).astype("S")
+    positions = np.full(len(query), -1, dtype=np.int64)
+    if len(query) == 0 or sorted_id_dset.shape[0] == 0:
+        return positions
+
+    # block that would hold each id; -1 if the id sorts before every stored id
+    fence = group[fence_name][...]
+    query_blocks = np.searchsorted(fence, query, side="right") - 1
+
+    query_order = np.argsort(query_blocks, kind="mergesort")
+    (blocks, block_starts) = np.unique(query_blocks[query_order], return_index=True)
+    for (block, members) in zip(blocks, np.split(query_order, block_starts[1:])):
+        if block < 0:
+            continue
+        start = block * block_size
+        block_ids = sorted_id_dset[start:start + block_size]
+        found_at = np.minimum(np.searchsorted(block_ids, query[members]), len(block_ids) - 1)
+        found = block_ids[found_at] == query[members]
+        if found.any():
+            block_positions = position_dset[start:start + block_size]
+            positions[members[found]] = block_positions[found_at[found]]
+    return positions
+
+
+if __name__ == "__main__":
+    main()
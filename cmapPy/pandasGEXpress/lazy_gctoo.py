@@ -0,0 +1,262 @@
+"""
+lazy_gctoo.py
+
+Out-of-core GCToo backed by an open .gctx file. Only the row and column metadata
+are loaded into memory; meth_df and cov_df are LazyDataFrame proxies over the
+/0/DATA/0/matrix dataset. Selecting with .loc / .iloc (or through subset_gctoo)
+returns new proxies; data is read from disk only when materialize() (or .values)
+is called.
+
+ex:
+    import cmapPy.pandasGEXpress.parse_gctx as parse_gctx
+    lazy = parse_gctx.parse("big.gctx", lazy=True)
+    small = subset_gctoo.subset_gctoo(lazy, rid=my_rids).materialize()
+    lazy.close()
+"""
+import logging
+import numpy as np
+import pandas as pd
+import cmapPy.pandasGEXpress.setup_GCToo_logger as setup_logger
+import cmapPy.pandasGEXpress.GCToo as GCToo
+import cmapPy.pandasGEXpress.parse_gctx as parse_gctx
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+
+class LazyDataFrame(object):
+    """Read-only proxy over one plane of a GCTX data matrix.
+
+    Positions are kept in file coordinates: ridx indexes the last axis of the
+    HDF5 dataset (rows / rids) and cidx the second to last axis (columns / cids).
+    A proxy whose plane is None stands for a plane that was not requested (see
+    parse_gctx.parse's layers); it materializes as GCToo.make_missing_plane_df.
+    """
+    def __init__(self, data_dset, plane, ridx, cidx, index, columns, transposed=False):
+        self.data_dset = data_dset
+        self.plane = plane
+        self.ridx = np.asarray(ridx, dtype=np.int64)
+        self.cidx = np.asarray(cidx, dtype=np.int64)
+        self.row_ids = index
+        self.col_ids = columns
+        self.transposed = transposed
+
+    @property
+    def index(self):
+        return self.col_ids if self.transposed else self.row_ids
+
+    @property
+    def columns(self):
+        return self.row_ids if self.transposed else self.col_ids
+
+    @property
+    def shape(self):
+        return (len(self.index), len(self.columns))
+
+    @property
+    def size(self):
+        return self.shape[0] * self.shape[1]
+
+    @property
+    def ndim(self):
+        return 2
+
+    @property
+    def empty(self):
+        return self.size == 0
+
+    def __len__(self):
+        return self.shape[0]
+
+    @property
+    def T(self):
+        return self.transpose()
+
+    def transpose(self):
+        return LazyDataFrame(self.data_dset, self.plane, self.ridx, self.cidx,
+                             self.row_ids, self.col_ids, not self.transposed)
+
+    @property
+    def iloc(self):
+        return _LazyIndexer(self, "iloc")
+
+    @property
+    def loc(self):
+        return _LazyIndexer(self, "loc")
+
+    @property
+    def values(self):
+        return self.materialize().values
+
+    def take_positions(self, index_pos, column_pos):
+        """ Returns a new proxy restricted to the given positions of index and columns. """
+        if self.transposed:
+            (row_pos, col_pos) = (column_pos, index_pos)
+        else:
+            (row_pos, col_pos) = (index_pos, column_pos)
+        return LazyDataFrame(self.data_dset, self.plane, self.ridx[row_pos], self.cidx[col_pos],
+                             self.row_ids[row_pos], self.col_ids[col_pos], self.transposed)
+
+    def materialize(self):
+        """ Reads the selected cells from disk and returns them as a pandas DataFrame. """
+        return read_planes(self)[0]
+
+    def __repr__(self):
+        return "LazyDataFrame: [{} rows x {} columns] backed by {}".format(
+            self.shape[0], self.shape[1], self.data_dset.file.filename)
+
+
+class _LazyIndexer(object):
+    """ Implements .loc and .iloc for LazyDataFrame. """
+    def __init__(self, proxy, kind):
+        self.proxy = proxy
+        self.kind = kind
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            (index_key, column_key) = key
+        else:
+            (index_key, column_key) = (key, slice(None))
+
+        index_scalar = np.ndim(index_key) == 0 and not isinstance(index_key, slice)
+        column_scalar = np.ndim(column_key) == 0 and not isinstance(column_key, slice)
+
+        index_pos = self.get_positions(index_key, self.proxy.index)
+        column_pos = self.get_positions(column_key, self.proxy.columns)
+        subset = self.proxy.take_positions(index_pos, column_pos)
+
+        # scalar selections reduce dimensionality, so they have to be materialized
+        if index_scalar or column_scalar:
+            frame = subset.materialize()
+            return frame.iloc[0 if index_scalar else slice(None), 0 if column_scalar else slice(None)]
+        return subset
+
+    def get_positions(self, key, labels):
+        n = len(labels)
+        if isinstance(key, slice):
+            if self.kind == "loc":
+                key = labels.slice_indexer(key.start, key.stop, key.step)
+            return np.arange(n)[key]
+
+        if np.ndim(key) == 0:
+            key = [key]
+        key = np.asarray(key)
+
+        if key.dtype == bool:
+            if len(key) != n:
+                msg = "boolean selector has length {} but expected {}".format(len(key), n)
+                logger.error(msg)
+                raise IndexError("LazyDataFrame " + msg)
+            return np.flatnonzero(key)
+
+        if self.kind == "iloc":
+            positions = key.astype(np.int64)
+            positions[positions < 0] += n
+            if len(positions) and (positions.min() < 0 or positions.max() >= n):
+                msg = "positional indexers are out-of-bounds: {}".format(key)
+                logger.error(msg)
+                raise IndexError("LazyDataFrame " + msg)
+            return positions
+
+        positions = labels.get_indexer(key)
+        if np.any(positions < 0):
+            missing = key[positions < 0]
+            msg = "the following labels are not present: {}".format(list(missing))
+            logger.error(msg)
+            raise KeyError("LazyDataFrame " + msg)
+        return positions
+
+
+class LazyGCToo(GCToo.GCToo):
+    """GCToo whose meth_df and cov_df are LazyDataFrame proxies over an open .gctx file.
+
+    Accepts the same arguments as GCToo; metadata are regular pandas DataFrames.
+    """
+    def check_df(self, df):
+        if isinstance(df, LazyDataFrame):
+            if not df.index.is_unique or not df.columns.is_unique:
+                msg = "Index and columns values of a LazyDataFrame must be unique"
+                self.logger.error(msg)
+                raise Exception("LazyGCToo LazyGCToo.check_df " + msg)
+            return True
+        return super(LazyGCToo, self).check_df(df)
+
+    def materialize(self, make_multiindex=False):
+        """ Reads the selected data from disk and returns an in-memory GCToo. """
+        (meth_df, cov_df) = read_planes(self.meth_df, self.cov_df)
+        return GCToo.GCToo(meth_df=meth_df, cov_df=cov_df,
+                           row_metadata_df=self.row_metadata_df, col_metadata_df=self.col_metadata_df,
+                           src=self.src, version=self.version, make_multiindex=make_multiindex)
+
+    def close(self):
+        """ Closes the backing .gctx file. """
+        self.meth_df.data_dset.file.close()
+
+    def __str__(self):
+        return "lazy " + super(LazyGCToo, self).__str__()
+
+
+def read_planes(*proxies):
+    """
+    Materializes one or more LazyDataFrame proxies. Proxies that share a dataset
+    and a selection (e.g. meth_df and cov_df of the same LazyGCToo) are served by
+    a single read of the planes they need.
+
+    Input:
+        - proxies (LazyDataFrame): proxies to materialize
+    Output:
+        - frames (list of pandas DataFrames): one per proxy, in the same order
+    """
+    keys = [(id(proxy.data_dset), proxy.ridx.tobytes(), proxy.cidx.tobytes()) for proxy in proxies]
+    key_layers = {}
+    for (key, proxy) in zip(keys, proxies):
+        key_layers.setdefault(key, set())
+        if proxy.plane is not None:
+            key_layers[key].add(parse_gctx.data_layers[proxy.plane])
+
+    key_planes = {}
+    frames = []
+    for (key, proxy) in zip(keys, proxies):
+        if key not in key_planes:
+            layers = tuple(x for x in parse_gctx.data_layers if x in key_layers[key])
+            key_planes[key] = parse_gctx.read_data_array(
+                proxy.data_dset, proxy.ridx, proxy.cidx, layers=layers) if layers else {}
+
+        plane_array = None
+        if proxy.plane is not None:
+            plane_array = key_planes[key][parse_gctx.data_layers[proxy.plane]]
+        if plane_array is None:
+            frame = GCToo.make_missing_plane_df(proxy.row_ids, proxy.col_ids)
+        else:
+            frame = pd.DataFrame(plane_array.transpose(), index=proxy.row_ids, columns=proxy.col_ids)
+        frames.append(frame.T if proxy.transposed else frame)
+    return frames
+
+
+def make_lazy_gctoo(gctx_file, ridx, cidx, row_meta, col_meta, src, version, data_dset=None,
+                    layers=parse_gctx.data_layers):
+    """
+    Builds a LazyGCToo over an open .gctx file.
+
+    Input:
+        - gctx_file (h5py File): open file; stays open until LazyGCToo.close()
+        - ridx (list): row positions to expose, in the order they should appear
+        - cidx (list): column positions to expose, in the order they should appear
+        - row_meta (pandas DataFrame): row metadata, already subset to ridx
+        - col_meta (pandas DataFrame): column metadata, already subset to cidx
+        - src (str): path of the file
+        - version (str): GCTX version
+        - data_dset (h5py dset): data matrix of gctx_file, if already opened (e.g. with its own
+            chunk cache, see parse_gctx.open_data_dset). Default=None
+        - layers (tuple of str): planes that materialize reads, out of parse_gctx.data_layers;
+            the others materialize as all-NaN placeholders. Default = both
+    Output:
+        - lazy_gctoo (LazyGCToo)
+    """
+    if data_dset is None:
+        data_dset = gctx_file[parse_gctx.data_node]
+    (meth_plane, cov_plane) = [plane if layer in layers else None
+                               for (plane, layer) in enumerate(parse_gctx.data_layers)]
+    meth_df = LazyDataFrame(data_dset, meth_plane, ridx, cidx, row_meta.index, col_meta.index)
+    cov_df = LazyDataFrame(data_dset, cov_plane, ridx, cidx, row_meta.index, col_meta.index)
+    return LazyGCToo(meth_df=meth_df, cov_df=cov_df, row_metadata_df=row_meta,
+                     col_metadata_df=col_meta, src=src, version=version)
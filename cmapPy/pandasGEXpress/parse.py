@@ -19,14 +19,17 @@ logger = logging.getLogger(setup_logger.LOGGER_NAME)
 
 
 def parse(file_path, convert_neg_666=True, rid=None, cid=None, ridx=None, cidx=None,
-          row_meta_only=False, col_meta_only=False, make_multiindex=False):
+          row_meta_only=False, col_meta_only=False, make_multiindex=False,
+          row_meta_fields=None, col_meta_fields=None, rdcc_nbytes=None, rdcc_nslots=None, rdcc_w0=None,
+          layers=parse_gctx.data_layers, mmap=False, n_jobs=1):
     """
     Identifies whether file_path corresponds to a .gct or .gctx file and calls the
     correct corresponding parse method.
 
     Input:
         Mandatory:
-        - gct(x)_file_path (str): full path to gct(x) file you want to parse.
+        - gct(x)_file_path (str): full path to gct(x) file you want to parse. A .gct
+            may be compressed (.gct.gz, .gct.bz2 or .gct.xz); see parse_gct.compressed_openers
 
         Optional:
         - convert_neg_666 (bool): whether to convert -666 values to numpy.nan or not
@@ -43,6 +46,18 @@ def parse(file_path, convert_neg_666=True, rid=None, cid=None, ridx=None, cidx=N
             as pandas DataFrame
         - make_multiindex (bool): whether to create a multi-index df combining
             the 3 component dfs
+        - row_meta_fields (list of strings): row metadata fields to keep; for a .gctx, only
+            these fields are read from the file. Default = None (all fields)
+        - col_meta_fields (list of strings): col metadata fields to keep, as row_meta_fields.
+            Default = None (all fields)
+        - rdcc_nbytes, rdcc_nslots, rdcc_w0: HDF5 chunk cache settings used to read the data
+            of a .gctx; see parse_gctx.parse. Default = None (the file defaults)
+        - layers (str or tuple of str): planes of a .gctx data matrix to read, "meth", "cov"
+            or both; see parse_gctx.parse. Default = both
+        - mmap (bool): whether to memory map the data matrix of a contiguous, uncompressed .gctx
+            instead of reading it; see parse_gctx.parse. Default = False
+        - n_jobs (int): number of processes parsing the body of a .gct; see parse_gct.parse.
+            Default = 1
 
     Output:
         - out (GCToo object or pandas df): if row_meta_only or col_meta_only, then
@@ -55,22 +70,55 @@ def parse(file_path, convert_neg_666=True, rid=None, cid=None, ridx=None, cidx=N
         including those for filtering nan's etc) we provide the option of converting these
         into numpy.NaN values, the pandas default.
     """
-    if file_path.endswith(".gct"):
+    if parse_gct.is_gct(file_path):
         out = parse_gct.parse(file_path, convert_neg_666=convert_neg_666,
                               rid=rid, cid=cid, ridx=ridx, cidx=cidx,
                               row_meta_only=row_meta_only, col_meta_only=col_meta_only,
-                              make_multiindex=make_multiindex)
+                              make_multiindex=make_multiindex, n_jobs=n_jobs)
+
+        # the text format has to be read whole, so fields are projected afterwards
+        if row_meta_only:
+            out = project_metadata_fields(out, row_meta_fields)
+        elif col_meta_only:
+            out = project_metadata_fields(out, col_meta_fields)
+        else:
+            out.row_metadata_df = project_metadata_fields(out.row_metadata_df, row_meta_fields)
+            out.col_metadata_df = project_metadata_fields(out.col_metadata_df, col_meta_fields)
 
     elif file_path.endswith(".gctx"):
         out = parse_gctx.parse(file_path, convert_neg_666=convert_neg_666,
                               rid=rid, cid=cid, ridx=ridx, cidx=cidx,
                               row_meta_only=row_meta_only, col_meta_only=col_meta_only,
-                              make_multiindex=make_multiindex)
+                              make_multiindex=make_multiindex,
+                              row_meta_fields=row_meta_fields, col_meta_fields=col_meta_fields,
+                              rdcc_nbytes=rdcc_nbytes, rdcc_nslots=rdcc_nslots, rdcc_w0=rdcc_w0,
+                              layers=layers, mmap=mmap)
 
     else:
-        err_msg = "File to parse must be .gct or .gctx!"
+        err_msg = "File to parse must be .gct (possibly compressed) or .gctx!"
         logger.error(err_msg)
         raise Exception(err_msg)
 
     return out
 
+
+def project_metadata_fields(meta_df, fields):
+    """
+    Keeps only the requested fields of a metadata DataFrame.
+
+    Input:
+        - meta_df (pandas DataFrame): row or column metadata
+        - fields (list of strings or None): fields to keep, in order; None keeps all of them
+
+    Output:
+        - meta_df (pandas DataFrame)
+    """
+    if fields is None:
+        return meta_df
+
+    missing_fields = [f for f in fields if f not in meta_df.columns]
+    if len(missing_fields) > 0:
+        err_msg = "The following metadata fields were not found: {}".format(missing_fields)
+        logger.error(err_msg)
+        raise Exception(err_msg)
+    return meta_df[list(fields)]
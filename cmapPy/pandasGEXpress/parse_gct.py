@@ -58,12 +58,18 @@ assemble_multi_index_df method in GCToo.py assembles them.
                 -36 = number of data columns   
 
 """
+import io
+import bz2
+import csv
+import gzip
+import lzma
 import logging
+import collections
+import concurrent.futures
 import pandas as pd
 import numpy as np
 import os.path
 import cmapPy.pandasGEXpress.GCToo as GCToo
-import cmapPy.pandasGEXpress.subset_gctoo as sg
 import cmapPy.pandasGEXpress.setup_GCToo_logger as setup_logger
 
 __author__ = "Lev Litichevskiy, Oana Enache"
@@ -78,14 +84,23 @@ row_header_name = "rhd"
 column_header_name = "chd"
 DATA_TYPE = np.float32
 
+# approximate size of the blocks of data read at a time from the body of a gct
+body_block_mb = 64
+
+# suffixes of compressed gcts (e.g. .gct.gz) and how to open them; they are
+# decompressed as they are read
+compressed_openers = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+
 
 def parse(file_path, convert_neg_666=True, rid=None, cid=None,
-          ridx=None, cidx=None, row_meta_only=False, col_meta_only=False, make_multiindex=False):
+          ridx=None, cidx=None, row_meta_only=False, col_meta_only=False, make_multiindex=False,
+          n_jobs=1):
     """
     The main method.
 
     Args:
-        - file_path (string): full path to gct(x) file you want to parse
+        - file_path (string): full path to gct(x) file you want to parse; a .gct.gz,
+            .gct.bz2 or .gct.xz is decompressed as it is read (see compressed_openers)
         - convert_neg_666 (bool): whether to convert -666 values to numpy.nan
             (see Note below for more details). Default = False.
         - rid (list of strings): list of row ids to specifically keep from gct. Default=None.
@@ -94,12 +109,16 @@ def parse(file_path, convert_neg_666=True, rid=None, cid=None,
             list of integer ids. Default=None.
         - cidx (list of integers): only read the columns corresponding to this
             list of integer ids. Default=None.
+            Rows and columns are returned in the order of the file, and only those
+            kept are parsed (see parse_into_3_df).
         - row_meta_only (bool): Whether to load data + metadata (if False), or
             just row metadata (if True) as pandas DataFrame
         - col_meta_only (bool): Whether to load data + metadata (if False), or
             just col metadata (if True) as pandas DataFrame
         - make_multiindex (bool): whether to create a multi-index df combining
             the 3 component dfs
+        - n_jobs (int): number of processes parsing the body of the gct, each from
+            its own byte range of the file (see read_body_parallel). Default = 1
 
     Returns:
         - myGCToo (GCToo object): A GCToo instance containing content of
@@ -135,20 +154,17 @@ def parse(file_path, convert_neg_666=True, rid=None, cid=None,
     (version, num_data_rows, num_data_cols,
      num_row_metadata, num_col_metadata) = read_version_and_dims(file_path)
 
-    # Read in metadata and data
+    # Read in metadata and data; only the requested rows and columns are parsed
     (row_metadata, col_metadata, data) = parse_into_3_df(
         file_path, num_data_rows, num_data_cols,
-        num_row_metadata, num_col_metadata, nan_values)
+        num_row_metadata, num_col_metadata, nan_values,
+        rid=rid, cid=cid, ridx=ridx, cidx=cidx, n_jobs=n_jobs)
 
     # Create the gctoo object and assemble 3 component dataframes
     # Not the most efficient if only metadata requested (i.e. creating the
     # whole GCToo just to return the metadata df), but simplest
     myGCToo = create_gctoo_obj(file_path, version, row_metadata, col_metadata,
                                data, make_multiindex)
-    # Subset if requested
-    if (rid is not None) or (ridx is not None) or (cid is not None) or (cidx is not None):
-        logger.info("Subsetting GCT... (note that there are no speed gains when subsetting GCTs)")
-        myGCToo = sg.subset_gctoo(myGCToo, rid=rid, cid=cid, ridx=ridx, cidx=cidx)
 
     if row_meta_only:
         return myGCToo.row_metadata_df
@@ -160,9 +176,30 @@ def parse(file_path, convert_neg_666=True, rid=None, cid=None,
         return myGCToo
 
 
+def is_gct(file_path):
+    """ Whether file_path is a .gct, or a .gct compressed with one of compressed_openers. """
+    return any(file_path.endswith(".gct" + suffix) for suffix in [""] + list(compressed_openers))
+
+
+def get_compressed_suffix(file_path):
+    """ The suffix of file_path in compressed_openers, or None for an uncompressed file. """
+    for suffix in compressed_openers:
+        if file_path.endswith(suffix):
+            return suffix
+    return None
+
+
+def open_gct(file_path, mode="rb"):
+    """ Opens a gct, decompressing it as it is read if it has a compressed suffix. """
+    suffix = get_compressed_suffix(file_path)
+    if suffix is None:
+        return open(file_path, mode)
+    return compressed_openers[suffix](file_path, mode)
+
+
 def read_version_and_dims(file_path):
     # Open file
-    f = open(file_path, "r")
+    f = open_gct(file_path, "rt")
 
     # Get version from the first line
     version = f.readline().strip().lstrip("#")
@@ -206,31 +243,424 @@ def read_version_and_dims(file_path):
     return version_as_string, num_data_rows, num_data_cols, num_row_metadata, num_col_metadata
 
 
-def parse_into_3_df(file_path, num_data_rows, num_data_cols, num_row_metadata, num_col_metadata, nan_values):
-    # Read the gct file beginning with line 3
-    full_df = pd.read_csv(file_path, sep="\t", header=None, skiprows=2,
-                          dtype=str, na_values=nan_values, keep_default_na=False)
+def parse_into_3_df(file_path, num_data_rows, num_data_cols, num_row_metadata, num_col_metadata, nan_values,
+                    rid=None, cid=None, ridx=None, cidx=None, n_jobs=1):
+    """
+    Reads the header block (cids, row metadata headers and column metadata) as strings,
+    then streams the body in blocks with typed columns: strings for the rids and row
+    metadata, DATA_TYPE for the data. Data cells are never held as Python strings.
 
-    # Check that full_df is the size we expect
+    Subsets are pushed down into the reader: cid/cidx become the columns parsed, and
+    body lines whose rid (rid) or position (ridx) is not requested are skipped before
+    they are parsed, so memory is proportional to the result. Rows and columns are
+    kept in the order of the file.
+
+    With n_jobs > 1, the body is split into byte ranges parsed by n_jobs processes
+    (see read_body_parallel); the result is the same as with n_jobs = 1.
+    """
+    assert (rid is None) or (ridx is None), "Only one of rid and ridx can be provided."
+    assert (cid is None) or (cidx is None), "Only one of cid and cidx can be provided."
     expected_row_num = num_col_metadata + num_data_rows + 1
     expected_col_num = num_row_metadata + num_data_cols + 1
-    assert full_df.shape == (expected_row_num,
-                             expected_col_num), (
-        ("The shape of full_df is not as expected: expected shape is {} x {} " +
-         "parsed shape is {} x {}").format(expected_row_num, expected_col_num,
-                full_df.shape[0], full_df.shape[1]))
+    with open_gct(file_path) as f:
+        # skip the version and dimensions lines
+        f.readline()
+        f.readline()
+        header_df = read_header_block(f, num_col_metadata, nan_values)
+        assert header_df.shape == (num_col_metadata + 1, expected_col_num), (
+            ("The shape of the header block is not as expected: expected shape is {} x {} " +
+             "parsed shape is {} x {}").format(num_col_metadata + 1, expected_col_num,
+                                               header_df.shape[0], header_df.shape[1]))
+
+        col_positions = get_col_positions(header_df, num_row_metadata, num_data_cols, cid, cidx)
+        (keep_row, last_row) = get_row_filter(num_data_rows, rid, ridx)
+        try:
+            if n_jobs > 1 and ridx is None:
+                (rids, row_metadata_values, data_values) = read_body_parallel(
+                    f, file_path, n_jobs, num_data_rows, num_data_cols, num_row_metadata, nan_values,
+                    col_positions, rid)
+            else:
+                # ridx refers to line positions, which byte ranges do not know, but it
+                # stops reading after the last requested line anyway
+                (rids, row_metadata_values, data_values) = read_body(
+                    f, num_data_rows, num_data_cols, num_row_metadata, nan_values,
+                    col_positions, keep_row, last_row)
+        except ValueError:
+            # report the first value that could not be converted, as assemble_data does
+            report_unconvertible_value(file_path, header_df, num_row_metadata, num_col_metadata,
+                                       nan_values, col_positions, keep_row, last_row)
+            raise
+
+    if keep_row is None:
+        assert data_values.shape[0] == num_data_rows, (
+            ("The shape of full_df is not as expected: expected shape is {} x {} " +
+             "parsed shape is {} x {}").format(expected_row_num, expected_col_num,
+                                               num_col_metadata + 1 + data_values.shape[0], expected_col_num))
+    if rid is not None:
+        num_missing_rids = len(set(str(r) for r in rid)) - len(set(rids))
+        if num_missing_rids != 0:
+            logger.info("{} rids were not found in the GCT.".format(num_missing_rids))
+    if (keep_row is not None) or (col_positions is not None):
+        assert data_values.size > 0, "Subsetting yielded an empty gct!"
 
     # Assemble metadata dataframes
-    row_metadata = assemble_row_metadata(full_df, num_col_metadata, num_data_rows, num_row_metadata)
-    col_metadata = assemble_col_metadata(full_df, num_col_metadata, num_row_metadata, num_data_cols)
+    col_metadata = assemble_col_metadata(header_df, num_col_metadata, num_row_metadata, num_data_cols)
+    cids = header_df.iloc[0, num_row_metadata + 1:].values
+    if col_positions is not None:
+        col_metadata = col_metadata.iloc[col_positions]
+        cids = cids[col_positions]
+    row_metadata = pd.DataFrame(row_metadata_values, index=pd.Index(rids, name=row_index_name),
+                                columns=pd.Index(header_df.iloc[0, 1:num_row_metadata + 1].values,
+                                                 name=row_header_name))
+    row_metadata = row_metadata.apply(lambda x: pd.to_numeric(x, errors="ignore"))
 
     # Assemble data dataframe
-    data = assemble_data(full_df, num_col_metadata, num_data_rows, num_row_metadata, num_data_cols)
+    data = pd.DataFrame(data_values, index=pd.Index(rids, name=row_index_name),
+                        columns=pd.Index(cids, name=column_index_name))
 
     # Return 3 dataframes
     return row_metadata, col_metadata, data
 
 
+def read_header_block(f, num_col_metadata, nan_values):
+    """
+    Reads the cid line and the column metadata lines as strings.
+
+    Args:
+        - f (file handle): binary handle positioned at the cid line; left at the first body line
+        - num_col_metadata (int): number of column metadata lines
+        - nan_values (list of strings): values read as NaN
+
+    Returns:
+        - header_df (pandas df): shape (1 + num_col_metadata, number of fields per line)
+    """
+    header_lines = [f.readline() for _ in range(num_col_metadata + 1)]
+    return pd.read_csv(io.BytesIO(b"".join(header_lines)), sep="\t", header=None,
+                       dtype=str, na_values=nan_values, keep_default_na=False)
+
+
+def get_col_positions(header_df, num_row_metadata, num_data_cols, cid, cidx):
+    """
+    Positions, among the data columns and in file order, of the columns requested
+    by cid or cidx; None if all columns are requested.
+    """
+    if cid is not None:
+        file_cids = header_df.iloc[0, num_row_metadata + 1:]
+        col_positions = np.flatnonzero(file_cids.isin([str(c) for c in cid]).values)
+        num_missing_cids = len(set(str(c) for c in cid)) - len(set(file_cids.iloc[col_positions]))
+        if num_missing_cids != 0:
+            logger.info("{} cids were not found in the GCT.".format(num_missing_cids))
+        return col_positions
+
+    if cidx is not None:
+        return np.array(sorted(set(get_positions(cidx, num_data_cols, "cidx", "columns", 1))), dtype=int)
+
+    return None
+
+
+def get_positions(idx, size, name, dim_name, axis):
+    """
+    Non-negative positions of the integer ids idx (ridx or cidx) among size rows or
+    columns, checked as subset_gctoo checks them: negative ids count from the end.
+    """
+    assert type(idx[0]) is int, (
+        "{0} must be a list of integers. {0}[0]: {1}, type({0}[0]): {2}").format(name, idx[0], type(idx[0]))
+
+    assert max(idx) <= size, (
+        "{0} contains an integer larger than the number of {1} in the GCToo. max({0}): {2}, " +
+        "gctoo.meth_df.shape[{3}]: {4}").format(name, dim_name, max(idx), axis, size)
+
+    positions = []
+    for i in idx:
+        if not -size <= i < size:
+            raise IndexError("index {} is out of bounds for axis 0 with size {}".format(i, size))
+        positions.append(i % size)
+    return positions
+
+
+def get_row_filter(num_data_rows, rid, ridx):
+    """
+    Turns rid or ridx into a test on body lines.
+
+    Returns:
+        - keep_row (function): called with the position of a body line and its rid (as
+            bytes), returns whether to parse the line; None if all rows are requested
+        - last_row (int): position of the last body line that can be kept; None to read to the end
+    """
+    if rid is not None:
+        keep_rids = set(str(r).encode("utf-8") for r in rid)
+        return (lambda position, line_rid: line_rid in keep_rids), None
+
+    if ridx is not None:
+        keep_ridx = set(get_positions(ridx, num_data_rows, "ridx", "rows", 0))
+        return (lambda position, line_rid: position in keep_ridx), max(keep_ridx) if keep_ridx else -1
+
+    return None, None
+
+
+def read_body(f, num_data_rows, num_data_cols, num_row_metadata, nan_values,
+              col_positions=None, keep_row=None, last_row=None):
+    """
+    Reads the body (one line per rid) in blocks of about body_block_mb of data.
+
+    Args:
+        - f (file handle): binary handle positioned at the first body line
+        - num_data_rows (int): expected number of body lines
+        - num_data_cols (int)
+        - num_row_metadata (int)
+        - nan_values (list of strings): values read as NaN
+        - col_positions (list of integers): data columns to read; see get_col_positions
+        - keep_row (function): which body lines to read; see get_row_filter
+        - last_row (int): see get_row_filter
+
+    Returns:
+        - rids (numpy array of strings)
+        - row_metadata_values (numpy array of strings): shape (number of rids, num_row_metadata)
+        - data_values (numpy array of DATA_TYPE): shape (number of rids, number of data columns read)
+    """
+    num_meta_cols = num_row_metadata + 1
+    usecols = get_body_usecols(num_data_cols, num_row_metadata, col_positions)
+    fields = usecols if usecols is not None else list(range(num_meta_cols + num_data_cols))
+    dtypes = dict((i, str) for i in fields[:num_meta_cols])
+    dtypes.update((i, DATA_TYPE) for i in fields[num_meta_cols:])
+    num_read_cols = len(fields) - num_meta_cols
+
+    # without a row filter, the number of rows is known and blocks are copied into place
+    data_values = np.empty((num_data_rows, num_read_cols), dtype=DATA_TYPE) if keep_row is None else None
+    data_blocks = []
+    meta_blocks = []
+    n_read = 0
+    for block in iter_body_blocks(f, usecols, dtypes, nan_values, num_read_cols, keep_row, last_row):
+        assert block.shape[1] == len(fields), (
+            "The body of the gct has {} fields per line; expected {}".format(
+                block.shape[1], num_meta_cols + num_data_cols))
+        if data_values is None:
+            data_blocks.append(block.iloc[:, num_meta_cols:].values)
+        else:
+            assert n_read + block.shape[0] <= num_data_rows, (
+                "The body of the gct has more than the {} lines given in its dimensions".format(num_data_rows))
+            data_values[n_read:n_read + block.shape[0]] = block.iloc[:, num_meta_cols:].values
+        meta_blocks.append(block.iloc[:, :num_meta_cols].values)
+        n_read += block.shape[0]
+
+    if data_values is None:
+        data_values = (np.concatenate(data_blocks) if data_blocks else
+                       np.empty((0, num_read_cols), dtype=DATA_TYPE))
+    meta_values = np.concatenate(meta_blocks) if meta_blocks else np.empty((0, num_meta_cols), dtype=object)
+    return meta_values[:, 0], meta_values[:, 1:], data_values[:n_read]
+
+
+def read_body_parallel(f, file_path, n_jobs, num_data_rows, num_data_cols, num_row_metadata, nan_values,
+                       col_positions=None, rid=None):
+    """
+    Reads the body as read_body does, but splits it into blocks of lines parsed by a
+    pool of n_jobs processes. An uncompressed gct is split into byte ranges (see
+    get_body_ranges) that each process reads itself; a compressed one cannot be split
+    by offset, so it is decompressed here and its text handed to the processes (see
+    iter_body_text). Blocks are combined in file order as they complete, and at most
+    2 * n_jobs are in flight.
+
+    Args:
+        - f (file handle): binary handle positioned at the first body line
+        - file_path (string): path of the gct
+        - n_jobs (int): number of processes
+        - num_data_rows, num_data_cols, num_row_metadata, nan_values, col_positions: see read_body
+        - rid (list of strings): rids to keep; see get_row_filter
+
+    Returns:
+        - rids, row_metadata_values, data_values: see read_body
+    """
+    if get_compressed_suffix(file_path) is None:
+        tasks = [(read_body_range, (file_path, start, stop)) for (start, stop) in get_body_ranges(f, n_jobs)]
+    else:
+        tasks = ((read_body_text, (body_text,)) for body_text in iter_body_text(f))
+    common_args = (num_data_cols, num_row_metadata, nan_values, col_positions, rid)
+    num_read_cols = num_data_cols if col_positions is None else len(col_positions)
+    logger.debug("Parsing the body of {} using {} processes".format(file_path, n_jobs))
+
+    def iter_results(executor):
+        pending = collections.deque()
+        for (read_function, args) in tasks:
+            pending.append(executor.submit(read_function, *(args + common_args)))
+            if len(pending) >= 2 * n_jobs:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    data_values = np.empty((num_data_rows, num_read_cols), dtype=DATA_TYPE) if rid is None else None
+    data_blocks = []
+    rid_blocks = []
+    meta_blocks = []
+    n_read = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        for (block_rids, block_meta_values, block_data_values) in iter_results(executor):
+            if data_values is None:
+                data_blocks.append(block_data_values)
+            else:
+                assert n_read + block_data_values.shape[0] <= num_data_rows, (
+                    "The body of the gct has more than the {} lines given in its dimensions".format(num_data_rows))
+                data_values[n_read:n_read + block_data_values.shape[0]] = block_data_values
+            rid_blocks.append(block_rids)
+            meta_blocks.append(block_meta_values)
+            n_read += block_data_values.shape[0]
+
+    if data_values is None:
+        data_values = (np.concatenate(data_blocks) if data_blocks else
+                       np.empty((0, num_read_cols), dtype=DATA_TYPE))
+    if not meta_blocks:
+        return np.empty(0, dtype=object), np.empty((0, num_row_metadata), dtype=object), data_values
+    return np.concatenate(rid_blocks), np.concatenate(meta_blocks), data_values[:n_read]
+
+
+def get_body_ranges(f, n_jobs):
+    """
+    Splits the body of a gct into byte ranges that start and end at line boundaries:
+    n_jobs ranges, or more so that none holds much more than body_block_mb of text.
+
+    Args:
+        - f (file handle): seekable binary handle positioned at the first body line
+        - n_jobs (int)
+
+    Returns:
+        - ranges (list of (int, int) tuples): start and stop offsets of each range
+    """
+    body_start = f.tell()
+    f.seek(0, os.SEEK_END)
+    body_stop = f.tell()
+    n_ranges = max(n_jobs, int(np.ceil((body_stop - body_start) / (body_block_mb * 2 ** 20))))
+
+    bounds = [body_start]
+    for i in range(1, n_ranges):
+        # move each split point to the end of the line it falls in
+        f.seek(body_start + (body_stop - body_start) * i // n_ranges)
+        f.readline()
+        bounds.append(max(f.tell(), bounds[-1]))
+    bounds.append(body_stop)
+    return [(start, stop) for (start, stop) in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+
+def iter_body_text(f):
+    """ Yields the rest of f in blocks of about body_block_mb of text that end at line boundaries. """
+    block_bytes = max(1, int(body_block_mb * 2 ** 20))
+    rest = b""
+    while True:
+        text = f.read(block_bytes)
+        if not text:
+            break
+        text = rest + text
+        stop = text.rfind(b"\n") + 1
+        (body_text, rest) = (text[:stop], text[stop:])
+        if body_text:
+            yield body_text
+    if rest:
+        yield rest
+
+
+def read_body_range(file_path, start, stop, num_data_cols, num_row_metadata, nan_values,
+                    col_positions=None, rid=None):
+    """
+    Reads the body lines between byte offsets start and stop of an uncompressed gct.
+    Runs in the processes of read_body_parallel.
+    """
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        body_text = f.read(stop - start)
+    return read_body_text(body_text, num_data_cols, num_row_metadata, nan_values, col_positions, rid)
+
+
+def read_body_text(body_text, num_data_cols, num_row_metadata, nan_values, col_positions=None, rid=None):
+    """
+    Reads body lines held in memory (see read_body). Runs in the processes of
+    read_body_parallel.
+    """
+    (keep_row, _) = get_row_filter(None, rid, None)
+    return read_body(io.BytesIO(body_text), body_text.count(b"\n") + 1, num_data_cols, num_row_metadata,
+                     nan_values, col_positions, keep_row)
+
+
+def get_body_usecols(num_data_cols, num_row_metadata, col_positions):
+    """
+    Fields of the body lines to parse: the rid, the row metadata and the requested data
+    columns; None (all fields) if all columns are requested, as usecols slows the parser.
+    """
+    num_meta_cols = num_row_metadata + 1
+    if col_positions is None:
+        return None
+    return list(range(num_meta_cols)) + [num_meta_cols + int(i) for i in col_positions]
+
+
+def iter_body_blocks(f, usecols, dtypes, nan_values, num_read_cols, keep_row=None, last_row=None):
+    """
+    Yields the body of the gct as dataframes of about body_block_mb of data each,
+    parsing only the fields in usecols and the lines kept by keep_row.
+    """
+    read_csv_args = {"sep": "\t", "header": None, "dtype": dtypes, "na_values": nan_values,
+                     "keep_default_na": False, "usecols": usecols}
+    block_bytes = body_block_mb * 2 ** 20
+    if keep_row is None:
+        block_rows = max(1, int(block_bytes // (np.dtype(DATA_TYPE).itemsize * max(num_read_cols, 1))))
+        for block in pd.read_csv(f, chunksize=block_rows, **read_csv_args):
+            yield block
+        return
+
+    for lines in filter_body_lines(f, keep_row, last_row, block_bytes):
+        yield pd.read_csv(io.BytesIO(lines), **read_csv_args)
+
+
+def filter_body_lines(f, keep_row, last_row, block_bytes):
+    """
+    Yields the body lines kept by keep_row, joined into blocks of about block_bytes.
+    Lines that are not kept are never parsed; reading stops after last_row.
+    """
+    lines = []
+    n_bytes = 0
+    for (position, line) in enumerate(f):
+        if last_row is not None and position > last_row:
+            break
+        if keep_row(position, get_line_rid(line)):
+            lines.append(line)
+            n_bytes += len(line)
+            if n_bytes >= block_bytes:
+                yield b"".join(lines)
+                lines = []
+                n_bytes = 0
+    if lines:
+        yield b"".join(lines)
+
+
+def get_line_rid(line):
+    """
+    The rid of a body line, as bytes, unquoted as pandas unquotes it when the line
+    starts with a quote (see write_gct.write_bottom_half).
+    """
+    if line.startswith(b'"'):
+        return next(csv.reader([line.decode("utf-8").rstrip("\r\n")], delimiter="\t"))[0].encode("utf-8")
+    return line.split(b"\t", 1)[0].rstrip(b"\r\n")
+
+
+def report_unconvertible_value(file_path, header_df, num_row_metadata, num_col_metadata, nan_values,
+                               col_positions=None, keep_row=None, last_row=None):
+    """
+    Re-reads the requested part of the body of file_path as strings so that assemble_data
+    can report the first value that could not be converted to DATA_TYPE. Only called once
+    the typed read has failed.
+    """
+    num_data_cols = header_df.shape[1] - num_row_metadata - 1
+    usecols = get_body_usecols(num_data_cols, num_row_metadata, col_positions)
+    fields = usecols if usecols is not None else list(range(header_df.shape[1]))
+    with open_gct(file_path) as f:
+        for _ in range(2 + num_col_metadata + 1):
+            f.readline()
+        body_df = pd.concat(list(iter_body_blocks(f, usecols, str, nan_values, len(fields),
+                                                  keep_row, last_row)), ignore_index=True)
+    body_df.columns = range(body_df.shape[1])
+    header_df = header_df.iloc[:, fields]
+    header_df.columns = range(header_df.shape[1])
+    full_df = pd.concat([header_df, body_df], ignore_index=True)
+    assemble_data(full_df, num_col_metadata, body_df.shape[0], num_row_metadata,
+                  len(fields) - num_row_metadata - 1)
+
+
 def assemble_row_metadata(full_df, num_col_metadata, num_data_rows, num_row_metadata):
     # Extract values
     row_metadata_row_inds = range(num_col_metadata + 1, num_col_metadata + num_data_rows + 1)
@@ -320,11 +750,13 @@ def assemble_data(full_df, num_col_metadata, num_data_rows, num_row_metadata, nu
 
 def create_gctoo_obj(file_path, version, row_metadata_df, col_metadata_df, data_df, make_multiindex):
 
-    # Move dataframes into GCToo object
+    # Move dataframes into GCToo object; a GCT has one data matrix, so there is no coverage
     gctoo_obj = GCToo.GCToo(src=file_path,
                             version=version,
                             row_metadata_df=row_metadata_df,
                             col_metadata_df=col_metadata_df,
-                            data_df=data_df, make_multiindex=make_multiindex)
+                            meth_df=data_df,
+                            cov_df=GCToo.make_missing_plane_df(data_df.index, data_df.columns),
+                            make_multiindex=make_multiindex)
     return gctoo_obj
 
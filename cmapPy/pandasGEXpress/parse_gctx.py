@@ -1,10 +1,16 @@
 import logging
 import cmapPy.pandasGEXpress.setup_GCToo_logger as setup_logger
 import os
+import re
+import zlib
+import queue
+import threading
+import concurrent.futures
 import numpy as np
 import pandas as pd
 import h5py
 import cmapPy.pandasGEXpress.GCToo as GCToo
+import cmapPy.pandasGEXpress.index_gctx as index_gctx
 
 __author__ = "Oana Enache"
 __email__ = "oana@broadinstitute.org"
@@ -16,13 +22,52 @@ version_node = "version"
 rid_node = "/0/META/ROW/id"
 cid_node = "/0/META/COL/id"
 data_node = "/0/DATA/0/matrix"
+cov_node = "/0/DATA/0/coverage"
+cov_missing_attr = "missing_value"
 row_meta_group_node = "/0/META/ROW"
 col_meta_group_node = "/0/META/COL"
+encoding_attr = "encoding"
+categorical_encoding = "categorical"
+categories_attr = "categories"
+
+# planes of the data matrix, in storage order
+data_layers = ("meth", "cov")
+
+# levels of data validation parse can apply
+validation_levels = ["none", "fast", "full"]
+
+# number of cells checked at once when validating data; bounds the temporary arrays
+validate_block_cells = 4 * 1024 * 1024
+
+# number of offending cells listed when validation fails
+validate_max_reported = 5
+
+# largest number of positions read from a metadata dataset with one h5py point selection;
+# more than this are read as the span they cover, which h5py handles much faster
+metadata_point_read_max = 1000
+
+# value of rdcc_nbytes that sizes the chunk cache from the read, see get_auto_chunk_cache
+auto_chunk_cache = "auto"
+
+# largest chunk cache, in bytes, that rdcc_nbytes="auto" sets up for one read
+auto_rdcc_max_nbytes = 256 * 1024 * 1024
+
+# chunk cache hash table slots per chunk the cache can hold; HDF5 advises at least 10
+auto_rdcc_slots_per_chunk = 10
+
+# how often, in seconds, a prefetching thread blocked on a full queue checks whether it was cancelled
+prefetch_poll_seconds = 0.1
+
+# fixed cost of one h5py read call, expressed in bytes, used when planning subset reads
+read_call_overhead_bytes = 64 * 1024
 
 
 def parse(gctx_file_path, convert_neg_666=False, rid=None, cid=None,
           ridx=None, cidx=None, row_meta_only=False, col_meta_only=False, make_multiindex=False,
-          sort_col_meta = True, sort_row_meta = True):
+          sort_col_meta = True, sort_row_meta = True, lazy=False, n_threads=1, validate="full",
+          row_meta_fields=None, col_meta_fields=None, categorical_meta_fields=None,
+          row_where=None, col_where=None, rdcc_nbytes=None, rdcc_nslots=None, rdcc_w0=None,
+          layers=data_layers, mmap=False):
     """
     Primary method of script. Reads in path to a gctx file and parses into GCToo object.
 
@@ -47,6 +92,36 @@ def parse(gctx_file_path, convert_neg_666=False, rid=None, cid=None,
             the 3 component dfs
         - sort_col_meta (bool) : whether to sort the column metadata by indexes. Default = True
         - sort_row_meta (bool) : whether to sort the row metadata by indexes. Default = True
+        - lazy (bool): whether to return a LazyGCToo that keeps the file open and only reads
+            data when a concrete slice is materialized. Default = False
+        - n_threads (int): number of threads to decompress data chunks with. Default = 1
+        - validate (str): checks applied to the data as it is read; "none", "fast" (methylation
+            is at most 100) or "full" (also, coverage holds integers). Default = "full"
+        - row_meta_fields (list of strings): row metadata fields to read, in the order they should
+            appear; only these datasets are read from the file. Default = None (all fields)
+        - col_meta_fields (list of strings): col metadata fields to read, as row_meta_fields.
+            Default = None (all fields)
+        - categorical_meta_fields (list of strings): row or col metadata string fields to return
+            as pandas Categorical. Default = None
+        - row_where (str): only read the rows whose metadata matches this expression, in
+            pandas.DataFrame.eval syntax, e.g. "chr == 'chr7' and pos < 1000". Only the fields it
+            references are read to evaluate it. Cannot be combined with rid or ridx. Default = None
+        - col_where (str): only read the columns whose metadata matches this expression, as
+            row_where. Cannot be combined with cid or cidx. Default = None
+        - rdcc_nbytes (int or "auto"): size in bytes of the HDF5 chunk cache used to read the
+            data; "auto" sizes it (and rdcc_nslots, unless given) so that each chunk the read
+            touches is decompressed only once. Default = None (the file default, 1 MB)
+        - rdcc_nslots (int): number of hash table slots of the chunk cache. Default = None
+        - rdcc_w0 (float): chunk cache preemption policy, between 0 and 1; 1 evicts fully
+            read chunks first. Default = None
+        - layers (str or tuple of str): planes of the data matrix to read, "meth", "cov" or both;
+            a plane that is not read is neither read nor allocated, and is returned as a
+            read-only all-NaN placeholder (see GCToo.make_missing_plane_df). Default = both
+        - mmap (bool): whether to memory map the data matrix instead of reading it, if it is stored
+            contiguously and unfiltered (see write_gctx.write's access_pattern="contiguous");
+            otherwise it is read as usual. Rows and columns kept in file order are then read-only
+            views of the file, loaded on demand; pass validate="none" too, so that the data is
+            not scanned up front. Ignored with lazy. Default = False
     Output:
         - myGCToo (GCToo): A GCToo instance containing content of parsed gctx file. Note: if meta_only = True,
             this will be a GCToo instance where the data_df is empty, i.e. data_df = pd.DataFrame(index=rids,
@@ -59,6 +134,7 @@ def parse(gctx_file_path, convert_neg_666=False, rid=None, cid=None,
         into numpy.NaN values, the pandas default.
     """
     full_path = os.path.expanduser(gctx_file_path)
+    layers = check_layers(layers)
 
     # Verify that the  path exists
     if not os.path.exists(full_path):
@@ -73,7 +149,10 @@ def parse(gctx_file_path, convert_neg_666=False, rid=None, cid=None,
     if row_meta_only:
         # read in row metadata
         row_dset = gctx_file[row_meta_group_node]
-        row_meta = parse_metadata_df("row", row_dset, convert_neg_666)
+        row_positions = get_selected_positions(gctx_file, "row", rid, ridx, row_where, convert_neg_666,
+                                               categorical_meta_fields)
+        row_meta = parse_metadata_df("row", row_dset, convert_neg_666, fields=row_meta_fields,
+                                     categorical_fields=categorical_meta_fields, positions=row_positions)
 
         # validate optional input ids & get indexes to subset by
         (sorted_ridx, sorted_cidx) = check_and_order_id_inputs(rid, ridx, cid, cidx, row_meta, None, 
@@ -93,7 +172,10 @@ def parse(gctx_file_path, convert_neg_666=False, rid=None, cid=None,
     elif col_meta_only:
         # read in col metadata
         col_dset = gctx_file[col_meta_group_node]
-        col_meta = parse_metadata_df("col", col_dset, convert_neg_666)
+        col_positions = get_selected_positions(gctx_file, "col", cid, cidx, col_where, convert_neg_666,
+                                               categorical_meta_fields)
+        col_meta = parse_metadata_df("col", col_dset, convert_neg_666, fields=col_meta_fields,
+                                     categorical_fields=categorical_meta_fields, positions=col_positions)
 
         # validate optional input ids & get indexes to subset by
         (sorted_ridx, sorted_cidx) = check_and_order_id_inputs(rid, ridx, cid, cidx, None, 
@@ -111,24 +193,48 @@ def parse(gctx_file_path, convert_neg_666=False, rid=None, cid=None,
 
         return col_meta
     else:
-        # read in row metadata
+        # read in row metadata; only that of the selected rows if they can be found without it
         row_dset = gctx_file[row_meta_group_node]
-        row_meta = parse_metadata_df("row", row_dset, convert_neg_666)
+        row_positions = get_selected_positions(gctx_file, "row", rid, ridx, row_where, convert_neg_666,
+                                               categorical_meta_fields)
+        row_meta = parse_metadata_df("row", row_dset, convert_neg_666, fields=row_meta_fields,
+                                     categorical_fields=categorical_meta_fields, positions=row_positions)
 
         # read in col metadata
         col_dset = gctx_file[col_meta_group_node]
-        col_meta = parse_metadata_df("col", col_dset, convert_neg_666)
+        col_positions = get_selected_positions(gctx_file, "col", cid, cidx, col_where, convert_neg_666,
+                                               categorical_meta_fields)
+        col_meta = parse_metadata_df("col", col_dset, convert_neg_666, fields=col_meta_fields,
+                                     categorical_fields=categorical_meta_fields, positions=col_positions)
 
         # validate optional input ids & get indexes to subset by
         (sorted_ridx, sorted_cidx) = check_and_order_id_inputs(rid, ridx, cid, cidx, row_meta, col_meta, 
                                                                 sort_row_meta = True, sort_col_meta = True)
 
-        data_dset = gctx_file[data_node]
-        data_df_list = parse_data_df(data_dset, sorted_ridx, sorted_cidx, row_meta, col_meta)
+        file_ridx = sorted_ridx if row_positions is None else row_positions[sorted_ridx]
+        file_cidx = sorted_cidx if col_positions is None else col_positions[sorted_cidx]
+        data_dset = open_data_dset(gctx_file, file_ridx, file_cidx, rdcc_nbytes, rdcc_nslots, rdcc_w0)
+
+        if lazy:
+            return parse_lazy(gctx_file, rid, ridx, cid, cidx, sorted_ridx, sorted_cidx,
+                              row_meta, col_meta, sort_row_meta, sort_col_meta, full_path,
+                              row_positions=row_positions, col_positions=col_positions,
+                              data_dset=data_dset, layers=layers)
+
+        if mmap and can_memory_map(data_dset):
+            data_df_list = map_data_df(data_dset, sorted_ridx, sorted_cidx, row_meta, col_meta,
+                                       validate=validate, row_positions=row_positions,
+                                       col_positions=col_positions, layers=layers)
+        else:
+            if mmap:
+                logger.info("The data matrix of {} is chunked or filtered, so it is read rather than memory mapped".format(
+                    full_path))
+            data_df_list = parse_data_df(data_dset, sorted_ridx, sorted_cidx, row_meta, col_meta,
+                                         n_threads=n_threads, validate=validate,
+                                         row_positions=row_positions, col_positions=col_positions,
+                                         layers=layers)
         meth_df = data_df_list[0]
         cov_df = data_df_list[1]
-        assert np.nanmax(meth_df) <= 100. , 'it looks like methylation is >100% ?'
-        assert all(x.is_integer() for x in cov_df.fillna(0).stack().values), 'coverage matrix failed integer check'
 
         # (if subsetting) subset metadata
         row_meta = row_meta.iloc[sorted_ridx]
@@ -150,6 +256,12 @@ def parse(gctx_file_path, convert_neg_666=False, rid=None, cid=None,
             cov_df = cov_df.iloc[unsorted_ridx,:]
             row_meta = row_meta.iloc[unsorted_ridx,:]
 
+        # reordering copies; keep the planes that were not read as placeholders
+        if "meth" not in layers:
+            meth_df = GCToo.make_missing_plane_df(row_meta.index, col_meta.index)
+        if "cov" not in layers:
+            cov_df = GCToo.make_missing_plane_df(row_meta.index, col_meta.index)
+
         # get version
         my_version = gctx_file.attrs[version_node]
         if type(my_version) == np.ndarray:
@@ -163,6 +275,253 @@ def parse(gctx_file_path, convert_neg_666=False, rid=None, cid=None,
         return my_gctoo
 
 
+def parse_lazy(gctx_file, rid, ridx, cid, cidx, sorted_ridx, sorted_cidx, row_meta, col_meta,
+               sort_row_meta, sort_col_meta, full_path, row_positions=None, col_positions=None,
+               data_dset=None, layers=data_layers):
+    """
+    Builds a LazyGCToo over an open gctx file; only metadata has been read at this point.
+
+    Input:
+        - gctx_file (h5py File): open gctx file; it is left open
+        - rid, ridx, cid, cidx: subsetting arguments as passed to parse
+        - sorted_ridx (list): sorted row indexes to keep
+        - sorted_cidx (list): sorted column indexes to keep
+        - row_meta (pandas DataFrame): row metadata (all rows, or those at row_positions)
+        - col_meta (pandas DataFrame): column metadata (all columns, or those at col_positions)
+        - sort_row_meta (bool): whether rows are kept in file order
+        - sort_col_meta (bool): whether columns are kept in file order
+        - full_path (str): path of the gctx file
+        - row_positions (numpy array): file positions of the rows of row_meta, if it only
+            holds some of the file's rows (see parse_data_df)
+        - col_positions (numpy array): file positions of the columns of col_meta, as row_positions
+        - data_dset (h5py dset): data matrix to read from (see open_data_dset); None opens it
+        - layers (tuple of str): planes of the data matrix that materializing reads
+    Output:
+        - lazy_gctoo (LazyGCToo)
+    """
+    # imported here to avoid a circular import (lazy_gctoo reads data through this module)
+    import cmapPy.pandasGEXpress.lazy_gctoo as lazy_gctoo
+
+    out_ridx = np.asarray(sorted_ridx, dtype=np.int64)
+    out_cidx = np.asarray(sorted_cidx, dtype=np.int64)
+    if row_positions is not None:
+        out_ridx = row_positions[out_ridx]
+    if col_positions is not None:
+        out_cidx = col_positions[out_cidx]
+    row_meta = row_meta.iloc[sorted_ridx]
+    col_meta = col_meta.iloc[sorted_cidx]
+
+    if not sort_col_meta:
+        (_, unsorted_cidx) = check_and_order_id_inputs(rid, ridx, cid, cidx, row_meta, col_meta,
+                                                       sort_row_meta, sort_col_meta)
+        out_cidx = out_cidx[unsorted_cidx]
+        col_meta = col_meta.iloc[unsorted_cidx, :]
+
+    if not sort_row_meta:
+        (unsorted_ridx, _) = check_and_order_id_inputs(rid, ridx, cid, cidx, row_meta, col_meta,
+                                                       sort_row_meta, sort_row_meta)
+        out_ridx = out_ridx[unsorted_ridx]
+        row_meta = row_meta.iloc[unsorted_ridx, :]
+
+    my_version = gctx_file.attrs[version_node]
+    if type(my_version) == np.ndarray:
+        my_version = my_version[0]
+
+    return lazy_gctoo.make_lazy_gctoo(gctx_file, out_ridx, out_cidx, row_meta, col_meta,
+                                      full_path, my_version, data_dset=data_dset, layers=layers)
+
+
+def iter_blocks(gctx_file_path, axis="row", block_size=1000, rid=None, cid=None, ridx=None, cidx=None,
+                convert_neg_666=False, as_tuples=False, n_threads=1, validate="full",
+                row_meta_fields=None, col_meta_fields=None, layers=data_layers, prefetch=0,
+                prefetch_max_mb=None):
+    """
+    Streams a gctx file one block of rows (or columns) at a time, so that memory
+    stays bounded regardless of the size of the file. Block extents are aligned
+    to the HDF5 chunk layout of the data matrix so that no chunk is decompressed
+    for more than one block.
+
+    With prefetch, a background thread reads and decodes the next blocks while the
+    caller processes the current one. h5py holds the GIL while HDF5 decompresses, so
+    blocks read ahead are decompressed with read_data_parallel (using at least 2
+    threads) whenever the data matrix allows it, letting zlib run alongside the caller.
+    Stopping early (break, or close() on the generator) cancels the read-ahead.
+
+    Input:
+        Mandatory:
+        - gctx_file_path (str): full path to gctx file you want to parse.
+
+        Optional:
+        - axis (str): "row" to iterate over blocks of rows, "col" for blocks of columns. Default = "row"
+        - block_size (int): requested number of rows (or columns) per block; rounded down to a
+            multiple of the chunk length along axis (but at least one chunk). Default = 1000
+        - rid (list of strings): list of row ids to keep. Default=None.
+        - cid (list of strings): list of col ids to keep. Default=None.
+        - ridx (list of integers): list of row indexes to keep. Default=None.
+        - cidx (list of integers): list of col indexes to keep. Default=None.
+        - convert_neg_666 (bool): whether to convert -666 values to numpy.nan. Default = False
+        - as_tuples (bool): whether to yield (meth_df, cov_df, meta_df) tuples instead of
+            GCToo instances; meta_df is the metadata along axis for the block. Default = False
+        - n_threads (int): number of threads used to decompress each block. Default = 1
+        - validate (str): checks applied to each block as it is read; "none", "fast" or "full",
+            as in parse. Default = "full"
+        - row_meta_fields (list of strings): row metadata fields to read. Default = None (all fields)
+        - col_meta_fields (list of strings): col metadata fields to read. Default = None (all fields)
+        - layers (str or tuple of str): planes of the data matrix to read, as in parse. Default = both
+        - prefetch (int): number of blocks to read ahead in a background thread; 0 reads each
+            block when it is requested. Default = 0
+        - prefetch_max_mb (float): upper bound on the memory taken by blocks read ahead, which
+            lowers prefetch if needed (but at least one block is read ahead). Default = None (no bound)
+    Output:
+        - generator of GCToo instances (or tuples), in file order
+    """
+    assert axis in ["row", "col"], "axis must be either 'row' or 'col'. axis: {}".format(axis)
+    layers = check_layers(layers)
+
+    full_path = os.path.expanduser(gctx_file_path)
+    if not os.path.exists(full_path):
+        err_msg = "The given path to the gctx file cannot be found. full_path: {}"
+        logger.error(err_msg.format(full_path))
+        raise Exception(err_msg.format(full_path))
+    logger.info("Streaming GCTX in {} blocks: {}".format(axis, full_path))
+
+    gctx_file = h5py.File(full_path, "r")
+    try:
+        row_meta = parse_metadata_df("row", gctx_file[row_meta_group_node], convert_neg_666,
+                                     fields=row_meta_fields)
+        col_meta = parse_metadata_df("col", gctx_file[col_meta_group_node], convert_neg_666,
+                                     fields=col_meta_fields)
+        (sorted_ridx, sorted_cidx) = check_and_order_id_inputs(rid, ridx, cid, cidx, row_meta, col_meta,
+                                                               sort_row_meta=True, sort_col_meta=True)
+        sorted_ridx = np.asarray(sorted_ridx, dtype=np.int64)
+        sorted_cidx = np.asarray(sorted_cidx, dtype=np.int64)
+
+        data_dset = check_virtual_sources(gctx_file[data_node])
+        my_version = gctx_file.attrs[version_node]
+        if type(my_version) == np.ndarray:
+            my_version = my_version[0]
+
+        block_idx = sorted_ridx if axis == "row" else sorted_cidx
+        chunk_len = get_aligned_block_size(data_dset, axis, block_size)
+        block_bounds = list(get_chunk_groups(block_idx, chunk_len))
+        block_threads = max(n_threads, 2) if prefetch > 0 else n_threads
+
+        def read_block(bounds):
+            (start, stop) = bounds
+            if axis == "row":
+                (block_ridx, block_cidx) = (sorted_ridx[start:stop], sorted_cidx)
+            else:
+                (block_ridx, block_cidx) = (sorted_ridx, sorted_cidx[start:stop])
+
+            (meth_df, cov_df) = parse_data_df(data_dset, block_ridx, block_cidx, row_meta, col_meta,
+                                              n_threads=block_threads, validate=validate, layers=layers)
+            block_row_meta = row_meta.iloc[block_ridx]
+            block_col_meta = col_meta.iloc[block_cidx]
+
+            if as_tuples:
+                return (meth_df, cov_df, block_row_meta if axis == "row" else block_col_meta)
+            return GCToo.GCToo(meth_df=meth_df, cov_df=cov_df, row_metadata_df=block_row_meta,
+                               col_metadata_df=block_col_meta, src=full_path, version=my_version)
+
+        if prefetch > 0:
+            other_len = len(sorted_cidx) if axis == "row" else len(sorted_ridx)
+            block_nbytes = chunk_len * other_len * np.dtype(np.float32).itemsize * len(layers)
+            depth = get_prefetch_depth(prefetch, prefetch_max_mb, block_nbytes)
+            for block in prefetch_blocks(read_block, block_bounds, depth):
+                yield block
+        else:
+            for bounds in block_bounds:
+                yield read_block(bounds)
+    finally:
+        gctx_file.close()
+
+
+def get_prefetch_depth(prefetch, prefetch_max_mb, block_nbytes):
+    """
+    Number of blocks to read ahead: prefetch, lowered to what fits in prefetch_max_mb
+    (but at least 1).
+
+    Input:
+        - prefetch (int): requested number of blocks to read ahead
+        - prefetch_max_mb (float or None): memory budget of the blocks read ahead
+        - block_nbytes (int): size in bytes of the largest block
+    Output:
+        - depth (int)
+    """
+    depth = prefetch
+    if prefetch_max_mb is not None and block_nbytes > 0:
+        depth = min(depth, int(prefetch_max_mb * 1024 * 1024 // block_nbytes))
+    if depth < prefetch:
+        logger.debug("Prefetching {} blocks rather than {} to stay within {} MB".format(
+            max(1, depth), prefetch, prefetch_max_mb))
+    return max(1, depth)
+
+
+def prefetch_blocks(read_block, block_args, depth):
+    """
+    Yields read_block(x) for each x of block_args, in order, while a background
+    thread reads up to depth blocks ahead. An exception raised by read_block is
+    raised to the caller when it reaches that block. Closing the generator (or
+    stopping iteration early) cancels the thread and waits for it to finish the
+    block it is reading.
+
+    Input:
+        - read_block (function): reads one block
+        - block_args (list): argument of read_block for each block
+        - depth (int): largest number of blocks read but not yet handed to the caller
+    Output:
+        - generator of read_block results
+    """
+    blocks = queue.Queue()
+    slots = threading.Semaphore(depth)
+    cancelled = threading.Event()
+
+    def read_ahead():
+        for args in block_args:
+            # wait for a free slot, giving up if the consumer went away
+            while not slots.acquire(timeout=prefetch_poll_seconds):
+                if cancelled.is_set():
+                    return
+            if cancelled.is_set():
+                return
+            try:
+                blocks.put((read_block(args), None))
+            except Exception as e:
+                blocks.put((None, e))
+                return
+
+    reader = threading.Thread(target=read_ahead, name="gctx-prefetch", daemon=True)
+    reader.start()
+    try:
+        for _ in range(len(block_args)):
+            (block, error) = blocks.get()
+            if error is not None:
+                raise error
+            # the caller holds this block now, so another can be read ahead
+            slots.release()
+            yield block
+    finally:
+        cancelled.set()
+        reader.join()
+
+
+def get_aligned_block_size(data_dset, axis, block_size):
+    """
+    Rounds block_size to a whole number of HDF5 chunks along axis.
+
+    Input:
+        - data_dset (h5py dset): data matrix
+        - axis (str): "row" or "col"
+        - block_size (int): requested block size
+    Output:
+        - aligned block size (int); block_size itself for unchunked datasets
+    """
+    if data_dset.chunks is None:
+        return max(1, block_size)
+    chunk_len = data_dset.chunks[-1] if axis == "row" else data_dset.chunks[-2]
+    return max(1, block_size // chunk_len) * chunk_len
+
+
 def check_and_order_id_inputs(rid, ridx, cid, cidx, row_meta_df, col_meta_df, sort_row_meta, sort_col_meta):
     """
     Makes sure that (if entered) id inputs entered are of one type (string id or index)
@@ -281,54 +640,288 @@ def get_ordered_idx(id_type, id_list, meta_df, sort_idx):
         return None
 
 
-def parse_metadata_df(dim, meta_group, convert_neg_666):
+def parse_metadata_df(dim, meta_group, convert_neg_666, fields=None, categorical_fields=None, positions=None):
     """
-    Reads in all metadata from .gctx file to pandas DataFrame
+    Reads in metadata from .gctx file to pandas DataFrame
     with proper GCToo specifications.
     Input:
         - dim (str): Dimension of metadata; either "row" or "column"
         - meta_group (HDF5 group): Group from which to read metadata values
         - convert_neg_666 (bool): whether to convert "-666" values to np.nan or not
+        - fields (list of strings): fields to read, in the order they should appear;
+            None reads all of them. The id dataset is always read.
+        - categorical_fields (list of strings): string fields to return as pandas Categorical.
+            Default = None
+        - positions (sorted numpy array of ints): only read the ids and fields at these
+            positions. Default = None (all positions)
     Output:
         - meta_df (pandas DataFrame): data frame corresponding to metadata fields
             of dimension specified.
     """
-    # read values from hdf5 & make a DataFrame
+    categorical_fields = set(categorical_fields or [])
+
+    # read values from hdf5 & decode each field to its final type
     header_values = {}
-    array_index = 0
-    for k in meta_group.keys():
+    ids = None
+    for k in get_metadata_fields_to_read(dim, meta_group, fields):
         curr_dset = meta_group[k]
-        temp_array = np.empty(curr_dset.shape, dtype=curr_dset.dtype)
-        curr_dset.read_direct(temp_array)
-        # convert all values to str in temp_array so that
-        # to_numeric works consistently with gct and gct_x parser
-        temp_array = temp_array.astype('str')
-        header_values[str(k)] = temp_array
-        array_index = array_index + 1
-
+        temp_array = read_metadata_dset(curr_dset, positions)
 
-    meta_df = pd.DataFrame.from_dict(header_values)
+        # the ids are kept as strings, never converted to numeric
+        if k == "id":
+            ids = temp_array.astype("str")
+            continue
 
-    # save the ids for later use in the index; we do not want to convert them to
-    # numeric
-    ids = meta_df["id"].copy()
-    del meta_df["id"]
-
-    # Convert metadata to numeric if possible, after converting everything to string first
-    # Note: This conversion first to string is to ensure consistent behavior between
-    #    the gctx and gct parser (which by default reads the entire text file into a string)
-    meta_df = meta_df.apply(lambda x: pd.to_numeric(x, errors="ignore"))
+        if is_categorical_dset(curr_dset):
+            categories_dset = curr_dset.file[curr_dset.attrs[categories_attr]]
+            values = decode_categorical_values(temp_array, categories_dset[...])
+        else:
+            values = decode_metadata_values(temp_array, str(k) in categorical_fields)
 
-    meta_df.set_index(pd.Index(ids, dtype=str), inplace=True)
+        # Replace -666 and -666.0 with NaN; also replace "-666" if convert_neg_666 is True
+        header_values[str(k)] = replace_666_values(values, convert_neg_666)
 
-    # Replace -666 and -666.0 with NaN; also replace "-666" if convert_neg_666 is True
-    meta_df = replace_666(meta_df, convert_neg_666)
+    meta_df = pd.DataFrame(header_values, index=pd.Index(ids, dtype=str), columns=list(header_values.keys()))
 
     # set index and columns appropriately
     set_metadata_index_and_column_names(dim, meta_df)
     return meta_df
 
 
+def read_metadata_dset(dset, positions=None):
+    """ Reads the values of a metadata dataset, or only those at positions (sorted) if given. """
+    if positions is None:
+        temp_array = np.empty(dset.shape, dtype=dset.dtype)
+        dset.read_direct(temp_array)
+        return temp_array
+    if len(positions) == 0:
+        return dset[0:0]
+    if len(positions) <= metadata_point_read_max:
+        return dset[positions]
+    return dset[positions[0]:positions[-1] + 1][positions - positions[0]]
+
+
+def get_selected_positions(gctx_file, dim, ids, idx, where, convert_neg_666, categorical_fields):
+    """
+    Finds the positions of the rows (or columns) selected by a where expression or, using the
+    id index, by ids. Only the metadata at these positions then needs to be read.
+
+    Input:
+        - gctx_file (h5py File): open gctx file
+        - dim (str): "row" or "col"
+        - ids (list): rid or cid as passed to parse
+        - idx (list): ridx or cidx as passed to parse
+        - where (str): row_where or col_where as passed to parse
+        - convert_neg_666 (bool): whether "-666" values are compared as np.nan in where
+        - categorical_fields (list of strings): fields compared as pandas Categorical in where
+    Output:
+        - positions (sorted numpy array of int64): positions to read; None to read all of them
+    """
+    if where is None:
+        return get_indexed_positions(gctx_file, dim, ids, idx)
+
+    if ids is not None or idx is not None:
+        msg = "{}_where cannot be combined with {} or {}".format(
+            dim, *(["rid", "ridx"] if dim == "row" else ["cid", "cidx"]))
+        logger.error(msg)
+        raise Exception("parse_gctx.get_selected_positions " + msg)
+    return get_where_positions(gctx_file, dim, where, convert_neg_666, categorical_fields)
+
+
+def get_where_positions(gctx_file, dim, where, convert_neg_666, categorical_fields):
+    """
+    Evaluates a where expression on the metadata of dim, reading only the fields it references.
+
+    Input:
+        - gctx_file (h5py File): open gctx file
+        - dim (str): "row" or "col"
+        - where (str): expression in pandas.DataFrame.eval syntax; the ids can be referenced
+            as rid (or cid)
+        - convert_neg_666 (bool): whether "-666" values are compared as np.nan
+        - categorical_fields (list of strings): fields decoded as pandas Categorical
+    Output:
+        - positions (sorted numpy array of int64): positions whose metadata matches where
+    """
+    meta_group = gctx_file[row_meta_group_node if dim == "row" else col_meta_group_node]
+
+    # names in the expression, bare or `quoted`, that are metadata fields
+    names = set(re.findall(r"[A-Za-z_]\w*", where)) | set(re.findall(r"`([^`]*)`", where))
+    fields = [k for k in meta_group.keys() if k != "id" and k in names]
+
+    meta_df = parse_metadata_df(dim, meta_group, convert_neg_666, fields=fields,
+                                categorical_fields=categorical_fields)
+    try:
+        mask = meta_df.eval(where)
+    except Exception as e:
+        msg = "could not evaluate {}_where {!r}: {}".format(dim, where, e)
+        logger.error(msg)
+        raise Exception("parse_gctx.get_where_positions " + msg)
+
+    if getattr(mask, "dtype", None) != np.bool_ or len(mask) != len(meta_df):
+        msg = "{}_where {!r} must evaluate to one True/False value per {}".format(dim, where, dim)
+        logger.error(msg)
+        raise Exception("parse_gctx.get_where_positions " + msg)
+    return np.flatnonzero(mask.values)
+
+
+def get_indexed_positions(gctx_file, dim, ids, idx):
+    """
+    Finds the positions of ids with the id index of the file (see index_gctx), so that only
+    their metadata needs to be read.
+
+    Input:
+        - gctx_file (h5py File): open gctx file
+        - dim (str): "row" or "col"
+        - ids (list): rid or cid as passed to parse
+        - idx (list): ridx or cidx as passed to parse
+    Output:
+        - positions (sorted numpy array of int64): distinct positions of the ids found in the
+            file; None if ids is not given or the file has no usable index, in which case all
+            metadata is read. Ids not found are left out, to be reported by check_id_validity.
+    """
+    if ids is None or idx is not None or not index_gctx.has_index(gctx_file, dim):
+        return None
+    positions = index_gctx.lookup_positions(gctx_file, dim, ids)
+    return np.unique(positions[positions >= 0])
+
+
+def decode_metadata_values(values, as_categorical=False):
+    """
+    Decodes the values of one metadata dataset, giving the same result as converting
+    them to str and then to numeric where possible (which keeps .gctx parsing
+    consistent with the .gct parser), without creating a str per value:
+        - integer datasets become int64
+        - float64 datasets are kept; narrower floats go through their shortest decimal
+            representation, as the str conversion did
+        - string datasets are decoded per distinct value; if every distinct value is
+            numeric the field becomes numeric, otherwise it stays str
+
+    Input:
+        - values (numpy array): values read from the dataset
+        - as_categorical (bool): whether to return a string field as a pandas Categorical
+    Output:
+        - decoded (numpy array or pandas Categorical)
+    """
+    kind = values.dtype.kind
+    if kind in "iu":
+        if kind == "u" and values.dtype.itemsize == 8 and values.size and values.max() > np.iinfo(np.int64).max:
+            return values
+        return values.astype(np.int64)
+    if kind == "f":
+        if values.dtype.itemsize == 8:
+            return values
+        return values.astype("str").astype(np.float64)
+
+    # strings (and anything else): work on the distinct values only
+    (uniques, inverse) = np.unique(values, return_inverse=True)
+    uniques = uniques.astype("str")
+    try:
+        numeric_uniques = pd.to_numeric(uniques)
+    except (ValueError, TypeError):
+        numeric_uniques = None
+    if numeric_uniques is not None:
+        return numeric_uniques[inverse]
+    if as_categorical:
+        return pd.Categorical.from_codes(inverse, categories=uniques)
+    return uniques.astype(object)[inverse]
+
+
+def is_categorical_dset(dset):
+    """ Whether dset is a dictionary encoded metadata field (see write_gctx.write_categorical_field). """
+    attrs = getattr(dset, "attrs", {})
+    return attrs.get(encoding_attr) == categorical_encoding
+
+
+def decode_categorical_values(codes, categories):
+    """
+    Decodes a dictionary encoded metadata field into a pandas Categorical, without
+    expanding the distinct values. As for other fields, if every distinct value is
+    numeric the field is returned as a numeric array instead.
+
+    Input:
+        - codes (numpy array): integer codes; -1 marks missing values
+        - categories (numpy array): distinct values, as stored
+    Output:
+        - decoded (pandas Categorical or numpy array)
+    """
+    categories = categories.astype("str")
+    try:
+        numeric_categories = pd.to_numeric(categories)
+    except (ValueError, TypeError):
+        numeric_categories = None
+
+    if numeric_categories is None or len(categories) == 0:
+        return pd.Categorical.from_codes(codes, categories=categories)
+
+    missing = codes < 0
+    if not missing.any():
+        return numeric_categories[codes]
+    values = numeric_categories.astype(np.float64)[np.where(missing, 0, codes)]
+    values[missing] = np.nan
+    return values
+
+
+def replace_666_values(values, convert_neg_666):
+    """
+    Per-field version of replace_666: replaces -666 and -666.0 with NaN, or with "-666"
+    if convert_neg_666 is False; also replaces "-666" with NaN if convert_neg_666 is True.
+
+    Input:
+        - values (numpy array or pandas Categorical): decoded values of one field
+        - convert_neg_666 (bool)
+    Output:
+        - values (numpy array or pandas Categorical): a modified copy, or values itself
+            if no value was replaced
+    """
+    if isinstance(values, pd.Categorical):
+        if convert_neg_666 and "-666" in values.categories:
+            values = values.remove_categories("-666")
+        return values
+
+    if values.dtype.kind in "iuf":
+        mask = values == -666
+        if not mask.any():
+            return values
+        if convert_neg_666:
+            out = values.astype(np.float64)
+            out[mask] = np.nan
+        else:
+            out = values.astype(object)
+            out[mask] = "-666"
+        return out
+
+    if convert_neg_666:
+        mask = values == "-666"
+        if mask.any():
+            values = values.copy()
+            values[mask] = np.nan
+    return values
+
+
+def get_metadata_fields_to_read(dim, meta_group, fields):
+    """
+    Lists the datasets of meta_group to read: id followed by fields, or all of
+    them if fields is None.
+
+    Input:
+        - dim (str): Dimension of metadata; either "row" or "col"
+        - meta_group (HDF5 group): Group of metadata datasets
+        - fields (list of strings or None): requested fields
+    Output:
+        - keys (list of strings): names of the datasets to read
+    """
+    if fields is None:
+        return list(meta_group.keys())
+
+    missing_fields = [f for f in fields if f not in meta_group]
+    if len(missing_fields) > 0:
+        msg = "the following {} metadata fields were not found in the file: {}".format(dim, missing_fields)
+        logger.error(msg)
+        raise Exception("parse_gctx.get_metadata_fields_to_read " + msg)
+
+    return ["id"] + [f for f in fields if f != "id"]
+
+
 def replace_666(meta_df, convert_neg_666):
     """ Replace -666, -666.0, and optionally "-666".
     Args:
@@ -362,7 +955,8 @@ def set_metadata_index_and_column_names(dim, meta_df):
         meta_df.columns.name = "chd"
 
 
-def parse_data_df(data_dset, ridx, cidx, row_meta, col_meta):
+def parse_data_df(data_dset, ridx, cidx, row_meta, col_meta, n_threads=1, validate="none",
+                  row_positions=None, col_positions=None, layers=data_layers):
     """
     Parses in data_df from hdf5, subsetting if specified.
 
@@ -374,51 +968,740 @@ def parse_data_df(data_dset, ridx, cidx, row_meta, col_meta):
             (may be all of them if no subsetting)
         -row_meta (pandas DataFrame): the parsed in row metadata
         -col_meta (pandas DataFrame): the parsed in col metadata
+        -n_threads (int): number of threads to decompress chunks with
+        -validate (str): "none", "fast" or "full"; see validate_data_array
+        -row_positions (numpy array): file positions of the rows of row_meta, when it only
+            holds some of the file's rows (ridx then indexes row_meta, not the file)
+        -col_positions (numpy array): file positions of the columns of col_meta, as row_positions
+        -layers (tuple of str): planes to read, out of data_layers; a plane that is not read
+            (or not stored) is returned as GCToo.make_missing_plane_df
     """
-    total_rows = len(row_meta.index)
-    total_cols = len(col_meta.index)
-    if len(ridx) == total_rows and len(cidx) == total_cols:  # no subset
-        data_array = np.empty(data_dset.shape, dtype=np.float32)
-        data_dset.read_direct(data_array)
-        if data_array.ndim > 2:
-            meth_array = data_array[0, :, :].transpose()
-            cov_array = data_array[1, :, :].transpose()
+    layers = check_layers(layers)
+    check_validation_level(validate)
+
+    file_ridx = ridx if row_positions is None else list(row_positions[ridx])
+    file_cidx = cidx if col_positions is None else list(col_positions[cidx])
+    planes = read_data_array(data_dset, file_ridx, file_cidx, n_threads=n_threads, layers=layers)
+    return make_data_dfs(data_dset, planes, row_meta.index[ridx], col_meta.index[cidx], validate)
+
+
+def map_data_df(data_dset, ridx, cidx, row_meta, col_meta, validate="none",
+                row_positions=None, col_positions=None, layers=data_layers):
+    """
+    As parse_data_df, but memory maps the data matrix instead of reading it; see
+    can_memory_map. If ridx and cidx each select a run of consecutive positions
+    (e.g. no subsetting), meth_df and cov_df are read-only views of the file, in its
+    storage dtype, and pages are only read when their values are used; otherwise only
+    the selected cells are copied out of the mapping. Integer coverage (see
+    write_gctx.write's cov_dtype) has to be converted, so it is read as by parse_data_df.
+
+    Input:
+        - data_dset (h5py dset): contiguous, unfiltered data matrix
+        - ridx, cidx, row_meta, col_meta, validate, row_positions, col_positions, layers:
+            as for parse_data_df
+    Output:
+        - data_dfs (list of pandas DataFrames): [meth_df, cov_df]
+    """
+    layers = check_layers(layers)
+    check_validation_level(validate)
+
+    file_ridx = ridx if row_positions is None else list(row_positions[ridx])
+    file_cidx = cidx if col_positions is None else list(col_positions[cidx])
+    mapped = np.memmap(data_dset.file.filename, dtype=data_dset.dtype, mode="r",
+                       offset=data_dset.id.get_offset(), shape=data_dset.shape)
+    if mapped.ndim == 2:
+        mapped = mapped[np.newaxis]
+    row_selection = get_run_slice(file_ridx)
+    col_selection = get_run_slice(file_cidx)
+
+    planes = {}
+    for (plane, layer) in enumerate(data_layers):
+        if layer in layers and plane < mapped.shape[0]:
+            planes[layer] = mapped[plane][col_selection, :][:, row_selection]
+    if "cov" in layers and get_cov_dset(data_dset) is not None:
+        planes.update(read_data_array(data_dset, file_ridx, file_cidx, layers=("cov",)))
+    return make_data_dfs(data_dset, planes, row_meta.index[get_run_slice(ridx)],
+                         col_meta.index[get_run_slice(cidx)], validate)
+
+
+def can_memory_map(data_dset):
+    """
+    Whether the bytes of data_dset can be memory mapped: it must be stored
+    contiguously (so unfiltered) in a plain file, in native byte order.
+    """
+    return (data_dset.chunks is None and not data_dset.is_virtual and data_dset.external is None and
+            data_dset.file.driver == "sec2" and data_dset.dtype.isnative and
+            data_dset.id.get_offset() is not None)
+
+
+def get_run_slice(idx):
+    """ idx as a slice if it is one increasing run of consecutive positions, otherwise as an array. """
+    idx = np.asarray(idx, dtype=np.int64)
+    if len(idx) > 0 and (np.diff(idx) == 1).all():
+        return slice(int(idx[0]), int(idx[-1]) + 1)
+    return idx
+
+
+def check_validation_level(validate):
+    if validate not in validation_levels:
+        msg = "Invalid validate: {}; must be one of {}".format(validate, validation_levels)
+        logger.error(msg)
+        raise Exception("parse_gctx.check_validation_level " + msg)
+
+
+def make_data_dfs(data_dset, planes, row_ids, col_ids, validate):
+    """
+    Validates the planes read from data_dset and wraps them into DataFrames.
+
+    Input:
+        - data_dset (h5py dset): data matrix the planes were read from
+        - planes (dict): output of read_data_array
+        - row_ids (pandas Index): rids of the planes
+        - col_ids (pandas Index): cids of the planes
+        - validate (str): "none", "fast" or "full"; see validate_data_array
+    Output:
+        - data_dfs (list of pandas DataFrames): [meth_df, cov_df]; a plane missing from planes
+            is a GCToo.make_missing_plane_df placeholder
+    """
+    # integer coverage needs no integer check
+    check_cov = get_cov_dset(data_dset) is None
+    validate_data_array([planes.get("meth"), planes.get("cov")], row_ids, col_ids, validate, check_cov)
+
+    # make DataFrame instances
+    data_dfs = []
+    for layer in data_layers:
+        if planes.get(layer) is None:
+            data_dfs.append(GCToo.make_missing_plane_df(row_ids, col_ids))
         else:
-            meth_array = data_array[:, :].transpose()
-            cov_array = np.empty(data_array.shape, dtype=np.float32).transpose()
+            data_dfs.append(pd.DataFrame(planes[layer].transpose(), index=row_ids, columns=col_ids))
+    return data_dfs
+
+
+def validate_data_array(data_array, row_ids, col_ids, validate, check_cov=True):
+    """
+    Checks a data array as read from the data matrix, one block of columns at a
+    time so that temporaries stay small. Raises on the first block with offending
+    cells and lists the first of them with their rid and cid.
+
+    Checks:
+        - "none": nothing
+        - "fast": methylation values are at most 100 (NaN is allowed)
+        - "full": as "fast"; also, coverage values are integers (NaN is allowed)
+
+    Input:
+        - data_array (numpy array or list): (2, len(col_ids), len(row_ids)) array, or
+            [meth, cov] planes shaped (len(col_ids), len(row_ids)), either of which may be
+            None if it was not read; a 2-D array is a methylation plane alone
+        - row_ids (pandas Index): rids of the last axis of data_array
+        - col_ids (pandas Index): cids of the second to last axis of data_array
+        - validate (str): "none", "fast" or "full"
+        - check_cov (bool): whether data_array holds a coverage plane to check
+    """
+    if isinstance(data_array, np.ndarray) and data_array.ndim == 2:
+        data_array = [data_array]
+    meth_plane = data_array[0]
+    cov_plane = data_array[1] if len(data_array) > 1 and check_cov else None
+    if validate == "none" or len(row_ids) == 0 or len(col_ids) == 0:
+        return
+
+    n_rows = len(row_ids)
+    block_cols = max(1, validate_block_cells // max(n_rows, 1))
+    for start in range(0, len(col_ids), block_cols):
+        if meth_plane is not None:
+            meth_block = meth_plane[start:start + block_cols, :]
+            with np.errstate(invalid="ignore"):
+                bad = meth_block > 100
+            report_invalid_cells(bad, meth_block, row_ids, col_ids[start:],
+                                 "methylation values must be at most 100")
+
+        if validate == "full" and cov_plane is not None:
+            cov_block = cov_plane[start:start + block_cols, :]
+            with np.errstate(invalid="ignore"):
+                bad = np.isinf(cov_block)
+                bad |= np.mod(cov_block, 1) > 0
+            report_invalid_cells(bad, cov_block, row_ids, col_ids[start:], "coverage values must be integers")
+
+
+def report_invalid_cells(bad, block, row_ids, col_ids, problem):
+    """
+    Raises if any cell of bad is True, naming the first offending cells.
+
+    Input:
+        - bad (numpy array of bool): (ncol, nrow) mask of offending cells
+        - block (numpy array): (ncol, nrow) values the mask was computed from
+        - row_ids (pandas Index): rids of the last axis of block
+        - col_ids (pandas Index): cids of the first axis of block
+        - problem (str): description of the failed check
+    """
+    if not bad.any():
+        return
+    offenders = np.argwhere(bad)
+    cells = [(row_ids[r], col_ids[c], block[c, r]) for (c, r) in offenders[:validate_max_reported]]
+    msg = "{}; found at least {} offending cells, first (rid, cid, value): {}".format(problem, len(offenders), cells)
+    logger.error(msg)
+    raise Exception("parse_gctx.validate_data_array " + msg)
+
+
+def read_data_array(data_dset, ridx, cidx, n_threads=1, layers=data_layers):
+    """
+    Reads the cells at the intersection of ridx and cidx from the requested planes
+    of the data matrix; other planes are neither read nor allocated. If the file
+    stores coverage as a separate integer dataset (see write_gctx.write's cov_dtype),
+    it is converted to float32, with its missing value sentinel turned into NaN.
+
+    Input:
+        - data_dset (h5py dset): HDF5 data matrix dataset
+        - ridx (list): row indexes to read (last axis of data_dset)
+        - cidx (list): column indexes to read (second to last axis of data_dset)
+        - n_threads (int): number of threads to decompress chunks with
+        - layers (tuple of str): planes to read, out of data_layers. Default = both
+    Output:
+        - planes (dict): for each of layers, a float32 array shaped (len(cidx), len(ridx)),
+            ordered as ridx/cidx; None for coverage if the file has no coverage plane
+    """
+    planes = {}
+    cov_dset = get_cov_dset(data_dset)
+    if data_dset.ndim == 2:
+        # methylation only
+        if "meth" in layers:
+            planes["meth"] = read_dataset(data_dset, ridx, cidx, n_threads)
+        if "cov" in layers:
+            planes["cov"] = None
+        return planes
+
+    if cov_dset is None and "meth" in layers and "cov" in layers:
+        # both planes in a single pass
+        data_array = read_dataset(data_dset, ridx, cidx, n_threads)
+        return {"meth": data_array[0], "cov": data_array[1]}
+
+    if "meth" in layers:
+        planes["meth"] = read_dataset(data_dset, ridx, cidx, n_threads, plane=0)[0]
+    if "cov" in layers and cov_dset is None:
+        planes["cov"] = read_dataset(data_dset, ridx, cidx, n_threads, plane=1)[0]
+    elif "cov" in layers:
+        cov_array = read_dataset(cov_dset, ridx, cidx, n_threads, dtype=cov_dset.dtype)[0]
+        planes["cov"] = cov_array.astype(np.float32)
+        planes["cov"][cov_array == cov_dset.attrs[cov_missing_attr]] = np.nan
+    return planes
+
+
+def check_layers(layers):
+    """
+    Checks the layers requested from the data matrix.
+
+    Input:
+        - layers (str or sequence of str): "meth", "cov" or both
+    Output:
+        - layers (tuple of str): the requested layers, in data_layers order
+    """
+    if isinstance(layers, str):
+        layers = (layers,)
+    unknown = [x for x in layers if x not in data_layers]
+    if len(unknown) > 0 or len(layers) == 0:
+        msg = "Invalid layers: {}; must be one or more of {}".format(layers, data_layers)
+        logger.error(msg)
+        raise Exception("parse_gctx.check_layers " + msg)
+    return tuple(x for x in data_layers if x in layers)
+
+
+def get_cov_dset(data_dset):
+    """
+    Returns the integer coverage dataset stored next to data_dset, or None if there is none.
+    It is opened with the access properties (chunk cache) of data_dset.
+    """
+    if data_dset.shape[:-2] == (1,) and cov_node in data_dset.file:
+        dapl = data_dset.id.get_access_plist()
+        return h5py.Dataset(h5py.h5d.open(data_dset.file.id, cov_node.encode(), dapl=dapl))
+    return None
+
+
+def open_data_dset(gctx_file, ridx, cidx, rdcc_nbytes=None, rdcc_nslots=None, rdcc_w0=None):
+    """
+    Opens the data matrix with its own raw data chunk cache. HDF5 shares one cache between
+    handles on the same dataset, so the settings only take effect if the data matrix is not
+    already open.
+
+    Input:
+        - gctx_file (h5py File): open gctx file
+        - ridx (list): file positions of the rows that will be read
+        - cidx (list): file positions of the columns that will be read
+        - rdcc_nbytes (int or "auto"): size of the chunk cache in bytes; "auto" sizes it with
+            get_auto_chunk_cache. None keeps the file default
+        - rdcc_nslots (int): number of hash table slots of the chunk cache; None keeps the file
+            default, or with rdcc_nbytes="auto", sizes it too
+        - rdcc_w0 (float): chunk preemption policy, between 0 and 1; None keeps the file default
+    Output:
+        - data_dset (h5py dset)
+    """
+    if rdcc_nbytes is None and rdcc_nslots is None and rdcc_w0 is None:
+        return check_virtual_sources(gctx_file[data_node])
+
+    (_, nslots, nbytes, w0) = gctx_file.id.get_access_plist().get_cache()
+    if rdcc_nbytes == auto_chunk_cache:
+        (nbytes, auto_nslots) = get_auto_chunk_cache(gctx_file[data_node], ridx, cidx, nbytes, nslots)
+        nslots = auto_nslots if rdcc_nslots is None else rdcc_nslots
+    elif isinstance(rdcc_nbytes, str):
+        msg = "Invalid rdcc_nbytes: {}; must be a number of bytes or {!r}".format(rdcc_nbytes, auto_chunk_cache)
+        logger.error(msg)
+        raise Exception("parse_gctx.open_data_dset " + msg)
+    elif rdcc_nbytes is not None:
+        nbytes = rdcc_nbytes
+    if rdcc_nslots is not None:
+        nslots = rdcc_nslots
+    if rdcc_w0 is not None:
+        w0 = rdcc_w0
+
+    dapl = h5py.h5p.create(h5py.h5p.DATASET_ACCESS)
+    dapl.set_chunk_cache(int(nslots), int(nbytes), float(w0))
+    return check_virtual_sources(h5py.Dataset(h5py.h5d.open(gctx_file.id, data_node.encode(), dapl=dapl)))
+
+
+def check_virtual_sources(data_dset):
+    """
+    Checks that the source files of a virtual data matrix (see virtual_gctx) exist;
+    HDF5 would silently read the fill value for those that are missing.
+
+    Input:
+        - data_dset (h5py dset): data matrix
+    Output:
+        - data_dset (h5py dset): the same dataset
+    """
+    if not data_dset.is_virtual:
+        return data_dset
+    file_dir = os.path.dirname(os.path.abspath(data_dset.file.filename))
+    missing = sorted(set(
+        source.file_name for source in data_dset.virtual_sources()
+        if source.file_name != "." and not os.path.exists(os.path.join(file_dir, source.file_name))))
+    if len(missing) > 0:
+        msg = "{} source files of the virtual data matrix of {} are missing: {}".format(
+            len(missing), data_dset.file.filename, missing)
+        logger.error(msg)
+        raise Exception("parse_gctx.check_virtual_sources " + msg)
+    return data_dset
+
+
+def get_auto_chunk_cache(data_dset, ridx, cidx, default_nbytes, default_nslots):
+    """
+    Sizes the chunk cache for a read of ridx x cidx. read_data_subset touches each chunk once
+    with its "full" and "chunks" strategies, but its "runs" strategy reads hyperslabs that can
+    share chunks; for those reads the cache is made large enough (up to auto_rdcc_max_nbytes)
+    to hold every chunk the read touches, so each is decompressed only once. A larger cache
+    than needed only adds copies, so other reads keep the default.
+
+    Input:
+        - data_dset (h5py dset): data matrix
+        - ridx (list): file positions of the rows that will be read
+        - cidx (list): file positions of the columns that will be read
+        - default_nbytes (int): cache size when no larger cache is needed
+        - default_nslots (int): number of hash table slots when no larger cache is needed
+    Output:
+        - (nbytes, nslots): cache size and number of hash table slots
+    """
+    chunks = data_dset.chunks
+    if chunks is None:
+        return (default_nbytes, default_nslots)
+
+    sorted_ridx = np.unique(np.asarray(ridx, dtype=np.int64))
+    sorted_cidx = np.unique(np.asarray(cidx, dtype=np.int64))
+    if choose_read_strategy(data_dset, sorted_ridx, sorted_cidx) != "runs":
+        return (default_nbytes, default_nslots)
+
+    n_plane_chunks = -(-int(np.prod(data_dset.shape[:-2])) // int(np.prod(chunks[:-2])))
+    n_row_chunks = len(np.unique(sorted_ridx // chunks[-1]))
+    n_col_chunks = len(np.unique(sorted_cidx // chunks[-2]))
+
+    # runs that never share a chunk decompress each chunk once anyway
+    row_chunks_per_run = sum((stop - 1) // chunks[-1] - start // chunks[-1] + 1
+                             for (_, start, stop) in get_contiguous_runs(sorted_ridx))
+    col_chunks_per_run = sum((stop - 1) // chunks[-2] - start // chunks[-2] + 1
+                             for (_, start, stop) in get_contiguous_runs(sorted_cidx))
+    if row_chunks_per_run * col_chunks_per_run <= n_row_chunks * n_col_chunks:
+        return (default_nbytes, default_nslots)
+
+    chunk_nbytes = int(np.prod(chunks)) * data_dset.dtype.itemsize
+    nbytes = min(max(n_plane_chunks * n_col_chunks * n_row_chunks * chunk_nbytes, default_nbytes),
+                 max(auto_rdcc_max_nbytes, default_nbytes))
+
+    nslots = get_next_prime(max(default_nslots, auto_rdcc_slots_per_chunk * (nbytes // chunk_nbytes)))
+    return (nbytes, nslots)
+
+
+def get_next_prime(n):
+    """ Smallest prime >= n; HDF5 spreads chunks best over a prime number of cache slots. """
+    n = max(int(n), 2)
+    while any(n % d == 0 for d in range(2, int(n ** 0.5) + 1)):
+        n += 1
+    return n
+
+
+def read_dataset(dset, ridx, cidx, n_threads=1, dtype=np.float32, plane=None):
+    """
+    Reads the cells at the intersection of ridx and cidx from a single dataset,
+    picking the parallel, full or subset reader.
+
+    Input:
+        - dset (h5py dset): HDF5 dataset to read
+        - ridx (list): row indexes to read (last axis of dset)
+        - cidx (list): column indexes to read (second to last axis of dset)
+        - n_threads (int): number of threads to decompress chunks with
+        - dtype (numpy dtype): data type of the returned array
+        - plane (int): only read this position of the leading (plane) axis of a 3-D dset;
+            the other planes are neither read nor allocated. Default = None (all planes)
+    Output:
+        - data_array (numpy array): shaped (..., len(cidx), len(ridx)), ordered as ridx/cidx;
+            the leading axis has length 1 if plane is given
+    """
+    if n_threads > 1 and can_read_parallel(dset):
+        return read_data_parallel(dset, ridx, cidx, n_threads, dtype=dtype, plane=plane)
+    if is_full_selection(ridx, dset.shape[-1]) and is_full_selection(cidx, dset.shape[-2]):  # no subset
+        data_array = np.empty(get_plane_shape(dset, plane) + dset.shape[-2:], dtype=dtype)
+        if data_array.size > 0:
+            dset.read_direct(data_array, source_sel=get_plane_selection(plane))
+        return data_array
+    return read_data_subset(dset, ridx, cidx, dtype=dtype, plane=plane)
+
+
+def get_plane_shape(dset, plane):
+    """ Shape of the leading (plane) axes read from dset when reading plane (None for all). """
+    return dset.shape[:-2] if plane is None else (1,)
+
+
+def get_plane_selection(plane):
+    """ Selection of the leading (plane) axes of a dataset for plane (None for all). """
+    if plane is None:
+        return np.s_[...]
+    return np.s_[plane:plane + 1]
+
+
+def is_full_selection(idx, n):
+    """ Whether idx selects all n positions in order. """
+    idx = np.asarray(idx)
+    return len(idx) == n and (n == 0 or (idx[0] == 0 and np.all(np.diff(idx) == 1)))
+
+
+def read_data_subset(data_dset, ridx, cidx, dtype=np.float32, plane=None):
+    """
+    Reads the cells at the intersection of ridx and cidx from the data matrix,
+    touching each HDF5 chunk at most once. Both planes of a 3-D matrix are read
+    in the same pass.
+
+    Input:
+        - data_dset (h5py dset): HDF5 dataset from which to read; either
+            (2, ncol, nrow) or (ncol, nrow)
+        - ridx (list): row indexes to read (last axis of data_dset)
+        - cidx (list): column indexes to read (second to last axis of data_dset)
+        - dtype (numpy dtype): data type of the returned array. Default = float32
+        - plane (int): only read this plane of a 3-D data_dset. Default = None (all planes)
+    Output:
+        - data_array (numpy array): array with the same number of dimensions as
+            data_dset, shaped (..., len(cidx), len(ridx)) and ordered as ridx/cidx
+    """
+    ridx = np.asarray(ridx, dtype=np.int64)
+    cidx = np.asarray(cidx, dtype=np.int64)
+
+    # plan on sorted indexes; the requested order is restored at the end
+    r_order = np.argsort(ridx, kind="mergesort")
+    c_order = np.argsort(cidx, kind="mergesort")
+    sorted_ridx = ridx[r_order]
+    sorted_cidx = cidx[c_order]
+
+    plane_shape = get_plane_shape(data_dset, plane)
+    lead = get_plane_selection(plane)
+    if not isinstance(lead, tuple):
+        lead = (lead,)
+
+    strategy = choose_read_strategy(data_dset, sorted_ridx, sorted_cidx, n_planes=int(np.prod(plane_shape)))
+    logger.debug("Reading {} rows x {} columns from {} using strategy: {}".format(
+        len(ridx), len(cidx), data_dset.name, strategy))
+
+    out_shape = plane_shape + (len(sorted_cidx), len(sorted_ridx))
+    data_array = np.empty(out_shape, dtype=dtype)
+
+    if strategy == "full":
+        full_array = np.empty(plane_shape + data_dset.shape[-2:], dtype=dtype)
+        data_dset.read_direct(full_array, source_sel=get_plane_selection(plane))
+        data_array[...] = full_array[..., sorted_cidx, :][..., sorted_ridx]
+    elif strategy == "runs":
+        row_runs = get_contiguous_runs(sorted_ridx)
+        col_runs = get_contiguous_runs(sorted_cidx)
+        for (c_pos, c_start, c_stop) in col_runs:
+            for (r_pos, r_start, r_stop) in row_runs:
+                data_array[..., c_pos:c_pos + c_stop - c_start, r_pos:r_pos + r_stop - r_start] = \
+                    data_dset[lead + (slice(c_start, c_stop), slice(r_start, r_stop))]
     else:
-        # We can only subset on a single dimension at a time with h5py.
-        # For the first dimension to use, pick the one that minimizes
-        # the size of the intermediate array.
-        row_first_count = total_cols * len(ridx)
-        col_first_count = total_rows * len(cidx)
-        if row_first_count < col_first_count:
-            if data_dset.ndim > 2:
-                first_subset_meth = data_dset[0, :, ridx].astype(np.float32)
-                first_subset_cov = data_dset[1, :, ridx].astype(np.float32)
-            else:
-                first_subset_meth = data_dset[:, ridx].astype(np.float32)
-                first_subset_cov = np.empty(data_dset[:, ridx].shape, dtype=np.float32)
-            meth_array = first_subset_meth[cidx, :].transpose()
-            cov_array = first_subset_cov[cidx, :].transpose()
+        chunk_shape = data_dset.chunks
+        row_groups = get_chunk_groups(sorted_ridx, chunk_shape[-1])
+        col_groups = get_chunk_groups(sorted_cidx, chunk_shape[-2])
+        for (c_pos_start, c_pos_stop) in col_groups:
+            c_wanted = sorted_cidx[c_pos_start:c_pos_stop]
+            c_start = c_wanted[0]
+            for (r_pos_start, r_pos_stop) in row_groups:
+                r_wanted = sorted_ridx[r_pos_start:r_pos_stop]
+                r_start = r_wanted[0]
+                # smallest hyperslab inside this chunk that covers every wanted cell
+                block = data_dset[lead + (slice(c_start, c_wanted[-1] + 1), slice(r_start, r_wanted[-1] + 1))]
+                data_array[..., c_pos_start:c_pos_stop, r_pos_start:r_pos_stop] = \
+                    block[..., c_wanted - c_start, :][..., r_wanted - r_start]
+
+    return restore_requested_order(data_array, r_order, c_order)
+
+
+def restore_requested_order(data_array, r_order, c_order):
+    """
+    Puts a (..., ncol, nrow) array that was filled in sorted index order back
+    into the order the indexes were requested in.
+
+    Input:
+        - data_array (numpy array): array filled in sorted order
+        - r_order (numpy array): argsort of the requested row indexes
+        - c_order (numpy array): argsort of the requested column indexes
+    Output:
+        - data_array (numpy array): the same array, reordered in place if needed
+    """
+    if np.any(np.diff(r_order) < 0):
+        data_array[..., :, r_order] = data_array.copy()
+    if np.any(np.diff(c_order) < 0):
+        data_array[..., c_order, :] = data_array.copy()
+    return data_array
+
+
+def can_read_parallel(data_dset):
+    """
+    Whether read_data_parallel can decode the raw chunks of data_dset: the dataset
+    must be chunked and compressed with gzip (optionally with the shuffle filter),
+    and use no other filter.
+    """
+    return (data_dset.chunks is not None and data_dset.compression == "gzip" and
+            not data_dset.fletcher32 and data_dset.scaleoffset is None)
+
+
+def read_data_parallel(data_dset, ridx, cidx, n_threads, dtype=np.float32, plane=None):
+    """
+    Reads the cells at the intersection of ridx and cidx by fetching raw compressed
+    chunks (read_direct_chunk) and inflating them with zlib in a thread pool;
+    zlib releases the GIL, so chunks are decompressed on several cores at once.
+    Each touched chunk is read and decompressed exactly once. Only the calling
+    thread makes HDF5 calls (HDF5 is not thread-safe); the pool only decompresses.
+
+    Input:
+        - data_dset (h5py dset): chunked, gzip compressed dataset; see can_read_parallel
+        - ridx (list): row indexes to read (last axis of data_dset)
+        - cidx (list): column indexes to read (second to last axis of data_dset)
+        - n_threads (int): size of the thread pool
+        - dtype (numpy dtype): data type of the returned array. Default = float32
+        - plane (int): only read the chunks of this plane of a 3-D data_dset. Default = None (all planes)
+    Output:
+        - data_array (numpy array): array shaped (..., len(cidx), len(ridx))
+    """
+    ridx = np.asarray(ridx, dtype=np.int64)
+    cidx = np.asarray(cidx, dtype=np.int64)
+    r_order = np.argsort(ridx, kind="mergesort")
+    c_order = np.argsort(cidx, kind="mergesort")
+    sorted_ridx = ridx[r_order]
+    sorted_cidx = cidx[c_order]
+
+    chunk_shape = data_dset.chunks
+    plane_shape = data_dset.shape[:-2]
+    chunk_dtype = data_dset.dtype
+    shuffled = data_dset.shuffle
+    data_array = np.empty(get_plane_shape(data_dset, plane) + (len(sorted_cidx), len(sorted_ridx)), dtype=dtype)
+
+    # leading (plane) axis: every chunk along it is needed, or only the one holding plane
+    if not plane_shape:
+        plane_starts = [None]
+    elif plane is None:
+        plane_starts = list(range(0, plane_shape[0], chunk_shape[0]))
+    else:
+        plane_starts = [(plane // chunk_shape[0]) * chunk_shape[0]]
+
+    tasks = []
+    for p_start in plane_starts:
+        for (c_pos_start, c_pos_stop) in get_chunk_groups(sorted_cidx, chunk_shape[-2]):
+            for (r_pos_start, r_pos_stop) in get_chunk_groups(sorted_ridx, chunk_shape[-1]):
+                tasks.append((p_start, c_pos_start, c_pos_stop, r_pos_start, r_pos_stop))
+
+    def get_origin(task):
+        (p_start, c_pos_start, _, r_pos_start, _) = task
+        c_origin = (sorted_cidx[c_pos_start] // chunk_shape[-2]) * chunk_shape[-2]
+        r_origin = (sorted_ridx[r_pos_start] // chunk_shape[-1]) * chunk_shape[-1]
+        return (c_origin, r_origin) if p_start is None else (p_start, c_origin, r_origin)
+
+    def place_chunk(task, raw):
+        (p_start, c_pos_start, c_pos_stop, r_pos_start, r_pos_stop) = task
+        origin = get_origin(task)
+        c_wanted = sorted_cidx[c_pos_start:c_pos_stop]
+        r_wanted = sorted_ridx[r_pos_start:r_pos_stop]
+        chunk = decode_chunk(raw, chunk_shape, chunk_dtype, shuffled)
+        block = chunk[..., c_wanted - origin[-2], :][..., r_wanted - origin[-1]]
+        if p_start is None:
+            out_planes = ()
+        elif plane is None:
+            out_planes = (slice(p_start, min(p_start + chunk_shape[0], plane_shape[0])),)
+            block = block[:out_planes[0].stop - p_start]
         else:
-            if data_dset.ndim > 2:
-                first_subset_meth = data_dset[0, cidx, :].astype(np.float32)
-                first_subset_cov = data_dset[1, cidx, :].astype(np.float32)
-            else:
-                first_subset_meth = data_dset[cidx, :].astype(np.float32)
-                first_subset_cov = np.empty(data_dset[cidx, :].shape, dtype=np.float32)
-            meth_array = first_subset_meth[:, ridx].transpose()
-            cov_array = first_subset_cov[:, ridx].transpose()
+            out_planes = (slice(0, 1),)
+            block = block[plane - p_start:plane - p_start + 1]
+        data_array[out_planes + (slice(c_pos_start, c_pos_stop), slice(r_pos_start, r_pos_stop))] = block
+
+    logger.debug("Decompressing {} chunks of {} using {} threads".format(len(tasks), data_dset.name, n_threads))
+    futures = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=n_threads) as executor:
+        for task in tasks:
+            # bound the raw chunks waiting to be decompressed
+            pending = [future for future in futures[-2 * n_threads:] if not future.done()]
+            if len(pending) >= 2 * n_threads:
+                concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            futures.append(executor.submit(place_chunk, task, read_raw_chunk(data_dset, get_origin(task))))
+    # so that exceptions raised in worker threads propagate
+    for future in futures:
+        future.result()
+
+    return restore_requested_order(data_array, r_order, c_order)
+
+
+def read_raw_chunk(data_dset, origin):
+    """
+    Reads one chunk of data_dset as stored, for decode_chunk.
 
-    # make DataFrame instance
-    meth_df = pd.DataFrame(meth_array, index=row_meta.index[ridx], columns=col_meta.index[cidx])
-    cov_df = pd.DataFrame(cov_array, index=row_meta.index[ridx], columns=col_meta.index[cidx])
+    Input:
+        - data_dset (h5py dset): chunked, gzip compressed dataset
+        - origin (tuple): logical coordinates of the first element of the chunk
+    Output:
+        - raw (bytes or numpy array): the compressed chunk; or, for a chunk that was never written
+            or had some filter skipped, the chunk decoded by HDF5, shaped data_dset.chunks
+    """
+    chunk_shape = data_dset.chunks
+    try:
+        (filter_mask, raw) = data_dset.id.read_direct_chunk(origin)
+    except (OSError, RuntimeError, KeyError, ValueError):
+        # usually a chunk that was never written; let HDF5 read the region (which
+        # yields the fill value for unwritten chunks) rather than guess
+        filter_mask = None
+    if filter_mask == 0:
+        return raw
+
+    region = tuple(slice(o, o + n) for (o, n) in zip(origin, chunk_shape))
+    chunk = np.full(chunk_shape, data_dset.fillvalue, dtype=data_dset.dtype)
+    values = data_dset[region]
+    chunk[tuple(slice(0, n) for n in values.shape)] = values
+    return chunk
+
+
+def decode_chunk(raw, chunk_shape, dtype, shuffled):
+    """
+    Undoes the gzip (and shuffle) filters of a chunk read by read_raw_chunk. Makes no
+    HDF5 calls, so it can run in any thread.
 
-    return [meth_df, cov_df]
+    Input:
+        - raw (bytes or numpy array): output of read_raw_chunk; arrays are already decoded
+        - chunk_shape (tuple): chunk shape of the dataset
+        - dtype (numpy dtype): data type of the dataset
+        - shuffled (bool): whether the dataset uses the shuffle filter
+    Output:
+        - chunk (numpy array): the full chunk, shaped chunk_shape
+    """
+    if isinstance(raw, np.ndarray):
+        return raw
+    buf = zlib.decompress(raw)
+    if shuffled and dtype.itemsize > 1:
+        n_elem = len(buf) // dtype.itemsize
+        buf = np.frombuffer(buf, dtype=np.uint8).reshape((dtype.itemsize, n_elem)).T.tobytes()
+    return np.frombuffer(buf, dtype=dtype).reshape(chunk_shape)
+
+
+def choose_read_strategy(data_dset, sorted_ridx, sorted_cidx, n_planes=None):
+    """
+    Picks the cheapest way to read a subset of the data matrix. The cost of each
+    strategy is estimated as the number of bytes that have to be read (and, for
+    chunked datasets, decompressed) plus a fixed overhead per h5py read call.
+
+    Strategies:
+        - "full": read the whole matrix once, then subset in memory
+        - "runs": one hyperslab read per (contiguous column run, contiguous row run) pair
+        - "chunks": one read per HDF5 chunk that contains requested cells; only
+            available for chunked datasets
+
+    Input:
+        - data_dset (h5py dset): HDF5 dataset to be read
+        - sorted_ridx (numpy array): sorted row indexes
+        - sorted_cidx (numpy array): sorted column indexes
+        - n_planes (int): number of planes that will be read. Default = None (all of them)
+    Output:
+        - strategy (str): one of "full", "runs" or "chunks"
+    """
+    itemsize = data_dset.dtype.itemsize
+    if n_planes is None:
+        n_planes = int(np.prod(data_dset.shape[:-2]))
+    full_bytes = n_planes * int(np.prod(data_dset.shape[-2:])) * itemsize
+
+    row_runs = get_contiguous_runs(sorted_ridx)
+    col_runs = get_contiguous_runs(sorted_cidx)
+    n_run_reads = len(row_runs) * len(col_runs)
+
+    costs = {"full": full_bytes + read_call_overhead_bytes}
+
+    chunk_shape = data_dset.chunks
+    if chunk_shape is None:
+        # contiguous storage: a hyperslab only touches the bytes it asks for
+        run_bytes = len(sorted_ridx) * len(sorted_cidx) * n_planes * itemsize
+        costs["runs"] = run_bytes + n_run_reads * read_call_overhead_bytes
+    else:
+        # each read decompresses every chunk it overlaps
+        chunk_bytes = int(np.prod(chunk_shape)) * itemsize
+        plane_chunks = -(-n_planes // int(np.prod(chunk_shape[:-2])))
+        row_chunks_per_run = sum((stop - 1) // chunk_shape[-1] - start // chunk_shape[-1] + 1
+                                 for (_, start, stop) in row_runs)
+        col_chunks_per_run = sum((stop - 1) // chunk_shape[-2] - start // chunk_shape[-2] + 1
+                                 for (_, start, stop) in col_runs)
+        costs["runs"] = (row_chunks_per_run * col_chunks_per_run * plane_chunks * chunk_bytes +
+                         n_run_reads * read_call_overhead_bytes)
+
+        n_row_chunks = len(np.unique(sorted_ridx // chunk_shape[-1]))
+        n_col_chunks = len(np.unique(sorted_cidx // chunk_shape[-2]))
+        costs["chunks"] = n_row_chunks * n_col_chunks * (plane_chunks * chunk_bytes + read_call_overhead_bytes)
+
+    logger.debug("Estimated read costs (bytes): {}".format(costs))
+    return min(sorted(costs), key=lambda k: costs[k])
+
+
+def get_contiguous_runs(sorted_idx):
+    """
+    Groups sorted indexes into runs of consecutive values.
+
+    Input:
+        - sorted_idx (numpy array): sorted indexes
+    Output:
+        - runs (list of tuples): (position of the run in sorted_idx, first index, last index + 1)
+    """
+    if len(sorted_idx) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(sorted_idx) != 1) + 1
+    starts = np.concatenate(([0], breaks))
+    stops = np.concatenate((breaks, [len(sorted_idx)]))
+    return [(int(p0), int(sorted_idx[p0]), int(sorted_idx[p1 - 1]) + 1) for (p0, p1) in zip(starts, stops)]
+
+
+def get_chunk_groups(sorted_idx, chunk_len):
+    """
+    Groups sorted indexes by the HDF5 chunk they fall in along one axis.
+
+    Input:
+        - sorted_idx (numpy array): sorted indexes
+        - chunk_len (int): length of a chunk along this axis
+    Output:
+        - groups (list of tuples): (start, stop) positions in sorted_idx of the
+            indexes belonging to each touched chunk
+    """
+    if len(sorted_idx) == 0:
+        return []
+    chunk_ids = sorted_idx // chunk_len
+    breaks = np.flatnonzero(np.diff(chunk_ids) != 0) + 1
+    starts = np.concatenate(([0], breaks))
+    stops = np.concatenate((breaks, [len(sorted_idx)]))
+    return list(zip(starts.tolist(), stops.tolist()))
 
 
-def get_column_metadata(gctx_file_path, convert_neg_666=True):
+def get_column_metadata(gctx_file_path, convert_neg_666=True, col_meta_fields=None, categorical_fields=None):
     """
     Opens .gctx file and returns only column metadata
 
@@ -428,6 +1711,8 @@ def get_column_metadata(gctx_file_path, convert_neg_666=True):
 
         Optional:
         - convert_neg_666 (bool): whether to convert -666 values to num
+        - col_meta_fields (list of strings): column metadata fields to read; None reads all of them
+        - categorical_fields (list of strings): string fields to return as pandas Categorical
 
     Output:
         - col_meta (pandas DataFrame): a DataFrame of all column metadata values.
@@ -436,12 +1721,13 @@ def get_column_metadata(gctx_file_path, convert_neg_666=True):
     # open file
     gctx_file = h5py.File(full_path, "r")
     col_dset = gctx_file[col_meta_group_node]
-    col_meta = parse_metadata_df("col", col_dset, convert_neg_666)
+    col_meta = parse_metadata_df("col", col_dset, convert_neg_666, fields=col_meta_fields,
+                                 categorical_fields=categorical_fields)
     gctx_file.close()
     return col_meta
 
 
-def get_row_metadata(gctx_file_path, convert_neg_666=True):
+def get_row_metadata(gctx_file_path, convert_neg_666=True, row_meta_fields=None, categorical_fields=None):
     """
     Opens .gctx file and returns only row metadata
 
@@ -451,6 +1737,8 @@ def get_row_metadata(gctx_file_path, convert_neg_666=True):
 
         Optional:
         - convert_neg_666 (bool): whether to convert -666 values to num
+        - row_meta_fields (list of strings): row metadata fields to read; None reads all of them
+        - categorical_fields (list of strings): string fields to return as pandas Categorical
 
     Output:
         - row_meta (pandas DataFrame): a DataFrame of all row metadata values.
@@ -459,6 +1747,7 @@ def get_row_metadata(gctx_file_path, convert_neg_666=True):
     # open file
     gctx_file = h5py.File(full_path, "r")
     row_dset = gctx_file[row_meta_group_node]
-    row_meta = parse_metadata_df("row", row_dset, convert_neg_666)
+    row_meta = parse_metadata_df("row", row_dset, convert_neg_666, fields=row_meta_fields,
+                                 categorical_fields=categorical_fields)
     gctx_file.close()
     return row_meta
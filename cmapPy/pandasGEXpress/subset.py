@@ -67,7 +67,7 @@ def subset_main(args):
     exclude_cid = _read_arg(args.exclude_cid)
 
     # If GCT, use subset_gctoo
-    if args.in_path.endswith(".gct"):
+    if parse_gct.is_gct(args.in_path):
         sys.exit('DOES NOT FUNCTION WITH GCT FILES ANYMORE')
         in_gct = parse_gct.parse(args.in_path)
         out_gct = sg.subset_gctoo(in_gct, rid=rid, cid=cid,
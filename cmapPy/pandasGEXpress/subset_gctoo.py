@@ -48,8 +48,8 @@ def subset_gctoo(gctoo, row_bool=None, col_bool=None, rid=None, cid=None,
     rows_to_keep_bools = gctoo.meth_df.index.isin(rows_to_keep)
     cols_to_keep_bools = gctoo.meth_df.columns.isin(cols_to_keep)
 
-    # Make the output gct
-    out_gctoo = GCToo.GCToo(
+    # Make the output gct; LazyGCToo inputs stay lazy
+    out_gctoo = type(gctoo)(
         src=gctoo.src, version=gctoo.version,
         meth_df=gctoo.meth_df.loc[rows_to_keep_bools, cols_to_keep_bools],
         cov_df=gctoo.cov_df.loc[rows_to_keep_bools, cols_to_keep_bools],
@@ -0,0 +1,74 @@
+import logging
+import unittest
+import os
+import pandas.util.testing as pandas_testing
+import cmapPy.pandasGEXpress.setup_GCToo_logger as setup_logger
+import cmapPy.pandasGEXpress.gctx_reader as gctx_reader
+import cmapPy.pandasGEXpress.parse_gctx as parse_gctx
+import cmapPy.pandasGEXpress.write_gctx as write_gctx
+import cmapPy.pandasGEXpress.mini_gctoo_for_testing as mini_gctoo_for_testing
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+TEST_FILES = ["gctx_reader_test1.gctx", "gctx_reader_test2.gctx"]
+
+
+class TestGCTXReader(unittest.TestCase):
+    def setUp(self):
+        self.mg = mini_gctoo_for_testing.make()
+        for test_file in TEST_FILES:
+            write_gctx.write(self.mg, test_file)
+
+    def tearDown(self):
+        for test_file in TEST_FILES:
+            if os.path.exists(test_file):
+                os.remove(test_file)
+
+    def test_slice(self):
+        rid = list(self.mg.meth_df.index[[4, 0, 2]])
+        cid = list(self.mg.meth_df.columns[[5, 1]])
+        reader = gctx_reader.GCTXReader(TEST_FILES[0], validate="none")
+        self.assertEqual((6, 6), reader.shape)
+
+        for sort_meta in [True, False]:
+            expected = parse_gctx.parse(TEST_FILES[0], rid=rid, cid=cid, validate="none",
+                                        sort_row_meta=sort_meta, sort_col_meta=sort_meta)
+            sliced = reader.slice(rid=rid, cid=cid, sort_row_meta=sort_meta, sort_col_meta=sort_meta)
+            pandas_testing.assert_frame_equal(expected.meth_df, sliced.meth_df)
+            pandas_testing.assert_frame_equal(expected.cov_df, sliced.cov_df)
+            pandas_testing.assert_frame_equal(expected.row_metadata_df, sliced.row_metadata_df)
+            pandas_testing.assert_frame_equal(expected.col_metadata_df, sliced.col_metadata_df)
+
+        sliced = reader.slice(ridx=[1], cidx=[3, 2], sort_col_meta=False)
+        pandas_testing.assert_frame_equal(self.mg.meth_df.iloc[[1], [3, 2]], sliced.meth_df)
+        self.assertEqual(self.mg.meth_df.shape, reader.slice().meth_df.shape)
+
+        with self.assertRaises(Exception) as context:
+            reader.slice(rid=rid + ["not_a_rid"])
+        self.assertIn("not_a_rid", str(context.exception))
+        reader.close()
+
+    def test_handle_pool(self):
+        pool = gctx_reader.HandlePool(max_open=1)
+        readers = [gctx_reader.GCTXReader(f, validate="none", pool=pool) for f in TEST_FILES]
+        self.assertEqual(1, len(pool))
+
+        # a handle in use is not closed, even when another file is opened past max_open
+        handle = pool.acquire(readers[0].file_path)
+        readers[1].slice(cidx=[0])
+        self.assertEqual(1, len(pool))
+        self.assertTrue(handle.id.valid)
+        pool.release(readers[0].file_path)
+
+        # once released, it is closed as the least recently used
+        readers[1].slice(cidx=[0])
+        self.assertEqual(1, len(pool))
+        self.assertFalse(handle.id.valid)
+        pool.close()
+        self.assertEqual(0, len(pool))
+
+
+if __name__ == "__main__":
+    setup_logger.setup(verbose=True)
+
+    unittest.main()
@@ -0,0 +1,131 @@
+import logging
+import unittest
+import os
+import numpy as np
+import pandas as pd
+import pandas.util.testing as pandas_testing
+import cmapPy.pandasGEXpress.setup_GCToo_logger as setup_logger
+import cmapPy.pandasGEXpress.gctx_writer as gctx_writer
+import cmapPy.pandasGEXpress.parse_gctx as parse_gctx
+import cmapPy.pandasGEXpress.write_gctx as write_gctx
+import cmapPy.pandasGEXpress.mini_gctoo_for_testing as mini_gctoo_for_testing
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+TEST_FILE = "gctx_writer_test.gctx"
+
+
+def make_block(rids, cids, seed):
+    rng = np.random.RandomState(seed)
+    cov_df = pd.DataFrame(rng.poisson(20, size=(len(rids), len(cids))), index=rids, columns=cids).astype(np.float32)
+    meth_df = pd.DataFrame(np.round(100 * rng.rand(len(rids), len(cids)), 2), index=rids, columns=cids).astype(np.float32)
+    return (meth_df, cov_df)
+
+
+class TestGCTXWriter(unittest.TestCase):
+    def tearDown(self):
+        if os.path.exists(TEST_FILE):
+            os.remove(TEST_FILE)
+
+    def test_append_columns(self):
+        rids = ["cg" + str(i) for i in range(7)]
+        row_meta = pd.DataFrame({"chr": ["chr1"] * 4 + ["chr2"] * 3, "pos": range(7)}, index=rids)
+        (meth1, cov1) = make_block(rids, ["s1", "s2"], 0)
+        col_meta1 = pd.DataFrame({"plate": ["p1", "p1"]}, index=["s1", "s2"])
+        (meth2, cov2) = make_block(rids, ["s3", "s4", "s5"], 1)
+        col_meta2 = pd.DataFrame({"plate": ["plate2"] * 3, "dose": [1.0, 2.5, 10.0]},
+                                 index=["s3", "s4", "s5"])
+
+        with gctx_writer.GCTXWriter(TEST_FILE, access_pattern="by-sample") as writer:
+            writer.append_columns(meth1, cov1, col_meta1, row_metadata_df=row_meta)
+            self.assertEqual((7, 2), writer.shape)
+
+        # reopen and append a block whose rows are in a different order
+        shuffled_rids = rids[::-1]
+        with gctx_writer.GCTXWriter(TEST_FILE) as writer:
+            writer.append_columns(meth2.loc[shuffled_rids], cov2.loc[shuffled_rids], col_meta2)
+            self.assertEqual((7, 5), writer.shape)
+
+            # duplicated cids are refused
+            with self.assertRaises(Exception) as context:
+                writer.append_columns(meth1, cov1)
+            self.assertIn("already in the file", str(context.exception))
+
+            # rows must match
+            with self.assertRaises(Exception) as context:
+                writer.append_columns(meth1.iloc[:3].rename(columns={"s1": "s9", "s2": "s10"}), cov1.iloc[:3])
+            self.assertIn("must have the same index and columns", str(context.exception))
+
+        parsed = parse_gctx.parse(TEST_FILE, convert_neg_666=True)
+        expected_meth = pd.concat([meth1, meth2], axis=1)
+        pandas_testing.assert_frame_equal(parsed.meth_df, expected_meth, check_names=False)
+        pandas_testing.assert_frame_equal(parsed.cov_df, pd.concat([cov1, cov2], axis=1), check_names=False)
+        self.assertEqual(["p1", "p1", "plate2", "plate2", "plate2"], list(parsed.col_metadata_df["plate"]))
+        self.assertTrue(np.isnan(parsed.col_metadata_df.loc["s1", "dose"]))
+        self.assertEqual(2.5, parsed.col_metadata_df.loc["s4", "dose"])
+        self.assertEqual(list(range(7)), list(parsed.row_metadata_df["pos"]))
+
+    def test_append_rows(self):
+        cids = ["s1", "s2", "s3"]
+        (meth1, cov1) = make_block(["cg1", "cg2"], cids, 2)
+        (meth2, cov2) = make_block(["cg3"], cids, 3)
+
+        writer = gctx_writer.GCTXWriter(TEST_FILE, cov_dtype=np.uint32)
+        writer.append_rows(meth1, cov1, pd.DataFrame({"pos": [1, 2]}, index=["cg1", "cg2"]))
+        writer.close()
+
+        # the integer coverage layout of the existing file is kept
+        writer = gctx_writer.GCTXWriter(TEST_FILE)
+        writer.append_rows(meth2, cov2, pd.DataFrame({"pos": [3.5]}, index=["cg3"]))
+        writer.close()
+
+        parsed = parse_gctx.parse(TEST_FILE)
+        pandas_testing.assert_frame_equal(parsed.meth_df, pd.concat([meth1, meth2]), check_names=False)
+        pandas_testing.assert_frame_equal(parsed.cov_df, pd.concat([cov1, cov2]), check_names=False)
+        self.assertEqual([1.0, 2.0, 3.5], list(parsed.row_metadata_df["pos"]))
+
+    def test_append_unsigned_metadata(self):
+        # -666 does not fit unsigned (or 8-bit) fields, which are widened before being filled
+        cids = ["s1", "s2"]
+        blocks = [make_block(["cg" + str(i)], cids, i) for i in range(3)]
+        row_metas = [pd.DataFrame({"pos": np.array([4000000000], dtype=np.uint32)}, index=["cg0"]),
+                     pd.DataFrame(index=["cg1"]),
+                     pd.DataFrame({"depth": np.array([200], dtype=np.uint8)}, index=["cg2"])]
+        with gctx_writer.GCTXWriter(TEST_FILE) as writer:
+            for ((meth_df, cov_df), row_meta) in zip(blocks, row_metas):
+                writer.append_rows(meth_df, cov_df, row_meta)
+            self.assertEqual(np.int64, writer.hdf5_file[write_gctx.row_meta_group_node]["pos"].dtype)
+            self.assertEqual(np.int16, writer.hdf5_file[write_gctx.row_meta_group_node]["depth"].dtype)
+
+        parsed = parse_gctx.parse(TEST_FILE, convert_neg_666=True)
+        pandas_testing.assert_series_equal(pd.Series([4000000000, np.nan, np.nan], index=parsed.row_metadata_df.index),
+                                           parsed.row_metadata_df["pos"], check_names=False)
+        pandas_testing.assert_series_equal(pd.Series([np.nan, np.nan, 200], index=parsed.row_metadata_df.index),
+                                           parsed.row_metadata_df["depth"], check_names=False)
+
+    def test_append_longer_strings(self):
+        # string fields are stored padded, so longer ids and values mostly just resize the datasets
+        rids = ["cg1", "cg12", "cg1234567", "cg12345678901234", "cg12345678901234567"]
+        id_itemsizes = []
+        with gctx_writer.GCTXWriter(TEST_FILE) as writer:
+            for (i, rid) in enumerate(rids):
+                (meth_df, cov_df) = make_block([rid], ["s1"], i)
+                writer.append_rows(meth_df, cov_df, pd.DataFrame({"gene": ["g" * (i + 1)]}, index=[rid]))
+                id_itemsizes.append(writer.hdf5_file[write_gctx.row_meta_group_node]["id"].dtype.itemsize)
+        self.assertEqual([16, 16, 16, 16, 32], id_itemsizes)
+
+        parsed = parse_gctx.parse(TEST_FILE)
+        self.assertEqual(rids, list(parsed.meth_df.index))
+        self.assertEqual(["g" * (i + 1) for i in range(5)], list(parsed.row_metadata_df["gene"]))
+
+    def test_refuses_fixed_size_file(self):
+        write_gctx.write(mini_gctoo_for_testing.make(), TEST_FILE)
+        with self.assertRaises(Exception) as context:
+            gctx_writer.GCTXWriter(TEST_FILE)
+        self.assertIn("is not resizable", str(context.exception))
+
+
+if __name__ == "__main__":
+    setup_logger.setup(verbose=True)
+
+    unittest.main()
@@ -0,0 +1,94 @@
+import logging
+import unittest
+import os
+import h5py
+import numpy as np
+import pandas as pd
+import pandas.util.testing as pandas_testing
+import cmapPy.pandasGEXpress.setup_GCToo_logger as setup_logger
+import cmapPy.pandasGEXpress.index_gctx as index_gctx
+import cmapPy.pandasGEXpress.parse_gctx as parse_gctx
+import cmapPy.pandasGEXpress.write_gctx as write_gctx
+import cmapPy.pandasGEXpress.GCToo as GCToo
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+TEST_FILE = "index_gctx_test.gctx"
+
+
+def make_gctoo(n_rows, n_cols):
+    rng = np.random.RandomState(7)
+    rids = ["cg{:05d}".format(i) for i in rng.permutation(n_rows)]
+    cids = ["s" + str(i) for i in range(n_cols)]
+    meth_df = pd.DataFrame(np.round(100 * rng.rand(n_rows, n_cols), 2), index=rids, columns=cids).astype(np.float32)
+    cov_df = pd.DataFrame(rng.poisson(20, size=(n_rows, n_cols)), index=rids, columns=cids).astype(np.float32)
+    row_meta = pd.DataFrame({"pos": np.arange(n_rows)}, index=rids)
+    col_meta = pd.DataFrame({"plate": ["p" + str(i % 3) for i in range(n_cols)]}, index=cids)
+    return GCToo.GCToo(meth_df=meth_df, cov_df=cov_df, row_metadata_df=row_meta, col_metadata_df=col_meta)
+
+
+class TestIndexGctx(unittest.TestCase):
+    def tearDown(self):
+        if os.path.exists(TEST_FILE):
+            os.remove(TEST_FILE)
+
+    def test_lookup_positions(self):
+        my_gctoo = make_gctoo(10000, 3)
+        write_gctx.write(my_gctoo, TEST_FILE)
+        rids = list(my_gctoo.meth_df.index)
+
+        with h5py.File(TEST_FILE, "r") as hdf5_file:
+            self.assertTrue(index_gctx.has_index(hdf5_file, "row"))
+            self.assertTrue(index_gctx.has_index(hdf5_file, "col"))
+
+            # ids spread over several blocks, in any order, with ids missing from the file
+            query = [rids[9999], "cg99999", rids[0], "a", rids[5000], rids[5000]]
+            positions = index_gctx.lookup_positions(hdf5_file, "row", query)
+            self.assertEqual([9999, -1, 0, -1, 5000, 5000], list(positions))
+            self.assertEqual([2, 0], list(index_gctx.lookup_positions(hdf5_file, "col", ["s2", "s0"])))
+
+    def test_parse_with_index(self):
+        my_gctoo = make_gctoo(200, 5)
+        write_gctx.write(my_gctoo, TEST_FILE, id_index=False)
+        rid = list(my_gctoo.meth_df.index[[150, 3, 77]])
+        cid = ["s4", "s1"]
+        expected = parse_gctx.parse(TEST_FILE, rid=rid, cid=cid, sort_row_meta=False, sort_col_meta=False)
+
+        write_gctx.write(my_gctoo, TEST_FILE)
+        parsed = parse_gctx.parse(TEST_FILE, rid=rid, cid=cid, sort_row_meta=False, sort_col_meta=False)
+        pandas_testing.assert_frame_equal(expected.meth_df, parsed.meth_df)
+        pandas_testing.assert_frame_equal(expected.cov_df, parsed.cov_df)
+        pandas_testing.assert_frame_equal(expected.row_metadata_df, parsed.row_metadata_df)
+        pandas_testing.assert_frame_equal(expected.col_metadata_df, parsed.col_metadata_df)
+
+        lazy = parse_gctx.parse(TEST_FILE, rid=rid, cid=cid, lazy=True)
+        pandas_testing.assert_frame_equal(lazy.meth_df.materialize(), expected.meth_df.loc[lazy.meth_df.index, lazy.meth_df.columns])
+        lazy.close()
+
+        row_meta = parse_gctx.parse(TEST_FILE, rid=rid, row_meta_only=True)
+        self.assertEqual([3, 77, 150], list(row_meta["pos"]))
+
+        # ids missing from the file are still reported
+        with self.assertRaises(Exception) as context:
+            parse_gctx.parse(TEST_FILE, rid=rid + ["not_a_rid"])
+        self.assertIn("not_a_rid", str(context.exception))
+
+    def test_index_gctx_main(self):
+        my_gctoo = make_gctoo(50, 4)
+        write_gctx.write(my_gctoo, TEST_FILE, id_index=False)
+        with h5py.File(TEST_FILE, "r") as hdf5_file:
+            self.assertFalse(index_gctx.has_index(hdf5_file, "row"))
+
+        args = index_gctx.build_parser().parse_args(["-f", TEST_FILE, "-dims", "row"])
+        index_gctx.index_gctx_main(args)
+
+        with h5py.File(TEST_FILE, "r") as hdf5_file:
+            self.assertTrue(index_gctx.has_index(hdf5_file, "row"))
+            self.assertFalse(index_gctx.has_index(hdf5_file, "col"))
+            self.assertEqual([10], list(index_gctx.lookup_positions(hdf5_file, "row", [my_gctoo.meth_df.index[10]])))
+
+
+if __name__ == "__main__":
+    setup_logger.setup(verbose=True)
+
+    unittest.main()
@@ -0,0 +1,157 @@
+import logging
+import unittest
+import os
+import numpy as np
+import pandas as pd
+import pandas.util.testing as pandas_testing
+import cmapPy.pandasGEXpress.setup_GCToo_logger as setup_logger
+import cmapPy.pandasGEXpress.GCToo as GCToo
+import cmapPy.pandasGEXpress.lazy_gctoo as lazy_gctoo
+import cmapPy.pandasGEXpress.parse_gctx as parse_gctx
+import cmapPy.pandasGEXpress.write_gctx as write_gctx
+import cmapPy.pandasGEXpress.subset_gctoo as subset_gctoo
+import cmapPy.pandasGEXpress.transform_gctoo as transform_gctoo
+import cmapPy.pandasGEXpress.mini_gctoo_for_testing as mini_gctoo_for_testing
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+TEST_FILE = "lazy_gctoo_test.gctx"
+
+
+def make_mini_with_int_cov():
+    mg = mini_gctoo_for_testing.make()
+    cov_df = (mg.meth_df.abs() * 10).round()
+    return GCToo.GCToo(meth_df=mg.meth_df, cov_df=cov_df, row_metadata_df=mg.row_metadata_df,
+                       col_metadata_df=mg.col_metadata_df, src=mg.src, version=mg.version)
+
+
+class TestLazyGCToo(unittest.TestCase):
+    def setUp(self):
+        self.mg = make_mini_with_int_cov()
+        write_gctx.write(self.mg, TEST_FILE)
+
+    def tearDown(self):
+        os.remove(TEST_FILE)
+
+    def test_parse_lazy(self):
+        lazy = parse_gctx.parse(TEST_FILE, lazy=True)
+        self.assertIsInstance(lazy, lazy_gctoo.LazyGCToo)
+        self.assertIsInstance(lazy.meth_df, lazy_gctoo.LazyDataFrame)
+        self.assertEqual(lazy.meth_df.shape, self.mg.meth_df.shape)
+        pandas_testing.assert_frame_equal(lazy.row_metadata_df, self.mg.row_metadata_df)
+
+        eager = lazy.materialize()
+        pandas_testing.assert_frame_equal(eager.meth_df, self.mg.meth_df)
+        pandas_testing.assert_frame_equal(eager.cov_df, self.mg.cov_df)
+
+        # unsorted subsets match the eager parser
+        lazy_subset = parse_gctx.parse(TEST_FILE, ridx=[3, 0, 1], cidx=[4, 1], lazy=True,
+                                       sort_row_meta=False, sort_col_meta=False)
+        pandas_testing.assert_frame_equal(lazy_subset.meth_df.materialize(), self.mg.meth_df.iloc[[3, 0, 1], [4, 1]])
+        pandas_testing.assert_frame_equal(lazy_subset.row_metadata_df, self.mg.row_metadata_df.iloc[[3, 0, 1], :])
+        lazy_subset.close()
+        lazy.close()
+
+    def test_loc_iloc(self):
+        lazy = parse_gctx.parse(TEST_FILE, lazy=True)
+        rids = list(self.mg.meth_df.index[[1, 4]])
+        cids = list(self.mg.meth_df.columns[[0, 5, 2]])
+
+        by_label = lazy.meth_df.loc[rids, cids]
+        self.assertIsInstance(by_label, lazy_gctoo.LazyDataFrame)
+        pandas_testing.assert_frame_equal(by_label.materialize(), self.mg.meth_df.loc[rids, cids])
+
+        by_position = lazy.cov_df.iloc[1:4, [5, 0]]
+        pandas_testing.assert_frame_equal(by_position.materialize(), self.mg.cov_df.iloc[1:4, [5, 0]])
+
+        # scalar selections are materialized
+        self.assertEqual(lazy.meth_df.iloc[2, 3], self.mg.meth_df.iloc[2, 3])
+        pandas_testing.assert_series_equal(lazy.meth_df.loc[rids[0], :], self.mg.meth_df.loc[rids[0], :])
+
+        with self.assertRaises(KeyError):
+            lazy.meth_df.loc[["not_a_rid"], :]
+        lazy.close()
+
+    def test_subset_and_transpose(self):
+        lazy = parse_gctx.parse(TEST_FILE, lazy=True)
+        rids = list(self.mg.meth_df.index[[0, 2]])
+
+        lazy_subset = subset_gctoo.subset_gctoo(lazy, rid=rids, cidx=[1, 3])
+        self.assertIsInstance(lazy_subset, lazy_gctoo.LazyGCToo)
+        expected = subset_gctoo.subset_gctoo(self.mg, rid=rids, cidx=[1, 3])
+        materialized = lazy_subset.materialize()
+        pandas_testing.assert_frame_equal(materialized.meth_df, expected.meth_df)
+        pandas_testing.assert_frame_equal(materialized.cov_df, expected.cov_df)
+        pandas_testing.assert_frame_equal(materialized.col_metadata_df, expected.col_metadata_df)
+
+        lazy_t = transform_gctoo.transpose(lazy_subset)
+        self.assertIsInstance(lazy_t, lazy_gctoo.LazyGCToo)
+        pandas_testing.assert_frame_equal(lazy_t.meth_df.materialize(), expected.meth_df.T)
+        lazy.close()
+
+    def test_write_lazy(self):
+        out_file = "lazy_gctoo_write_test.gctx"
+        lazy = parse_gctx.parse(TEST_FILE, lazy=True)
+        lazy_subset = subset_gctoo.subset_gctoo(lazy, ridx=[0, 1, 5])
+        write_gctx.write(lazy_subset, out_file)
+        lazy.close()
+
+        written = parse_gctx.parse(out_file)
+        expected = subset_gctoo.subset_gctoo(self.mg, ridx=[0, 1, 5])
+        pandas_testing.assert_frame_equal(written.meth_df, expected.meth_df)
+        pandas_testing.assert_frame_equal(written.cov_df, expected.cov_df)
+        os.remove(out_file)
+
+    def test_write_lazy_block_budget(self):
+        # a tall matrix whose chunks (and whole-chunk column blocks) exceed the budget
+        out_file = "lazy_gctoo_block_test.gctx"
+        in_file = "lazy_gctoo_tall_test.gctx"
+        (n_rows, n_cols) = (4000, 3)
+        meth_df = pd.DataFrame(np.random.rand(n_rows, n_cols).astype(np.float32),
+                               index=pd.Index(["r{}".format(i) for i in range(n_rows)], name="rid"),
+                               columns=pd.Index(["c{}".format(i) for i in range(n_cols)], name="cid"))
+        tall = GCToo.GCToo(meth_df=meth_df, cov_df=(meth_df * 10).round())
+        write_gctx.write(tall, in_file)
+
+        lazy_write_block_kb = write_gctx.lazy_write_block_kb
+        read_planes = lazy_gctoo.read_planes
+        block_shapes = []
+
+        def recording_read_planes(meth_proxy, cov_proxy):
+            block_shapes.append(meth_proxy.shape)
+            return read_planes(meth_proxy, cov_proxy)
+
+        lazy_gctoo.read_planes = recording_read_planes
+        try:
+            # (1024 x 3) chunks; 1 KB: a single chunk does not fit; 64 KB: chunk-aligned row blocks
+            for block_kb in [1, 64]:
+                write_gctx.lazy_write_block_kb = block_kb
+                del block_shapes[:]
+                lazy = parse_gctx.parse(in_file, lazy=True)
+                write_gctx.write(lazy, out_file, max_chunk_kb=12, access_pattern="by-cpg")
+                lazy.close()
+
+                self.assertGreater(len(block_shapes), 1)
+                for (block_rows, block_cols) in block_shapes:
+                    self.assertLessEqual(2 * block_rows * block_cols * 4, block_kb * 1024)
+                written = parse_gctx.parse(out_file)
+                pandas_testing.assert_frame_equal(written.meth_df, tall.meth_df)
+                pandas_testing.assert_frame_equal(written.cov_df, tall.cov_df)
+                os.remove(out_file)
+        finally:
+            write_gctx.lazy_write_block_kb = lazy_write_block_kb
+            lazy_gctoo.read_planes = read_planes
+            os.remove(in_file)
+
+        # whole-column blocks stay whole chunks when they fit
+        self.assertEqual((1000, 33536), write_gctx.get_lazy_write_blocks(1000, 40000, (1, 262, 1000)))
+        # 28M rows with 262-column chunks: row blocks within 256 MB
+        (block_rows, block_cols) = write_gctx.get_lazy_write_blocks(28000000, 262, (1, 262, 1000))
+        self.assertEqual(262, block_cols)
+        self.assertLessEqual(2 * 4 * block_rows * block_cols, write_gctx.lazy_write_block_kb * 1024)
+
+
+if __name__ == "__main__":
+    setup_logger.setup(verbose=True)
+
+    unittest.main()
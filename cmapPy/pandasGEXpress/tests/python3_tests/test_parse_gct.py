@@ -5,6 +5,7 @@ import pandas as pd
 import numpy as np
 import cmapPy.pandasGEXpress.setup_GCToo_logger as setup_logger
 import cmapPy.pandasGEXpress.parse_gct as pg
+import cmapPy.pandasGEXpress.parse as parse
 import cmapPy.pandasGEXpress.GCToo as GCToo
 
 
@@ -12,9 +13,6 @@ FUNCTIONAL_TESTS_PATH = "cmapPy/pandasGEXpress/tests/functional_tests/"
 
 logger = logging.getLogger(setup_logger.LOGGER_NAME)
 
-import sys
-sys.exit('NOT TESTING GCT PARSING FUNCTIONS YET')
-
 
 class TestParseGct(unittest.TestCase):
     def test_read_version_and_dims(self):
@@ -114,6 +112,148 @@ class TestParseGct(unittest.TestCase):
                         ("The last data index value should be " + correct_str +
                          " not {}").format(data.index.values[e_dims[0] - 1]))
 
+    def test_parse_into_3_df_blocks(self):
+        # the body is read in blocks; tiny blocks give the same dataframes
+        gct_filepath = os.path.join(FUNCTIONAL_TESTS_PATH, "test_l1000.gct")
+        e_dims = [978, 377, 11, 35]
+        expected = pg.parse_into_3_df(gct_filepath, e_dims[0], e_dims[1], e_dims[2], e_dims[3], None)
+        body_block_mb = pg.body_block_mb
+        pg.body_block_mb = 0.01
+        try:
+            actual = pg.parse_into_3_df(gct_filepath, e_dims[0], e_dims[1], e_dims[2], e_dims[3], None)
+        finally:
+            pg.body_block_mb = body_block_mb
+        for (e_df, df) in zip(expected, actual):
+            pd.testing.assert_frame_equal(e_df, df)
+        self.assertEqual(np.float32, actual[2].values.dtype)
+
+        # values that cannot be converted are reported as by assemble_data
+        fname = "testing_unconvertible.gct"
+        with open(fname, "w") as f:
+            f.write("#1.3\n2\t2\t1\t1\nid\trhd1\tcid1\tcid2\nchd1\t-666\ta\tb\n" +
+                    "rid1\tC\t0.3\t0.2\nrid2\tD\tnope\t0.9\n")
+        with self.assertRaises(Exception) as context:
+            pg.parse_into_3_df(fname, 2, 2, 1, 1, None)
+        self.assertIn("data.loc['rid2', 'cid1'] = 'nope'", str(context.exception))
+        os.remove(fname)
+
+    def test_parse_into_3_df_subset(self):
+        gct_filepath = os.path.join(FUNCTIONAL_TESTS_PATH, "test_l1000.gct")
+        e_dims = [978, 377, 11, 35]
+        (e_row_df, e_col_df, e_data_df) = pg.parse_into_3_df(
+            gct_filepath, e_dims[0], e_dims[1], e_dims[2], e_dims[3], None)
+
+        # rows and columns come back in file order; missing ids are ignored
+        my_rids = ["218597_s_at", "214404_x_at", "209253_at", "not_a_rid"]
+        my_cids = ["LJP005_A375_24H_X1_B19:A07", "LJP005_A375_24H_X1_B19:A03"]
+        (row_df, col_df, data_df) = pg.parse_into_3_df(
+            gct_filepath, e_dims[0], e_dims[1], e_dims[2], e_dims[3], None, rid=my_rids, cid=my_cids)
+        rows = e_data_df.index.isin(my_rids)
+        cols = e_data_df.columns.isin(my_cids)
+        self.assertEqual(["218597_s_at", "209253_at", "214404_x_at"], list(data_df.index))
+        pd.testing.assert_frame_equal(e_data_df.loc[rows, cols], data_df)
+        pd.testing.assert_frame_equal(e_row_df.loc[rows], row_df)
+        pd.testing.assert_frame_equal(e_col_df.loc[cols], col_df)
+
+        (row_df, col_df, data_df) = pg.parse_into_3_df(
+            gct_filepath, e_dims[0], e_dims[1], e_dims[2], e_dims[3], None, ridx=[977, 0], cidx=[4, 0])
+        pd.testing.assert_frame_equal(e_data_df.iloc[[0, 977], [0, 4]], data_df)
+        pd.testing.assert_frame_equal(e_col_df.iloc[[0, 4]], col_df)
+
+        with self.assertRaises(AssertionError) as context:
+            pg.parse_into_3_df(gct_filepath, e_dims[0], e_dims[1], e_dims[2], e_dims[3], None, rid=["not_a_rid"])
+        self.assertIn("empty gct", str(context.exception))
+
+        # integer ids are checked as subset_gctoo checks them; negative ids count from the end
+        (_, _, data_df) = pg.parse_into_3_df(
+            gct_filepath, e_dims[0], e_dims[1], e_dims[2], e_dims[3], None, ridx=[-1], cidx=[-2, 0])
+        pd.testing.assert_frame_equal(e_data_df.iloc[[977], [0, 375]], data_df)
+        with self.assertRaises(AssertionError) as context:
+            pg.parse_into_3_df(gct_filepath, e_dims[0], e_dims[1], e_dims[2], e_dims[3], None, ridx=[979])
+        self.assertIn("ridx contains an integer larger than the number of rows", str(context.exception))
+        with self.assertRaises(AssertionError) as context:
+            pg.parse_into_3_df(gct_filepath, e_dims[0], e_dims[1], e_dims[2], e_dims[3], None, cidx=["0"])
+        self.assertIn("cidx must be a list of integers", str(context.exception))
+        with self.assertRaises(IndexError):
+            pg.parse_into_3_df(gct_filepath, e_dims[0], e_dims[1], e_dims[2], e_dims[3], None, cidx=[377])
+
+    def test_parse_subset_pushdown(self):
+        l1000_file_path = os.path.join(FUNCTIONAL_TESTS_PATH, "test_l1000.gct")
+        full = pg.parse(l1000_file_path)
+        my_rids = list(full.meth_df.index[[5, 900]])
+        my_cids = list(full.col_metadata_df.index[[0, 7]])
+
+        # only the requested rows and columns are parsed from the body
+        read_body = pg.read_body
+        body_shapes = []
+
+        def recording_read_body(*args, **kwargs):
+            out = read_body(*args, **kwargs)
+            body_shapes.append(out[2].shape)
+            return out
+
+        pg.read_body = recording_read_body
+        try:
+            subsets = [pg.parse(l1000_file_path, rid=my_rids, cid=my_cids),
+                       parse.parse(l1000_file_path, rid=my_rids, cid=my_cids, row_meta_fields=["pr_gene_symbol"]),
+                       parse.parse(l1000_file_path, ridx=[5, 900], cidx=[0, 7])]
+        finally:
+            pg.read_body = read_body
+        self.assertEqual([(2, 2)] * 3, body_shapes)
+        for subset in subsets:
+            pd.testing.assert_frame_equal(full.meth_df.loc[my_rids, my_cids], subset.meth_df)
+            pd.testing.assert_frame_equal(full.col_metadata_df.loc[my_cids], subset.col_metadata_df)
+            self.assertEqual((2, 2), subset.cov_df.shape)
+        pd.testing.assert_frame_equal(full.row_metadata_df.loc[my_rids, ["pr_gene_symbol"]],
+                                      subsets[1].row_metadata_df)
+
+    def test_parse_subset_quoted_ids(self):
+        # ids with quotes or tabs are quoted in the file (see write_gct.write_bottom_half)
+        fname = "testing_quoted_ids.gct"
+        with open(fname, "w") as f:
+            f.write('#1.3\n3\t2\t1\t0\nid\trhd1\tcid1\t"c""2"\n' +
+                    'rid1\ta\t0.5\t1.5\n"e""f"\tb\t2.5\t3.5\n"g\th"\tc\t4.5\t5.5\n')
+        full = pg.parse(fname)
+        self.assertEqual(["rid1", 'e"f', "g\th"], list(full.meth_df.index))
+        for n_jobs in [1, 2]:
+            subset = pg.parse(fname, rid=['e"f', "g\th"], cid=['c"2'], n_jobs=n_jobs)
+            pd.testing.assert_frame_equal(full.meth_df.loc[['e"f', "g\th"], ['c"2']], subset.meth_df)
+            pd.testing.assert_frame_equal(full.row_metadata_df.loc[['e"f', "g\th"]], subset.row_metadata_df)
+        os.remove(fname)
+
+    def test_parse_into_3_df_n_jobs(self):
+        gct_filepath = os.path.join(FUNCTIONAL_TESTS_PATH, "test_l1000.gct")
+        e_dims = [978, 377, 11, 35]
+        expected = pg.parse_into_3_df(gct_filepath, e_dims[0], e_dims[1], e_dims[2], e_dims[3], None)
+
+        # more byte ranges than processes
+        body_block_mb = pg.body_block_mb
+        pg.body_block_mb = 0.05
+        try:
+            actual = pg.parse_into_3_df(gct_filepath, e_dims[0], e_dims[1], e_dims[2], e_dims[3], None, n_jobs=2)
+            my_rids = list(expected[2].index[[900, 3]])
+            subset = pg.parse_into_3_df(gct_filepath, e_dims[0], e_dims[1], e_dims[2], e_dims[3], None,
+                                        rid=my_rids, cidx=[2], n_jobs=2)
+            serial_gct = parse.parse(gct_filepath)
+            parallel_gct = parse.parse(gct_filepath, n_jobs=2)
+        finally:
+            pg.body_block_mb = body_block_mb
+        for (e_df, df) in zip(expected, actual):
+            pd.testing.assert_frame_equal(e_df, df)
+        pd.testing.assert_frame_equal(expected[2].iloc[[3, 900], [2]], subset[2])
+        pd.testing.assert_frame_equal(serial_gct.meth_df, parallel_gct.meth_df)
+        pd.testing.assert_frame_equal(serial_gct.row_metadata_df, parallel_gct.row_metadata_df)
+        pd.testing.assert_frame_equal(serial_gct.col_metadata_df, parallel_gct.col_metadata_df)
+
+        fname = "testing_unconvertible_n_jobs.gct"
+        with open(fname, "w") as f:
+            f.write("#1.3\n2\t2\t1\t1\nid\trhd1\tcid1\tcid2\nchd1\t-666\ta\tb\n" +
+                    "rid1\tC\t0.3\t0.2\nrid2\tD\tnope\t0.9\n")
+        with self.assertRaises(Exception) as context:
+            pg.parse_into_3_df(fname, 2, 2, 1, 1, None, n_jobs=2)
+        self.assertIn("data.loc['rid2', 'cid1'] = 'nope'", str(context.exception))
+        os.remove(fname)
+
     def test_assemble_row_metadata(self):
         #simple happy path
         full_df = pd.DataFrame(
@@ -195,9 +335,9 @@ class TestParseGct(unittest.TestCase):
         self.assertEqual(GCToo.GCToo, type(l1000_gct))
 
         # Check a few values
-        self.assertAlmostEqual(l1000_gct.data_df.iloc[0, 0], 11.3819, places=4,
+        self.assertAlmostEqual(l1000_gct.meth_df.iloc[0, 0], 11.3819, places=4,
                         msg=("The first value in the data matrix should be " +
-                             "{} not {}").format("11.3819", l1000_gct.data_df.iloc[0, 0]))
+                             "{} not {}").format("11.3819", l1000_gct.meth_df.iloc[0, 0]))
         self.assertEqual(l1000_gct.col_metadata_df.iloc[0, 0], 58,
                         msg=("The first value in the column metadata should be " +
                              "{} not {}").format("58", l1000_gct.col_metadata_df.iloc[0, 0]))
@@ -205,6 +345,10 @@ class TestParseGct(unittest.TestCase):
                         msg=("The first value in the row metadata should be " +
                              "{} not {}").format("Analyte 11", l1000_gct.row_metadata_df.iloc[0, 0]))
 
+        # a GCT has no coverage: cov_df is an all-NaN placeholder of the same shape
+        self.assertEqual(l1000_gct.meth_df.shape, l1000_gct.cov_df.shape)
+        self.assertTrue(l1000_gct.cov_df.isnull().values.all())
+
         # P100 gct
         p100_file_path = os.path.join(FUNCTIONAL_TESTS_PATH, "test_p100.gct")
         p100_gct = pg.parse(p100_file_path)
@@ -212,9 +356,9 @@ class TestParseGct(unittest.TestCase):
         self.assertEqual(GCToo.GCToo, type(p100_gct))
 
         # Check a few values
-        self.assertAlmostEqual(p100_gct.data_df.iloc[0, 0], 0.9182, places=4,
+        self.assertAlmostEqual(p100_gct.meth_df.iloc[0, 0], 0.9182, places=4,
                         msg=("The first value in the data matrix should be " +
-                             "{} not {}").format("0.9182", p100_gct.data_df.iloc[0, 0]))
+                             "{} not {}").format("0.9182", p100_gct.meth_df.iloc[0, 0]))
         self.assertEqual(p100_gct.col_metadata_df.iloc[0, 0], "MCF7",
                         msg=("The first value in the column metadata should be " +
                              "{} not {}").format("MCF7", p100_gct.col_metadata_df.iloc[0, 0]))
@@ -230,7 +374,7 @@ class TestParseGct(unittest.TestCase):
 
         # Check a few values
         self.assertAlmostEqual(
-            gct_v1point2.data_df.loc["217140_s_at", "LJP005_A375_24H_X1_B19:A06"],
+            gct_v1point2.meth_df.loc["217140_s_at", "LJP005_A375_24H_X1_B19:A06"],
             6.9966, places=4)
         self.assertEqual(gct_v1point2.row_metadata_df.loc["203627_at", "Description"], "IGF1R")
 
@@ -267,19 +411,19 @@ class TestParseGct(unittest.TestCase):
             ["LJP005_A375_24H_X1_B19:A03", "LJP005_A375_24H_X1_B19:A07"])
 
         out_g = pg.parse(l1000_file_path, rid=my_rids, cidx=my_cidxs)
-        self.assertEqual(out_g.data_df.shape, (3, 2))
+        self.assertEqual(out_g.meth_df.shape, (3, 2))
 
         # N.B. returned object should have same order as input
-        pd.testing.assert_frame_equal(e_data_df, out_g.data_df, check_less_precise=2, check_names=False)
+        pd.testing.assert_frame_equal(e_data_df, out_g.meth_df, check_less_precise=2, check_names=False)
         pd.testing.assert_frame_equal(e_col_meta_df, out_g.col_metadata_df[["pert_id", "pert_iname"]], check_names=False)
 
     def test_parse_gct_int_ids(self):
         path = os.path.join(FUNCTIONAL_TESTS_PATH, "test_parse_gct_int_ids.gct")
         r = pg.parse(path)
         logger.debug("r:  {}".format(r))
-        logger.debug("r.data_df:  {}".format(r.data_df))
-        self.assertEqual({"1", "2"}, set(r.data_df.columns))
-        self.assertEqual({"3", "11", "-3"}, set(r.data_df.index))
+        logger.debug("r.meth_df:  {}".format(r.meth_df))
+        self.assertEqual({"1", "2"}, set(r.meth_df.columns))
+        self.assertEqual({"3", "11", "-3"}, set(r.meth_df.index))
 
 
 if __name__ == "__main__":
@@ -4,6 +4,8 @@ import os
 import pandas as pd
 import numpy as np
 import h5py
+import threading
+from unittest import mock
 
 import pandas.util.testing as pandas_testing
 import cmapPy.pandasGEXpress.setup_GCToo_logger as setup_logger
@@ -34,6 +36,7 @@ class MockHdf5Dset(object):
         self.data_list = data_list
         self.shape = (len(data_list),)
         self.dtype = dtype
+        self.attrs = {}
 
     def read_direct(self, dest):
         for i in range(len(dest)):
@@ -255,6 +258,101 @@ class TestParseGctx(unittest.TestCase):
         # case 4: id == None & idx == None
         self.assertEqual((None, []), parse_gctx.check_id_idx_exclusivity(None, None))
 
+    def test_parse_where(self):
+        gctx_path = "cmapPy/pandasGEXpress/tests/functional_tests/mini_gctoo_for_testing.gctx"
+        full = parse_gctx.parse(gctx_path, validate="none")
+
+        mg = parse_gctx.parse(gctx_path, col_where="distil_ss > 5 and distil_nsample < 10",
+                              row_where="rid != 'LJP007_MCF7_24H:TRT_CP:BRD-K64857848:10'", validate="none")
+        pandas_testing.assert_frame_equal(full.meth_df.iloc[:5, [0, 1, 3]], mg.meth_df)
+        pandas_testing.assert_frame_equal(full.cov_df.iloc[:5, [0, 1, 3]], mg.cov_df)
+        pandas_testing.assert_frame_equal(full.col_metadata_df.iloc[[0, 1, 3]], mg.col_metadata_df)
+
+        row_meta = parse_gctx.parse(gctx_path, row_where="`distil_nsample` > 50", row_meta_only=True)
+        self.assertEqual(list(full.row_metadata_df.index[[2, 5]]), list(row_meta.index))
+
+        # nothing matches
+        mg = parse_gctx.parse(gctx_path, col_where="distil_ss > 100", validate="none")
+        self.assertEqual((6, 0), mg.meth_df.shape)
+
+        with self.assertRaises(Exception) as context:
+            parse_gctx.parse(gctx_path, col_where="distil_ss > 5", cid=["a"])
+        self.assertIn("col_where cannot be combined with cid or cidx", str(context.exception))
+
+        with self.assertRaises(Exception) as context:
+            parse_gctx.parse(gctx_path, col_where="not_a_field > 5")
+        self.assertIn("could not evaluate col_where", str(context.exception))
+
+        with self.assertRaises(Exception) as context:
+            parse_gctx.parse(gctx_path, col_where="distil_ss + 1")
+        self.assertIn("must evaluate to one True/False value per col", str(context.exception))
+
+    def test_parse_layers(self):
+        mg = mini_gctoo_for_testing.make()
+        mg = GCToo.GCToo(meth_df=mg.meth_df, cov_df=(mg.meth_df.abs() * 10).round(),
+                         row_metadata_df=mg.row_metadata_df, col_metadata_df=mg.col_metadata_df)
+        fn = "parse_layers_test.gctx"
+        for cov_dtype in [None, np.uint16]:
+            write_gctx.write(mg, fn, max_chunk_kb=1, cov_dtype=cov_dtype)
+            rid = list(mg.meth_df.index[[4, 0, 2]])
+            for (layer, skipped) in [("meth", "cov"), ("cov", "meth")]:
+                parsed = parse_gctx.parse(fn, rid=rid, sort_row_meta=False, layers=(layer,))
+                pandas_testing.assert_frame_equal(getattr(mg, layer + "_df").loc[rid], getattr(parsed, layer + "_df"))
+
+                # the plane that was not read is an all-NaN placeholder taking no memory
+                missing_df = getattr(parsed, skipped + "_df")
+                self.assertEqual((3, 6), missing_df.shape)
+                self.assertEqual((0, 0), missing_df.values.strides)
+                self.assertTrue(missing_df.isnull().all().all())
+
+            lazy = parse_gctx.parse(fn, lazy=True, layers="cov")
+            materialized = lazy.materialize()
+            pandas_testing.assert_frame_equal(mg.cov_df, materialized.cov_df)
+            self.assertTrue(materialized.meth_df.isnull().all().all())
+            lazy.close()
+
+        blocks = list(parse_gctx.iter_blocks(fn, axis="row", block_size=2, layers=["meth"]))
+        pandas_testing.assert_frame_equal(mg.meth_df, pd.concat([b.meth_df for b in blocks]))
+        self.assertTrue(all(b.cov_df.values.strides == (0, 0) for b in blocks))
+
+        with self.assertRaises(Exception) as context:
+            parse_gctx.parse(fn, layers=("meth", "beta"))
+        self.assertIn("Invalid layers", str(context.exception))
+        os.remove(fn)
+
+    def test_parse_mmap(self):
+        mg = mini_gctoo_for_testing.make()
+        mg = GCToo.GCToo(meth_df=mg.meth_df, cov_df=(mg.meth_df.abs() * 10).round(),
+                         row_metadata_df=mg.row_metadata_df, col_metadata_df=mg.col_metadata_df)
+        fn = "parse_mmap_test.gctx"
+        write_gctx.write(mg, fn, access_pattern="contiguous")
+        with h5py.File(fn, "r") as hdf5_file:
+            self.assertTrue(parse_gctx.can_memory_map(hdf5_file[data_node]))
+
+        # no subsetting: both planes are read-only views of the file
+        mapped = parse_gctx.parse(fn, mmap=True, validate="none")
+        pandas_testing.assert_frame_equal(mg.meth_df, mapped.meth_df)
+        pandas_testing.assert_frame_equal(mg.cov_df, mapped.cov_df)
+        self.assertFalse(mapped.meth_df.values.flags.writeable)
+        self.assertFalse(mapped.cov_df.values.flags.writeable)
+
+        # a run of columns is still a view; scattered rows are copied out of the mapping
+        mapped = parse_gctx.parse(fn, mmap=True, cidx=[2, 3, 4], layers="meth")
+        pandas_testing.assert_frame_equal(mg.meth_df.iloc[:, [2, 3, 4]], mapped.meth_df)
+        self.assertFalse(mapped.meth_df.values.flags.writeable)
+        mapped = parse_gctx.parse(fn, mmap=True, ridx=[5, 0, 3], sort_row_meta=False)
+        self.assertTrue(mapped.meth_df.values.flags.writeable)
+        pandas_testing.assert_frame_equal(mg.meth_df.iloc[[5, 0, 3]], mapped.meth_df)
+        pandas_testing.assert_frame_equal(mg.cov_df.iloc[[5, 0, 3]], mapped.cov_df)
+
+        # chunked data matrices are read as usual
+        write_gctx.write(mg, fn, max_chunk_kb=1)
+        with h5py.File(fn, "r") as hdf5_file:
+            self.assertFalse(parse_gctx.can_memory_map(hdf5_file[data_node]))
+        parsed = parse_gctx.parse(fn, mmap=True)
+        pandas_testing.assert_frame_equal(mg.meth_df, parsed.meth_df)
+        os.remove(fn)
+
     def test_parse_metadata_df(self):
         mini_gctoo = mini_gctoo_for_testing.make()
         # convert row_metadata to np.nan
@@ -278,6 +376,24 @@ class TestParseGctx(unittest.TestCase):
         col_df = parse_gctx.parse_metadata_df("col", col_dset, False)
         pandas_testing.assert_frame_equal(mini_gctoo_with_neg_666.col_metadata_df, col_df)
 
+        # only the requested fields are read, in the requested order
+        fields = list(mini_row_meta.columns[[2, 0]])
+        row_df = parse_gctx.parse_metadata_df("row", row_dset, True, fields=fields)
+        pandas_testing.assert_frame_equal(mini_row_meta[fields], row_df)
+
+        col_df = parse_gctx.get_column_metadata(
+            "cmapPy/pandasGEXpress/tests/functional_tests/mini_gctoo_for_testing.gctx", col_meta_fields=[])
+        self.assertEqual((6, 0), col_df.shape)
+        self.assertEqual(list(mini_gctoo_with_neg_666.col_metadata_df.index), list(col_df.index))
+
+        row_df = parse_gctx.get_row_metadata(
+            "cmapPy/pandasGEXpress/tests/functional_tests/mini_gctoo_for_testing.gctx", row_meta_fields=fields)
+        pandas_testing.assert_frame_equal(mini_row_meta[fields], row_df)
+
+        with self.assertRaises(Exception) as context:
+            parse_gctx.parse_metadata_df("row", row_dset, True, fields=["not_a_field"])
+        self.assertIn("were not found in the file: ['not_a_field']", str(context.exception))
+
         # test that ID's are not converted to numeric
         expected_rids = [str(i) for i in range(3)]
         row_dset = {"id": MockHdf5Dset(expected_rids, str),
@@ -310,6 +426,35 @@ class TestParseGctx(unittest.TestCase):
         out_df3 = parse_gctx.replace_666(row_df3, convert_neg_666=True)
         self.assertTrue(e_df3.equals(out_df3))
 
+    def test_decode_metadata_values(self):
+        # numeric datasets stay numeric
+        out = parse_gctx.decode_metadata_values(np.array([1, -666, 3], dtype=np.int32))
+        self.assertEqual(np.int64, out.dtype)
+        # narrow floats read as their shortest decimal representation, as via str
+        out = parse_gctx.decode_metadata_values(np.array([3.3, 0.1], dtype=np.float32))
+        self.assertEqual([3.3, 0.1], list(out))
+
+        # string datasets become numeric if every value is
+        out = parse_gctx.decode_metadata_values(np.array([b"2", b"-666", b"2.5"]))
+        self.assertEqual([2.0, -666.0, 2.5], list(out))
+        out = parse_gctx.decode_metadata_values(np.array([b"chr2", b"chr1", b"-666", b"chr2"]))
+        self.assertEqual(["chr2", "chr1", "-666", "chr2"], list(out))
+
+        cat = parse_gctx.decode_metadata_values(np.array([b"chr2", b"chr1", b"-666", b"chr2"]), as_categorical=True)
+        self.assertIsInstance(cat, pd.Categorical)
+        self.assertEqual(["-666", "chr1", "chr2"], list(cat.categories))
+
+        # -666 handling per field
+        converted = parse_gctx.replace_666_values(cat, True)
+        self.assertEqual(["chr1", "chr2"], list(converted.categories))
+        self.assertTrue(pd.isnull(converted[2]))
+        out = parse_gctx.replace_666_values(np.array([1, -666, 3]), True)
+        np.testing.assert_array_equal(np.array([1, np.nan, 3]), out)
+        out = parse_gctx.replace_666_values(np.array([1, -666, 3]), False)
+        self.assertEqual([1, "-666", 3], list(out))
+        out = parse_gctx.replace_666_values(np.array(["a", "-666"], dtype=object), True)
+        self.assertTrue(pd.isnull(out[1]))
+
     def test_set_metadata_index_and_column_names(self):
         mini_gctoo = mini_gctoo_for_testing.make()
         mini_gctoo.row_metadata_df.index.name = None
@@ -385,6 +530,235 @@ class TestParseGctx(unittest.TestCase):
 
         mini_gctx.close()
 
+    def test_read_data_subset(self):
+        data = np.arange(2 * 40 * 30, dtype=np.float32).reshape((2, 40, 30))
+        fn = "read_data_subset_test.gctx"
+        hdf5_file = h5py.File(fn, "w")
+        chunked_dset = hdf5_file.create_dataset("chunked", data=data, chunks=(1, 8, 7), compression="gzip")
+        contiguous_dset = hdf5_file.create_dataset("contiguous", data=data)
+
+        ridx = [29, 0, 1, 2, 15, 16, 3]
+        cidx = [5, 6, 7, 39, 20]
+        expected = data[:, cidx, :][:, :, ridx]
+
+        for dset in [chunked_dset, contiguous_dset]:
+            out = parse_gctx.read_data_subset(dset, ridx, cidx)
+            self.assertEqual(out.dtype, np.float32)
+            np.testing.assert_array_equal(out, expected)
+
+        # every strategy yields the same result
+        for strategy in ["full", "runs", "chunks"]:
+            with mock.patch("cmapPy.pandasGEXpress.parse_gctx.choose_read_strategy", return_value=strategy):
+                out = parse_gctx.read_data_subset(chunked_dset, ridx, cidx)
+            np.testing.assert_array_equal(out, expected)
+
+        # most chunks are touched, so reading everything at once is cheapest
+        self.assertEqual("full", parse_gctx.choose_read_strategy(
+            chunked_dset, np.arange(0, 30, 2), np.arange(0, 40, 2)))
+
+        # a few scattered rows are read chunk by chunk
+        wide_dset = hdf5_file.create_dataset("wide", shape=(2, 64, 2000), dtype=np.float32, chunks=(1, 64, 100))
+        self.assertEqual("chunks", parse_gctx.choose_read_strategy(
+            wide_dset, np.array([5, 705, 1405]), np.array([1, 3])))
+
+        # a contiguous block is read as a single run
+        self.assertEqual("runs", parse_gctx.choose_read_strategy(
+            contiguous_dset, np.arange(3, 9), np.arange(10, 12)))
+
+        hdf5_file.close()
+        os.remove(fn)
+
+    def test_open_data_dset(self):
+        gctx_path = "open_data_dset_test.gctx"
+        write_gctx.write(mini_gctoo_for_testing.make(), gctx_path, max_chunk_kb=1)
+        hdf5_file = h5py.File(gctx_path, "r")
+
+        data_dset = parse_gctx.open_data_dset(hdf5_file, [0, 1], [0], rdcc_nbytes=4 * 1024 * 1024,
+                                              rdcc_nslots=1009, rdcc_w0=1.0)
+        self.assertEqual((1009, 4 * 1024 * 1024, 1.0), data_dset.id.get_access_plist().get_chunk_cache())
+        del data_dset
+
+        with self.assertRaises(Exception) as context:
+            parse_gctx.open_data_dset(hdf5_file, [0], [0], rdcc_nbytes="big")
+        self.assertIn("Invalid rdcc_nbytes: big", str(context.exception))
+        hdf5_file.close()
+
+        expected = parse_gctx.parse(gctx_path, ridx=[4, 1], cidx=[0, 5], validate="none")
+        for rdcc_nbytes in ["auto", 64 * 1024]:
+            mg = parse_gctx.parse(gctx_path, ridx=[4, 1], cidx=[0, 5], validate="none", rdcc_nbytes=rdcc_nbytes)
+            pandas_testing.assert_frame_equal(expected.meth_df, mg.meth_df)
+        os.remove(gctx_path)
+
+        # "runs" reads sharing chunks get a cache holding every chunk they touch
+        fn = "auto_chunk_cache_test.gctx"
+        hdf5_file = h5py.File(fn, "w")
+        dset = hdf5_file.create_dataset("chunked", shape=(2, 40, 30), dtype=np.float32, chunks=(1, 8, 10))
+        chunk_nbytes = 8 * 10 * 4
+        with mock.patch("cmapPy.pandasGEXpress.parse_gctx.choose_read_strategy", return_value="runs"):
+            # two column runs in the same column chunk, over 3 row chunks and 2 planes
+            self.assertEqual((2 * 3 * chunk_nbytes, 521),
+                             parse_gctx.get_auto_chunk_cache(dset, range(30), [0, 1, 4, 5], 0, 521))
+            # runs that do not share chunks need no cache
+            self.assertEqual((100, 521), parse_gctx.get_auto_chunk_cache(dset, range(30), [0, 9], 100, 521))
+        self.assertEqual((100, 521), parse_gctx.get_auto_chunk_cache(dset, [0], [0], 100, 521))
+        hdf5_file.close()
+        os.remove(fn)
+
+    def test_iter_blocks(self):
+        mg = mini_gctoo_for_testing.make()
+        mg = GCToo.GCToo(meth_df=mg.meth_df, cov_df=(mg.meth_df.abs() * 10).round(),
+                         row_metadata_df=mg.row_metadata_df, col_metadata_df=mg.col_metadata_df)
+        fn = "iter_blocks_test.gctx"
+        write_gctx.write(mg, fn)
+
+        # unchunked dataset: blocks of exactly block_size
+        hdf5_file = h5py.File(fn, "r+")
+        data = hdf5_file[data_node][...]
+        del hdf5_file[data_node]
+        hdf5_file.create_dataset(data_node, data=data)
+        hdf5_file.close()
+
+        blocks = list(parse_gctx.iter_blocks(fn, axis="row", block_size=4))
+        self.assertEqual([4, 2], [b.meth_df.shape[0] for b in blocks])
+        pandas_testing.assert_frame_equal(pd.concat([b.meth_df for b in blocks]), mg.meth_df)
+        pandas_testing.assert_frame_equal(pd.concat([b.cov_df for b in blocks]), mg.cov_df)
+        pandas_testing.assert_frame_equal(pd.concat([b.row_metadata_df for b in blocks]), mg.row_metadata_df)
+
+        # chunked dataset: blocks are aligned to the chunk grid
+        hdf5_file = h5py.File(fn, "r+")
+        data = hdf5_file[data_node][...]
+        del hdf5_file[data_node]
+        hdf5_file.create_dataset(data_node, data=data, chunks=(1, 2, 6))
+        hdf5_file.close()
+
+        blocks = list(parse_gctx.iter_blocks(fn, axis="col", block_size=3, as_tuples=True))
+        self.assertEqual([2, 2, 2], [meth.shape[1] for (meth, cov, meta) in blocks])
+        pandas_testing.assert_frame_equal(pd.concat([meth for (meth, cov, meta) in blocks], axis=1), mg.meth_df)
+        pandas_testing.assert_frame_equal(pd.concat([meta for (meth, cov, meta) in blocks]), mg.col_metadata_df)
+
+        # subsetting skips blocks without requested entries
+        blocks = list(parse_gctx.iter_blocks(fn, axis="col", block_size=2, cidx=[0, 1, 5], ridx=[2, 3]))
+        self.assertEqual(2, len(blocks))
+        pandas_testing.assert_frame_equal(pd.concat([b.meth_df for b in blocks], axis=1),
+                                          mg.meth_df.iloc[[2, 3], [0, 1, 5]])
+
+        os.remove(fn)
+
+    def test_iter_blocks_prefetch(self):
+        mg = mini_gctoo_for_testing.make()
+        mg = GCToo.GCToo(meth_df=mg.meth_df, cov_df=(mg.meth_df.abs() * 10).round(),
+                         row_metadata_df=mg.row_metadata_df, col_metadata_df=mg.col_metadata_df)
+        fn = "iter_blocks_prefetch_test.gctx"
+        write_gctx.write(mg, fn, max_chunk_kb=1, access_pattern="by-sample")
+
+        for prefetch in [1, 4]:
+            blocks = list(parse_gctx.iter_blocks(fn, axis="col", block_size=1, prefetch=prefetch))
+            self.assertEqual(6, len(blocks))
+            pandas_testing.assert_frame_equal(mg.meth_df, pd.concat([b.meth_df for b in blocks], axis=1))
+            pandas_testing.assert_frame_equal(mg.cov_df, pd.concat([b.cov_df for b in blocks], axis=1))
+
+        # stopping early cancels the read-ahead thread
+        blocks = parse_gctx.iter_blocks(fn, axis="col", block_size=1, prefetch=2, prefetch_max_mb=1)
+        pandas_testing.assert_frame_equal(mg.meth_df.iloc[:, [0]], next(blocks).meth_df)
+        blocks.close()
+        self.assertNotIn("gctx-prefetch", [thread.name for thread in threading.enumerate()])
+        os.remove(fn)
+
+        # the memory budget bounds the depth, but at least one block is read ahead
+        self.assertEqual(4, parse_gctx.get_prefetch_depth(4, None, 1024))
+        self.assertEqual(2, parse_gctx.get_prefetch_depth(4, 1, 512 * 1024))
+        self.assertEqual(1, parse_gctx.get_prefetch_depth(4, 1, 8 * 1024 * 1024))
+
+        # errors reach the consumer at the block that failed
+        def read_block(i):
+            if i == 2:
+                raise ValueError("block 2 is unreadable")
+            return i
+        blocks = parse_gctx.prefetch_blocks(read_block, list(range(5)), 3)
+        self.assertEqual([0, 1], [next(blocks), next(blocks)])
+        with self.assertRaises(ValueError):
+            next(blocks)
+
+    def test_read_data_parallel(self):
+        data = np.random.RandomState(0).rand(2, 23, 37).astype(np.float32)
+        fn = "read_data_parallel_test.gctx"
+        hdf5_file = h5py.File(fn, "w")
+        shuffled_dset = hdf5_file.create_dataset("shuffled", data=data, chunks=(1, 5, 8),
+                                                 compression="gzip", shuffle=True)
+        gzip_dset = hdf5_file.create_dataset("gzip", data=data, chunks=(2, 4, 10), compression="gzip")
+        contiguous_dset = hdf5_file.create_dataset("contiguous", data=data)
+
+        self.assertTrue(parse_gctx.can_read_parallel(shuffled_dset))
+        self.assertTrue(parse_gctx.can_read_parallel(gzip_dset))
+        self.assertFalse(parse_gctx.can_read_parallel(contiguous_dset))
+
+        ridx = [36, 0, 1, 17, 18, 19, 5]
+        cidx = [22, 3, 4, 10]
+        for dset in [shuffled_dset, gzip_dset]:
+            out = parse_gctx.read_data_parallel(dset, ridx, cidx, n_threads=3)
+            np.testing.assert_array_equal(out, data[:, cidx, :][:, :, ridx])
+
+            out = parse_gctx.read_data_parallel(dset, range(37), range(23), n_threads=4)
+            np.testing.assert_array_equal(out, data)
+
+        # a single plane is read alone
+        for dset in [shuffled_dset, gzip_dset, contiguous_dset]:
+            out = parse_gctx.read_dataset(dset, ridx, cidx, n_threads=2, plane=1)
+            np.testing.assert_array_equal(out, data[1:2, cidx, :][:, :, ridx])
+            out = parse_gctx.read_dataset(dset, range(37), range(23), plane=0)
+            np.testing.assert_array_equal(out, data[0:1])
+
+        # chunks that were never written hold the fill value
+        empty_dset = hdf5_file.create_dataset("empty", shape=(2, 6, 6), dtype=np.float32, chunks=(1, 3, 3),
+                                              compression="gzip", fillvalue=-1)
+        empty_dset[0, 0:3, 0:3] = 7
+        out = parse_gctx.read_data_parallel(empty_dset, range(6), range(6), n_threads=2)
+        np.testing.assert_array_equal(out, empty_dset[...])
+
+        hdf5_file.close()
+        os.remove(fn)
+
+    def test_validate_data_array(self):
+        row_ids = pd.Index(["r" + str(i) for i in range(4)])
+        col_ids = pd.Index(["c" + str(i) for i in range(3)])
+        data_array = np.zeros((2, 3, 4), dtype=np.float32)
+        data_array[0, 1, 2] = np.nan
+        data_array[1, 0, 3] = np.nan
+        data_array[1, 2, 1] = 7
+
+        # valid data, including NaNs, passes every level
+        for validate in ["none", "fast", "full"]:
+            parse_gctx.validate_data_array(data_array, row_ids, col_ids, validate)
+
+        # non-integer coverage is only caught by "full"
+        data_array[1, 2, 0] = 2.5
+        parse_gctx.validate_data_array(data_array, row_ids, col_ids, "fast")
+        parse_gctx.validate_data_array(data_array, row_ids, col_ids, "full", check_cov=False)
+        with self.assertRaises(Exception) as context:
+            parse_gctx.validate_data_array(data_array, row_ids, col_ids, "full")
+        self.assertIn("coverage values must be integers", str(context.exception))
+        self.assertIn("('r0', 'c2', 2.5)", str(context.exception))
+
+        # methylation above 100 is caught in any block, here with one column per block
+        data_array[1, 2, 0] = 2
+        data_array[0, 2, 3] = 101
+        with mock.patch("cmapPy.pandasGEXpress.parse_gctx.validate_block_cells", 4):
+            with self.assertRaises(Exception) as context:
+                parse_gctx.validate_data_array(data_array, row_ids, col_ids, "fast")
+        self.assertIn("methylation values must be at most 100", str(context.exception))
+        self.assertIn("('r3', 'c2', 101.0)", str(context.exception))
+        parse_gctx.validate_data_array(data_array, row_ids, col_ids, "none")
+
+    def test_get_contiguous_runs(self):
+        runs = parse_gctx.get_contiguous_runs(np.array([0, 1, 2, 5, 7, 8]))
+        self.assertEqual([(0, 0, 3), (3, 5, 6), (4, 7, 9)], runs)
+
+        self.assertEqual([], parse_gctx.get_contiguous_runs(np.array([])))
+
+    def test_get_chunk_groups(self):
+        groups = parse_gctx.get_chunk_groups(np.array([0, 3, 4, 9, 10, 25]), 5)
+        self.assertEqual([(0, 3), (3, 4), (4, 5), (5, 6)], groups)
+
     def test_convert_ids_to_meta_type(self):
         # happy path
         id_list = [0, 1, 2]
@@ -0,0 +1,120 @@
+import logging
+import unittest
+import os
+import h5py
+import numpy as np
+import pandas as pd
+import pandas.util.testing as pandas_testing
+import cmapPy.pandasGEXpress.setup_GCToo_logger as setup_logger
+import cmapPy.pandasGEXpress.virtual_gctx as virtual_gctx
+import cmapPy.pandasGEXpress.parse_gctx as parse_gctx
+import cmapPy.pandasGEXpress.write_gctx as write_gctx
+import cmapPy.pandasGEXpress.GCToo as GCToo
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+SOURCE_FILES = ["virtual_gctx_test_plate{}.gctx".format(i) for i in range(3)]
+VIRTUAL_FILE = "virtual_gctx_test.gctx"
+
+
+def make_plate(plate, rids, n_cols):
+    rng = np.random.RandomState(plate)
+    cids = ["p{}_s{}".format(plate, i) for i in range(n_cols)]
+    meth_df = pd.DataFrame(np.round(100 * rng.rand(len(rids), n_cols), 2), index=rids, columns=cids).astype(np.float32)
+    cov_df = pd.DataFrame(rng.poisson(20, size=(len(rids), n_cols)), index=rids, columns=cids).astype(np.float32)
+    row_meta = pd.DataFrame({"chr": ["chr1"] * len(rids), "pos": np.arange(len(rids))}, index=rids)
+    col_meta = pd.DataFrame({"plate": ["plate" + str(plate)] * n_cols}, index=cids)
+    if plate == 1:
+        col_meta["dose"] = np.arange(n_cols, dtype=float)
+    return GCToo.GCToo(meth_df=meth_df, cov_df=cov_df, row_metadata_df=row_meta, col_metadata_df=col_meta)
+
+
+class TestVirtualGctx(unittest.TestCase):
+    def setUp(self):
+        rids = ["cg{:03d}".format(i) for i in range(40)]
+        self.plates = [make_plate(plate, rids, 3 + plate) for plate in range(3)]
+
+    def tearDown(self):
+        for test_file in SOURCE_FILES + [VIRTUAL_FILE]:
+            if os.path.exists(test_file):
+                os.remove(test_file)
+
+    def test_write(self):
+        for cov_dtype in [None, np.uint16]:
+            for (plate, source_file) in zip(self.plates, SOURCE_FILES):
+                write_gctx.write(plate, source_file, max_chunk_kb=1, cov_dtype=cov_dtype)
+            virtual_gctx.write(SOURCE_FILES, VIRTUAL_FILE)
+
+            with h5py.File(VIRTUAL_FILE, "r") as hdf5_file:
+                self.assertTrue(hdf5_file[write_gctx.data_matrix_node].is_virtual)
+                self.assertEqual(cov_dtype is not None, write_gctx.cov_matrix_node in hdf5_file)
+
+            expected_meth_df = pd.concat([plate.meth_df for plate in self.plates], axis=1)
+            expected_cov_df = pd.concat([plate.cov_df for plate in self.plates], axis=1)
+            parsed = parse_gctx.parse(VIRTUAL_FILE)
+            pandas_testing.assert_frame_equal(expected_meth_df, parsed.meth_df, check_names=False)
+            pandas_testing.assert_frame_equal(expected_cov_df, parsed.cov_df, check_names=False)
+            pandas_testing.assert_frame_equal(self.plates[0].row_metadata_df, parsed.row_metadata_df,
+                                              check_names=False)
+
+            # column metadata is concatenated in source order; fields missing from a source are NaN
+            self.assertEqual(["plate0"] * 3 + ["plate1"] * 4 + ["plate2"] * 5, list(parsed.col_metadata_df["plate"]))
+            self.assertEqual([0.0, 1.0, 2.0, 3.0], list(parsed.col_metadata_df["dose"].dropna()))
+
+            # slices across plates
+            rid = ["cg007", "cg031"]
+            cid = ["p2_s4", "p0_s1"]
+            sliced = parse_gctx.parse(VIRTUAL_FILE, rid=rid, cid=cid, sort_col_meta=False)
+            pandas_testing.assert_frame_equal(expected_meth_df.loc[rid, cid], sliced.meth_df, check_names=False)
+            lazy = parse_gctx.parse(VIRTUAL_FILE, lazy=True)
+            pandas_testing.assert_frame_equal(expected_cov_df.loc[rid, cid], lazy.cov_df.loc[rid, cid].materialize(),
+                                              check_names=False)
+            lazy.close()
+
+    def test_write_categorical(self):
+        # dictionary encoded row metadata keeps pointing at its categories in the virtual .gctx
+        for (plate, source_file) in zip(self.plates, SOURCE_FILES):
+            write_gctx.write(plate, source_file, categorical_metadata=["chr", "plate"])
+        virtual_gctx.write(SOURCE_FILES, VIRTUAL_FILE)
+
+        with h5py.File(VIRTUAL_FILE, "r") as hdf5_file:
+            chr_dset = hdf5_file[write_gctx.row_meta_group_node]["chr"]
+            self.assertTrue(parse_gctx.is_categorical_dset(chr_dset))
+            self.assertEqual(write_gctx.categories_group_nodes["row"] + "/chr",
+                             hdf5_file[chr_dset.attrs[write_gctx.categories_attr]].name)
+
+        parsed = parse_gctx.parse(VIRTUAL_FILE)
+        pandas_testing.assert_frame_equal(self.plates[0].row_metadata_df, parsed.row_metadata_df.astype({"chr": object}),
+                                          check_names=False)
+        self.assertEqual(["plate0"] * 3 + ["plate1"] * 4 + ["plate2"] * 5,
+                         list(parsed.col_metadata_df["plate"].astype(object)))
+
+    def test_write_errors(self):
+        for (plate, source_file) in zip(self.plates, SOURCE_FILES):
+            write_gctx.write(plate, source_file)
+
+        # rows must match in order
+        write_gctx.write(make_plate(2, list(self.plates[0].meth_df.index[::-1]), 5), SOURCE_FILES[2])
+        with self.assertRaises(Exception) as context:
+            virtual_gctx.write(SOURCE_FILES, VIRTUAL_FILE)
+        self.assertIn("row ids of", str(context.exception))
+
+        # column ids must be unique
+        with self.assertRaises(Exception) as context:
+            virtual_gctx.write(SOURCE_FILES[:2] + SOURCE_FILES[:1], VIRTUAL_FILE)
+        self.assertIn("column ids must be unique", str(context.exception))
+
+        # a virtual .gctx whose sources are gone is not read
+        args = virtual_gctx.build_parser().parse_args(["-if"] + SOURCE_FILES[:2] + ["-o", VIRTUAL_FILE])
+        virtual_gctx.virtual_gctx_main(args)
+        self.assertEqual((40, 7), parse_gctx.parse(VIRTUAL_FILE).meth_df.shape)
+        os.remove(SOURCE_FILES[1])
+        with self.assertRaises(Exception) as context:
+            parse_gctx.parse(VIRTUAL_FILE)
+        self.assertIn("are missing", str(context.exception))
+
+
+if __name__ == "__main__":
+    setup_logger.setup(verbose=True)
+
+    unittest.main()
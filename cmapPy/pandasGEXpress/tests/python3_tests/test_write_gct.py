@@ -1,3 +1,4 @@
+import io
 import unittest
 import logging
 import cmapPy.pandasGEXpress.setup_GCToo_logger as setup_logger
@@ -11,9 +12,6 @@ import cmapPy.pandasGEXpress.write_gct as wg
 FUNCTIONAL_TESTS_PATH = "cmapPy/pandasGEXpress/tests/functional_tests/"
 logger = logging.getLogger(setup_logger.LOGGER_NAME)
 
-import sys
-sys.exit('NOT TESTING GCT PARSING FUNCTIONS YET')
-
 class TestWriteGct(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
@@ -40,6 +38,7 @@ class TestWriteGct(unittest.TestCase):
         out_name = os.path.join(FUNCTIONAL_TESTS_PATH, "test_write_out.gct")
 
         gctoo = GCToo.GCToo(meth_df=self.data_df,
+                            cov_df=GCToo.make_missing_plane_df(self.data_df.index, self.data_df.columns),
                             row_metadata_df=self.row_metadata_df,
                             col_metadata_df=self.col_metadata_df)
         wg.write(gctoo, out_name, data_null="NaN",
@@ -48,7 +47,7 @@ class TestWriteGct(unittest.TestCase):
         # Read in the gct and verify that it's the same as gctoo
         new_gct = pg.parse(out_name)
 
-        pd.testing.assert_frame_equal(new_gct.data_df, gctoo.data_df)
+        pd.testing.assert_frame_equal(new_gct.meth_df, gctoo.meth_df)
         pd.testing.assert_frame_equal(new_gct.row_metadata_df, gctoo.row_metadata_df)
         pd.testing.assert_frame_equal(new_gct.col_metadata_df, gctoo.col_metadata_df)
 
@@ -113,6 +112,104 @@ class TestWriteGct(unittest.TestCase):
         pd.testing.assert_frame_equal(bottom_half, e_bottom_half)
         os.remove(fname)
 
+    def test_format_data_block(self):
+        # the vectorized formatter writes the same text as pandas, in blocks or not
+        values = np.array([[-0.00001, -0., 0.5, 2.5, 0.00005, np.nan],
+                           [0.00015, 0.00025, 99.99995, -12345.6789, 1e6, 3.]], dtype=np.float32)
+        data_df = pd.DataFrame(values, index=pd.Index(["rid1", "rid2"], name="rid"))
+        row_metadata_df = pd.DataFrame({"rhd1": ["a", np.nan]}, index=data_df.index)
+        # rids and metadata with quotes, tabs and newlines are quoted as pandas quotes them
+        quoted_data_df = pd.DataFrame(values, index=pd.Index(['r"1', ""], name="rid"))
+        quoted_row_metadata_df = pd.DataFrame({"rhd1": ['a "q"', "b\tc"], "rhd2": ["d\ne", ""]},
+                                              index=quoted_data_df.index)
+        write_block_mb = wg.write_block_mb
+        try:
+            for (block_row_metadata_df, block_data_df) in [(row_metadata_df, data_df),
+                                                           (quoted_row_metadata_df, quoted_data_df),
+                                                           (quoted_row_metadata_df.iloc[:, :0], quoted_data_df)]:
+                for data_float_format in ["%.4f", "%.0f", "%.1f"]:
+                    for data_null in ["NaN", ""]:
+                        expected = io.StringIO()
+                        wg.write_bottom_half_block(expected, block_row_metadata_df, block_data_df, data_null,
+                                                   data_float_format, "-666")
+                        for block_mb in [16, 0.0001]:
+                            wg.write_block_mb = block_mb
+                            actual = io.StringIO()
+                            wg.write_bottom_half(actual, block_row_metadata_df, block_data_df, data_null,
+                                                 data_float_format, "-666")
+                            self.assertEqual(expected.getvalue(), actual.getvalue())
+        finally:
+            wg.write_block_mb = write_block_mb
+        self.assertTrue(expected.getvalue().startswith('"r""1"\t'))
+
+        # values it cannot format are left to pandas
+        self.assertIsNone(wg.format_data_block(np.array([[np.inf]], dtype=np.float32), 4, "NaN"))
+        self.assertEqual(["\t1.50\t-666"], wg.format_data_block(np.array([[1.5, np.nan]], dtype=np.float32),
+                                                               2, "-666"))
+
+    def test_write_bottom_half_ties(self):
+        # values halfway between two outputs (k / 2 ** n), -0 and NaN, over several blocks
+        rng = np.random.RandomState(0)
+        values = (rng.randint(-10 ** 6, 10 ** 6, size=(200, 20)) / 2.0 ** rng.randint(1, 12, size=(200, 20)))
+        values = values.astype(np.float32)
+        values[0, :3] = [-0., -0.0005, 0.0005]
+        values[rng.rand(200, 20) < 0.05] = np.nan
+        data_df = pd.DataFrame(values, index=pd.Index(["rid{}".format(i) for i in range(200)], name="rid"))
+        row_metadata_df = pd.DataFrame({"rhd1": np.where(np.arange(200) % 3 == 0, np.nan, 'a "q"')},
+                                       index=data_df.index)
+        write_block_mb = wg.write_block_mb
+        wg.write_block_mb = 0.01
+        try:
+            for data_float_format in ["%.0f", "%.3f", "%.4f"]:
+                expected = io.StringIO()
+                wg.write_bottom_half_block(expected, row_metadata_df, data_df, "NaN", data_float_format, "-666")
+                actual = io.StringIO()
+                wg.write_bottom_half(actual, row_metadata_df, data_df, "NaN", data_float_format, "-666")
+                self.assertEqual(expected.getvalue(), actual.getvalue())
+        finally:
+            wg.write_block_mb = write_block_mb
+
+    def test_write_compressed(self):
+        nan_values = ["NaN", "-666"]
+        compress_block_mb = wg.compress_block_mb
+        # several blocks, i.e. several gzip members (bz2/xz streams)
+        wg.compress_block_mb = 0.0001
+        try:
+            for suffix in ["", ".gz", ".bz2", ".xz"]:
+                for n_threads in [1, 2]:
+                    fname = "test_write_compressed.gct" + suffix
+                    f = wg.open_out_file(fname, n_threads)
+                    wg.write_version_and_dims("1.3", ["4", "3", "3", "4"], f)
+                    wg.write_top_half(f, self.row_metadata_df, self.col_metadata_df, "-666", "-666")
+                    wg.write_bottom_half(f, self.row_metadata_df, self.data_df, "NaN", "%.4f", "-666")
+                    f.close()
+
+                    self.assertTrue(pg.is_gct(fname))
+                    self.assertEqual(("GCT1.3", 4, 3, 3, 4), pg.read_version_and_dims(fname))
+                    (row_df, col_df, data_df) = pg.parse_into_3_df(fname, 4, 3, 3, 4, nan_values)
+                    pd.testing.assert_frame_equal(self.data_df, data_df)
+                    pd.testing.assert_frame_equal(self.row_metadata_df, row_df)
+
+                    # subsets and n_jobs work on compressed files too
+                    (_, _, data_df) = pg.parse_into_3_df(fname, 4, 3, 3, 4, nan_values,
+                                                         rid=["rid3"], cidx=[2], n_jobs=2)
+                    pd.testing.assert_frame_equal(self.data_df.iloc[[2], [2]], data_df)
+                    os.remove(fname)
+
+                    # and whole GCToos round-trip through write and parse
+                    gctoo = GCToo.GCToo(meth_df=self.data_df,
+                                        cov_df=GCToo.make_missing_plane_df(self.data_df.index, self.data_df.columns),
+                                        row_metadata_df=self.row_metadata_df,
+                                        col_metadata_df=self.col_metadata_df)
+                    wg.write(gctoo, fname, n_threads=n_threads)
+                    new_gct = pg.parse(fname)
+                    pd.testing.assert_frame_equal(gctoo.meth_df, new_gct.meth_df)
+                    pd.testing.assert_frame_equal(gctoo.row_metadata_df, new_gct.row_metadata_df)
+                    pd.testing.assert_frame_equal(gctoo.col_metadata_df, new_gct.col_metadata_df)
+                    os.remove(fname)
+        finally:
+            wg.compress_block_mb = compress_block_mb
+
     def test_append_dims_and_file_extension(self):
         data_df = pd.DataFrame([[1, 2], [3, 4]])
         fname_no_gct = "a/b/file"
@@ -138,7 +235,7 @@ class TestWriteGct(unittest.TestCase):
         # Read in new gct file
         l1000_out_gct = pg.parse(l1000_out_path)
 
-        pd.testing.assert_frame_equal(l1000_in_gct.data_df, l1000_out_gct.data_df)
+        pd.testing.assert_frame_equal(l1000_in_gct.meth_df, l1000_out_gct.meth_df)
         pd.testing.assert_frame_equal(l1000_in_gct.row_metadata_df, l1000_out_gct.row_metadata_df)
         pd.testing.assert_frame_equal(l1000_in_gct.col_metadata_df, l1000_out_gct.col_metadata_df)
 
@@ -158,7 +255,7 @@ class TestWriteGct(unittest.TestCase):
         # Read in new gct file
         p100_out_gct = pg.parse(p100_out_path)
 
-        pd.testing.assert_frame_equal(p100_in_gct.data_df, p100_out_gct.data_df)
+        pd.testing.assert_frame_equal(p100_in_gct.meth_df, p100_out_gct.meth_df)
         pd.testing.assert_frame_equal(p100_in_gct.row_metadata_df, p100_out_gct.row_metadata_df)
         pd.testing.assert_frame_equal(p100_in_gct.col_metadata_df, p100_out_gct.col_metadata_df)
 
@@ -4,6 +4,9 @@ import unittest
 import h5py
 import os
 import numpy
+import pandas as pd
+import pandas.util.testing as pandas_testing
+import cmapPy.pandasGEXpress.GCToo as GCToo
 import cmapPy.pandasGEXpress.parse_gctx as parse_gctx
 import cmapPy.pandasGEXpress.write_gctx as write_gctx
 import cmapPy.pandasGEXpress.mini_gctoo_for_testing as mini_gctoo_for_testing
@@ -108,6 +111,160 @@ class TestWriteGctx(unittest.TestCase):
         self.assertEqual(calculated_chunk_size, expected_chunk_size)
 
 
+    def test_set_data_matrix_chunks(self):
+        # 1024 KB chunks of float32 = 262144 elements
+        df_shape = (1000000, 500)
+        self.assertEqual((1, 262, 1000), write_gctx.set_data_matrix_chunks(df_shape, "default", 1024, 256))
+        self.assertEqual((1, 1, 262144), write_gctx.set_data_matrix_chunks(df_shape, "by-sample", 1024, 256))
+        self.assertEqual((1, 500, 524), write_gctx.set_data_matrix_chunks(df_shape, "by-cpg", 1024, 256))
+        self.assertEqual((1, 500, 512), write_gctx.set_data_matrix_chunks(df_shape, "balanced", 1024, 256))
+
+        # chunks never exceed the matrix
+        self.assertEqual((1, 3, 5), write_gctx.set_data_matrix_chunks((5, 3), "balanced", 1024, 256))
+
+        # empty matrices are stored contiguously, as is any matrix with "contiguous"
+        self.assertIsNone(write_gctx.set_data_matrix_chunks((0, 3), "by-cpg", 1024, 256))
+        self.assertIsNone(write_gctx.set_data_matrix_chunks(df_shape, "contiguous", 1024, 256))
+
+        with self.assertRaises(Exception) as context:
+            write_gctx.set_data_matrix_chunks(df_shape, "by-gene", 1024, 256)
+        self.assertIn("Invalid access_pattern", str(context.exception))
+
+    def test_write_data_matrix_layout(self):
+        mini_gctoo = mini_gctoo_for_testing.make()
+        fn = "data_matrix_layout_test.gctx"
+
+        write_gctx.write(mini_gctoo, fn, access_pattern="by-sample", data_compression="lzf")
+        hdf5_file = h5py.File(fn, "r")
+        data_dset = hdf5_file[write_gctx.data_matrix_node]
+        self.assertEqual((1, 1, 6), data_dset.chunks)
+        self.assertEqual("lzf", data_dset.compression)
+        self.assertTrue(data_dset.shuffle)
+        self.assertEqual("by-sample", data_dset.attrs[write_gctx.access_pattern_attr].decode())
+        numpy.testing.assert_array_equal(data_dset[0], mini_gctoo.meth_df.values.T)
+        hdf5_file.close()
+
+        write_gctx.write(mini_gctoo, fn, data_compression=None, data_shuffle=False)
+        hdf5_file = h5py.File(fn, "r")
+        data_dset = hdf5_file[write_gctx.data_matrix_node]
+        self.assertEqual((1, 6, 6), data_dset.chunks)
+        self.assertIsNone(data_dset.compression)
+        self.assertFalse(data_dset.shuffle)
+        hdf5_file.close()
+        os.remove(fn)
+
+    def test_write_data_matrix_parallel(self):
+        rng = numpy.random.RandomState(0)
+        rids = ["r" + str(i) for i in range(2500)]
+        cids = ["c" + str(i) for i in range(5)]
+        cov_df = pd.DataFrame(rng.poisson(20, size=(2500, 5)), index=rids, columns=cids).astype(numpy.float32)
+        meth_df = (100 * pd.DataFrame(rng.rand(2500, 5), index=rids, columns=cids)).astype(numpy.float32)
+        my_gctoo = GCToo.GCToo(meth_df=meth_df, cov_df=cov_df)
+
+        fn = "parallel_write_test.gctx"
+        write_gctx.write(my_gctoo, fn, max_chunk_kb=4, n_threads=3)
+
+        hdf5_file = h5py.File(fn, "r")
+        data_dset = hdf5_file[write_gctx.data_matrix_node]
+        self.assertEqual((1, 1, 1000), data_dset.chunks)
+        self.assertEqual("gzip", data_dset.compression)
+        self.assertTrue(data_dset.shuffle)
+        numpy.testing.assert_array_equal(data_dset[0], meth_df.values.T)
+        numpy.testing.assert_array_equal(data_dset[1], cov_df.values.T)
+        hdf5_file.close()
+
+        parsed = parse_gctx.parse(fn)
+        pandas_testing.assert_frame_equal(parsed.meth_df, meth_df, check_names=False)
+        pandas_testing.assert_frame_equal(parsed.cov_df, cov_df, check_names=False)
+        os.remove(fn)
+
+    def test_write_integer_coverage(self):
+        rng = numpy.random.RandomState(1)
+        rids = ["r" + str(i) for i in range(1200)]
+        cids = ["c" + str(i) for i in range(4)]
+        cov_df = pd.DataFrame(rng.poisson(20, size=(1200, 4)), index=rids, columns=cids).astype(numpy.float32)
+        cov_df.iloc[3, 2] = numpy.nan
+        meth_df = (100 * pd.DataFrame(rng.rand(1200, 4), index=rids, columns=cids)).astype(numpy.float32)
+        my_gctoo = GCToo.GCToo(meth_df=meth_df, cov_df=cov_df)
+
+        fn = "integer_coverage_test.gctx"
+        for n_threads in [1, 2]:
+            write_gctx.write(my_gctoo, fn, max_chunk_kb=4, n_threads=n_threads, cov_dtype=numpy.uint16)
+
+            hdf5_file = h5py.File(fn, "r")
+            self.assertEqual((1, 4, 1200), hdf5_file[write_gctx.data_matrix_node].shape)
+            cov_dset = hdf5_file[write_gctx.cov_matrix_node]
+            self.assertEqual(numpy.uint16, cov_dset.dtype)
+            self.assertEqual(65535, cov_dset[0, 2, 3])
+            self.assertEqual(65535, cov_dset.attrs[write_gctx.cov_missing_attr])
+            hdf5_file.close()
+
+            parsed = parse_gctx.parse(fn, n_threads=n_threads)
+            pandas_testing.assert_frame_equal(parsed.meth_df, meth_df, check_names=False)
+            pandas_testing.assert_frame_equal(parsed.cov_df, cov_df, check_names=False)
+
+            subset = parse_gctx.parse(fn, ridx=[5, 3, 900], cidx=[2, 0], sort_row_meta=False, sort_col_meta=False)
+            pandas_testing.assert_frame_equal(subset.cov_df, cov_df.iloc[[5, 3, 900], [2, 0]], check_names=False)
+            os.remove(fn)
+
+        # values that don't fit the integer type are refused
+        with self.assertRaises(Exception) as context:
+            write_gctx.encode_coverage(numpy.array([1.5, 2.]), numpy.uint16)
+        self.assertIn("must hold integers", str(context.exception))
+        with self.assertRaises(Exception) as context:
+            write_gctx.encode_coverage(numpy.array([70000.]), numpy.uint16)
+        self.assertIn("must be between 0 and 65534", str(context.exception))
+        with self.assertRaises(Exception) as context:
+            write_gctx.write(my_gctoo, fn, cov_dtype=numpy.int8)
+        self.assertIn("Invalid cov_dtype", str(context.exception))
+        os.remove(fn)
+
+    def test_write_categorical_metadata(self):
+        rids = ["cg" + str(i) for i in range(40)]
+        cids = ["s1", "s2"]
+        row_meta = pd.DataFrame({"chr": ["chr1", "chr2", "chrX", "-666"] * 10,
+                                 "annotation": ["a" + str(i) for i in range(40)],
+                                 "pos": range(40),
+                                 "context": pd.Categorical(["CG", None] * 20)}, index=rids)
+        meth_df = pd.DataFrame(numpy.ones((40, 2), dtype=numpy.float32), index=rids, columns=cids)
+        my_gctoo = GCToo.GCToo(meth_df=meth_df, cov_df=meth_df, row_metadata_df=row_meta)
+
+        fn = "categorical_metadata_test.gctx"
+        write_gctx.write(my_gctoo, fn, categorical_metadata="auto")
+
+        # only the low cardinality string and Categorical fields are encoded
+        hdf5_file = h5py.File(fn, "r")
+        chr_dset = hdf5_file[write_gctx.row_meta_group_node + "/chr"]
+        self.assertEqual(numpy.int8, chr_dset.dtype)
+        self.assertEqual(write_gctx.categorical_encoding, chr_dset.attrs[write_gctx.encoding_attr])
+        self.assertEqual([b"-666", b"chr1", b"chr2", b"chrX"],
+                         list(hdf5_file[chr_dset.attrs[write_gctx.categories_attr]][...]))
+        self.assertEqual("S", hdf5_file[write_gctx.row_meta_group_node + "/annotation"].dtype.kind)
+        self.assertNotIn(write_gctx.encoding_attr, hdf5_file[write_gctx.row_meta_group_node + "/pos"].attrs)
+        hdf5_file.close()
+
+        row_df = parse_gctx.get_row_metadata(fn, convert_neg_666=False)
+        self.assertIsInstance(row_df["chr"].dtype, pd.CategoricalDtype)
+        self.assertEqual(list(row_meta["chr"]), list(row_df["chr"]))
+        self.assertEqual(list(row_meta["pos"]), list(row_df["pos"]))
+        self.assertTrue(pd.isnull(row_df["context"].iloc[1]))
+
+        row_df = parse_gctx.get_row_metadata(fn, convert_neg_666=True)
+        self.assertEqual(["chr1", "chr2", "chrX"], list(row_df["chr"].cat.categories))
+        self.assertTrue(pd.isnull(row_df["chr"].iloc[3]))
+        os.remove(fn)
+
+        # fields can be listed explicitly, and numeric dictionaries read back as numbers
+        row_meta["pos"] = [1, 2] * 20
+        my_gctoo = GCToo.GCToo(meth_df=meth_df, cov_df=meth_df, row_metadata_df=row_meta)
+        write_gctx.write(my_gctoo, fn, categorical_metadata=["pos", "annotation"])
+        row_df = parse_gctx.get_row_metadata(fn)
+        self.assertEqual(numpy.int64, row_df["pos"].dtype)
+        self.assertEqual(list(row_meta["pos"]), list(row_df["pos"]))
+        self.assertIsInstance(row_df["annotation"].dtype, pd.CategoricalDtype)
+        self.assertEqual(list(row_meta["annotation"]), list(row_df["annotation"]))
+        os.remove(fn)
+
     def test_write_metadata(self):
         """
 		CASE 1:
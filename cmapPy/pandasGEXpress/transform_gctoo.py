@@ -13,7 +13,8 @@ import cmapPy.pandasGEXpress.GCToo as GCToo
 logger = logging.getLogger(setup_logger.LOGGER_NAME)
 
 def transpose(my_gctoo):
-    new_gctoo = GCToo.GCToo(
+    # type(my_gctoo) so that a LazyGCToo stays lazy
+    new_gctoo = type(my_gctoo)(
         meth_df=my_gctoo.meth_df.T,
         cov_df=my_gctoo.cov_df.T,
         row_metadata_df=my_gctoo.col_metadata_df,
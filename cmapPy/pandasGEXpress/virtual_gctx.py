@@ -0,0 +1,227 @@
+"""
+Command-line script to build a virtual .gctx from several .gctx files that
+share the same rows, e.g. one file per plate.
+
+The virtual .gctx is a small file whose data matrix (and integer coverage
+dataset, if the sources store one) is an HDF5 virtual dataset mapping the
+columns of each source file, in the order the sources are given. The row
+metadata is copied from the first source and the column metadata of all
+sources is concatenated, so parse_gctx.parse, lazy parsing, iter_blocks and
+GCTXReader work across all sources without any data being copied.
+
+The sources are referenced by absolute path, and must not be moved or
+rewritten while the virtual .gctx is in use; parse_gctx refuses to read a
+virtual .gctx whose sources are missing (see parse_gctx.check_virtual_sources).
+
+ex:
+    virtual_gctx -if plate1.gctx plate2.gctx plate3.gctx -o all_plates.gctx
+"""
+import os
+import sys
+import glob
+import logging
+import argparse
+import h5py
+import numpy
+import pandas as pd
+import cmapPy.pandasGEXpress.setup_GCToo_logger as setup_logger
+import cmapPy.pandasGEXpress.parse_gctx as parse_gctx
+import cmapPy.pandasGEXpress.write_gctx as write_gctx
+import cmapPy.pandasGEXpress.index_gctx as index_gctx
+
+logger = logging.getLogger(setup_logger.LOGGER_NAME)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    # required
+    mutually_exclusive_group = parser.add_mutually_exclusive_group(required=True)
+    mutually_exclusive_group.add_argument("--input_filepaths", "-if", nargs="+",
+                                          help="full paths to .gctx files to combine, in column order")
+    mutually_exclusive_group.add_argument("--file_wildcard", "-w", type=str,
+                                          help="wildcard specifying the .gctx files to combine, in sorted order")
+    # optional
+    parser.add_argument("--out_name", "-o", type=str, default="virtual.gctx",
+                        help="what to name the virtual .gctx")
+    parser.add_argument("-verbose", "-v",
+                        help="Whether to print a bunch of output.", action="store_true", default=False)
+    return parser
+
+
+def main():
+    args = build_parser().parse_args(sys.argv[1:])
+    setup_logger.setup(verbose=args.verbose)
+    virtual_gctx_main(args)
+
+
+def virtual_gctx_main(args):
+    """ Separate from main() in order to make command-line tool. """
+    if args.input_filepaths is not None:
+        files = args.input_filepaths
+    else:
+        files = sorted(glob.glob(os.path.expanduser(args.file_wildcard)))
+    write(files, args.out_name)
+    logger.info("Wrote virtual GCTX of {} files: {}".format(len(files), args.out_name))
+
+
+def write(source_paths, out_file_name, gzip_compression_level=6):
+    """
+    Writes a virtual .gctx over source_paths.
+
+    Input:
+        - source_paths (list of str): .gctx files to combine; they must have the same row ids,
+            in the same order, the same data matrix layout and dtype, and distinct column ids
+        - out_file_name (str): path of the virtual .gctx to write
+        - gzip_compression_level (int): gzip level of the metadata and id index
+    Output:
+        - out_file_name (str): path of the virtual .gctx, with a .gctx suffix
+    """
+    if len(source_paths) == 0:
+        msg = "no source files were given"
+        logger.error(msg)
+        raise Exception("virtual_gctx.write " + msg)
+    source_paths = [os.path.abspath(os.path.expanduser(path)) for path in source_paths]
+    out_file_name = write_gctx.add_gctx_to_out_name(out_file_name)
+    if os.path.abspath(out_file_name) in source_paths:
+        msg = "the virtual .gctx cannot overwrite one of its sources: {}".format(out_file_name)
+        logger.error(msg)
+        raise Exception("virtual_gctx.write " + msg)
+
+    layouts = [read_source_layout(path) for path in source_paths]
+    check_source_layouts(source_paths, layouts)
+    col_metadata_df = pd.concat(
+        [parse_gctx.parse(path, col_meta_only=True) for path in source_paths], axis=0, sort=False)
+    check_unique_col_ids(col_metadata_df)
+
+    hdf5_out = h5py.File(out_file_name, "w")
+    try:
+        write_gctx.write_version(hdf5_out)
+        hdf5_out.attrs[write_gctx.src_attr] = out_file_name
+
+        nodes = [write_gctx.data_matrix_node]
+        if layouts[0]["cov_dtype"] is not None:
+            nodes.append(write_gctx.cov_matrix_node)
+        for node in nodes:
+            write_virtual_matrix(hdf5_out, node, source_paths, layouts)
+
+        # rows are shared, so their metadata (including any dictionary encoding) is copied as is
+        with h5py.File(source_paths[0], "r") as first_source:
+            hdf5_out.require_group(os.path.dirname(write_gctx.row_meta_group_node))
+            first_source.copy(first_source[write_gctx.row_meta_group_node], hdf5_out,
+                              name=write_gctx.row_meta_group_node)
+            row_categories_node = write_gctx.categories_group_nodes["row"]
+            if row_categories_node in first_source:
+                first_source.copy(first_source[row_categories_node], hdf5_out, name=row_categories_node)
+        repoint_categories(hdf5_out, "row")
+
+        write_gctx.write_metadata(hdf5_out, "col", col_metadata_df, gzip_compression=gzip_compression_level)
+        index_gctx.write_index(hdf5_out, "row", gzip_compression=gzip_compression_level)
+        index_gctx.write_index(hdf5_out, "col", gzip_compression=gzip_compression_level)
+    finally:
+        hdf5_out.close()
+    return out_file_name
+
+
+def repoint_categories(hdf5_out, dim):
+    """
+    Points the categories reference of each dictionary encoded metadata field of hdf5_out
+    at the categories dataset of hdf5_out; references copied from a source still point
+    into the source, and read as null in hdf5_out.
+
+    Input:
+        - hdf5_out (h5py File): virtual .gctx open for writing
+        - dim (str): "row" or "col"
+    """
+    meta_group = hdf5_out[write_gctx.row_meta_group_node if dim == "row" else write_gctx.col_meta_group_node]
+    for (field, dset) in meta_group.items():
+        if parse_gctx.is_categorical_dset(dset):
+            categories_dset = hdf5_out[write_gctx.categories_group_nodes[dim] + "/" + field]
+            dset.attrs[write_gctx.categories_attr] = categories_dset.ref
+
+
+def read_source_layout(path):
+    """
+    Reads what a virtual .gctx needs to know about one of its sources.
+
+    Input:
+        - path (str): path of a .gctx file
+    Output:
+        - layout (dict): shape and dtype of the data matrix, dtype and missing value of the
+            integer coverage dataset (None if coverage is in the data matrix), and row ids
+    """
+    with h5py.File(path, "r") as hdf5_file:
+        data_dset = hdf5_file[write_gctx.data_matrix_node]
+        layout = {"shape": data_dset.shape, "dtype": data_dset.dtype, "cov_dtype": None,
+                  "cov_missing": None, "row_ids": hdf5_file[write_gctx.row_meta_group_node]["id"][...]}
+        if write_gctx.cov_matrix_node in hdf5_file:
+            cov_dset = hdf5_file[write_gctx.cov_matrix_node]
+            layout["cov_dtype"] = cov_dset.dtype
+            layout["cov_missing"] = cov_dset.attrs[write_gctx.cov_missing_attr]
+    return layout
+
+
+def check_source_layouts(source_paths, layouts):
+    """ Checks that every source can be mapped next to the first one. """
+    first = layouts[0]
+    for (path, layout) in zip(source_paths[1:], layouts[1:]):
+        if (layout["shape"][:-2] != first["shape"][:-2] or layout["dtype"] != first["dtype"] or
+                layout["cov_dtype"] != first["cov_dtype"]):
+            msg = ("the data matrix of {} is stored differently from that of {} " +
+                   "(shape {} vs {}, dtype {} vs {}, coverage dtype {} vs {})").format(
+                path, source_paths[0], layout["shape"], first["shape"], layout["dtype"], first["dtype"],
+                layout["cov_dtype"], first["cov_dtype"])
+            logger.error(msg)
+            raise Exception("virtual_gctx.check_source_layouts " + msg)
+
+        if not numpy.array_equal(layout["row_ids"], first["row_ids"]):
+            msg = ("the row ids of {} differ from those of {}; the sources of a virtual .gctx must " +
+                   "have the same rows, in the same order").format(path, source_paths[0])
+            logger.error(msg)
+            raise Exception("virtual_gctx.check_source_layouts " + msg)
+
+
+def check_unique_col_ids(col_metadata_df):
+    duplicated = col_metadata_df.index[col_metadata_df.index.duplicated()]
+    if len(duplicated) > 0:
+        msg = ("column ids must be unique across sources; found {} duplicates, e.g. {}. " +
+               "Use concat with reset_ids to combine such files").format(len(duplicated), list(duplicated[:5]))
+        logger.error(msg)
+        raise Exception("virtual_gctx.check_unique_col_ids " + msg)
+
+
+def write_virtual_matrix(hdf5_out, node, source_paths, layouts):
+    """
+    Creates node of hdf5_out as a virtual dataset placing the columns of the node
+    of each source one after another.
+
+    Input:
+        - hdf5_out (h5py File): virtual .gctx open for writing
+        - node (str): write_gctx.data_matrix_node or write_gctx.cov_matrix_node
+        - source_paths (list of str): absolute paths of the sources
+        - layouts (list of dict): read_source_layout of each source
+    """
+    if node == write_gctx.cov_matrix_node:
+        (dtype, fillvalue) = (layouts[0]["cov_dtype"], layouts[0]["cov_missing"])
+        lead_shape = (1,)
+    else:
+        (dtype, fillvalue) = (layouts[0]["dtype"], numpy.nan)
+        lead_shape = layouts[0]["shape"][:-2]
+
+    n_rows = layouts[0]["shape"][-1]
+    n_cols = sum(layout["shape"][-2] for layout in layouts)
+    virtual_layout = h5py.VirtualLayout(shape=lead_shape + (n_cols, n_rows), dtype=dtype)
+    col_start = 0
+    for (path, layout) in zip(source_paths, layouts):
+        source_shape = lead_shape + (layout["shape"][-2], n_rows)
+        col_stop = col_start + layout["shape"][-2]
+        virtual_layout[..., col_start:col_stop, :] = h5py.VirtualSource(path, node, shape=source_shape)
+        col_start = col_stop
+
+    data_dset = hdf5_out.create_virtual_dataset(node, virtual_layout, fillvalue=fillvalue)
+    if node == write_gctx.cov_matrix_node:
+        data_dset.attrs[write_gctx.cov_missing_attr] = fillvalue
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,17 @@
+import io
+import os
+import re
+import bz2
+import csv
+import gzip
+import lzma
+import types
 import logging
+import functools
+import collections
+import concurrent.futures
 import pandas as pd
 import numpy as np
-import os
 import cmapPy.pandasGEXpress.setup_GCToo_logger as setup_logger
 
 __author__ = "Lev Litichevskiy"
@@ -12,30 +22,47 @@ logger = logging.getLogger(setup_logger.LOGGER_NAME)
 # Only writes GCT1.3
 VERSION = "1.3"
 
+# suffixes of compressed gcts (e.g. .gct.gz) and how to compress them. Every block of
+# text is compressed on its own, as one gzip member (or bz2/xz stream): blocks can then
+# be compressed in parallel, and the file still reads as a single stream
+compressors = {".gz": functools.partial(gzip.compress, compresslevel=6),
+               ".bz2": bz2.compress, ".xz": lzma.compress}
+
+# approximate size of the blocks of text compressed at a time
+compress_block_mb = 16
+
+# approximate size of the blocks of rows formatted at a time by write_bottom_half
+write_block_mb = 16
+
 
-def write(gctoo, out_fname, data_null="NaN", metadata_null="-666", filler_null="-666", data_float_format="%.4f"):
+def write(gctoo, out_fname, data_null="NaN", metadata_null="-666", filler_null="-666", data_float_format="%.4f",
+          n_threads=1):
     """Write a gctoo object to a gct file.
 
+    A gct holds a single data matrix: meth_df is written, cov_df is not.
+
     Args:
         gctoo (gctoo object)
-        out_fname (string): filename for output gct file
+        out_fname (string): filename for output gct file; if it ends with .gct.gz,
+            .gct.bz2 or .gct.xz, the gct is compressed as it is written (see compressors)
         data_null (string): how to represent missing values in the data (default = "NaN")
         metadata_null (string): how to represent missing values in the metadata (default = "-666")
         filler_null (string): what value to fill the top-left filler block with (default = "-666")
         data_float_format (string): how many decimal points to keep in representing data
             (default = 4 digits; None will keep all digits)
+        n_threads (int): number of threads compressing a compressed gct (default = 1)
 
     Returns:
         None
 
     """
     # Create handle for output file
-    if not out_fname.endswith(".gct"):
+    if not any(out_fname.endswith(".gct" + suffix) for suffix in [""] + list(compressors)):
         out_fname += ".gct"
-    f = open(out_fname, "w")
+    f = open_out_file(out_fname, n_threads)
 
     # Write first two lines
-    dims = [str(gctoo.data_df.shape[0]), str(gctoo.data_df.shape[1]),
+    dims = [str(gctoo.meth_df.shape[0]), str(gctoo.meth_df.shape[1]),
             str(gctoo.row_metadata_df.shape[1]), str(gctoo.col_metadata_df.shape[1])]
     write_version_and_dims(VERSION, dims, f)
 
@@ -44,13 +71,83 @@ def write(gctoo, out_fname, data_null="NaN", metadata_null="-666", filler_null="
                    metadata_null, filler_null)
 
     # Write bottom half of the gct
-    write_bottom_half(f, gctoo.row_metadata_df, gctoo.data_df,
+    write_bottom_half(f, gctoo.row_metadata_df, gctoo.meth_df,
                       data_null, data_float_format, metadata_null)
 
     f.close()
     logger.info("GCT has been written to {}".format(out_fname))
 
 
+def open_out_file(out_fname, n_threads=1):
+    """Open a text handle on out_fname, compressing what is written if its suffix is in compressors.
+
+    Args:
+        out_fname (string): filename for output gct file
+        n_threads (int): number of compression threads
+
+    Returns:
+        f (file handle)
+    """
+    for (suffix, compress) in compressors.items():
+        if out_fname.endswith(suffix):
+            return BlockCompressedFile(out_fname, compress, n_threads)
+    return open(out_fname, "w")
+
+
+class BlockCompressedFile(io.TextIOBase):
+    """Text file handle that compresses what is written in blocks of about compress_block_mb.
+
+    Blocks are compressed independently (see compressors) by a pool of n_threads threads,
+    as compression releases the GIL, and written in order; at most 2 * n_threads
+    compressed blocks are held at a time.
+    """
+    def __init__(self, out_fname, compress, n_threads=1):
+        super(BlockCompressedFile, self).__init__()
+        self.out_file = open(out_fname, "wb")
+        self.compress = compress
+        self.n_threads = n_threads
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=n_threads) if n_threads > 1 else None
+        self.pending = collections.deque()
+        self.buffer = []
+        self.buffered = 0
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        self.buffer.append(text)
+        self.buffered += len(text)
+        if self.buffered >= compress_block_mb * 2 ** 20:
+            self.compress_block()
+        return len(text)
+
+    def compress_block(self):
+        if not self.buffer:
+            return
+        block = "".join(self.buffer).encode("utf-8")
+        self.buffer = []
+        self.buffered = 0
+        if self.executor is None:
+            self.out_file.write(self.compress(block))
+            return
+        self.pending.append(self.executor.submit(self.compress, block))
+        while len(self.pending) >= 2 * self.n_threads:
+            self.out_file.write(self.pending.popleft().result())
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self.compress_block()
+            while self.pending:
+                self.out_file.write(self.pending.popleft().result())
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+            self.out_file.close()
+            super(BlockCompressedFile, self).close()
+
+
 def write_version_and_dims(version, dims, f):
     """Write first two lines of gct file.
 
@@ -92,10 +189,9 @@ def write_top_half(f, row_metadata_df, col_metadata_df, metadata_null, filler_nu
     top_half_df.iloc[range(1, top_half_df.shape[0]), 0] = col_metadata_df.columns.values
 
     # Insert the column metadata, but first convert to strings and replace NaNs
-    col_metadata_indices = (range(1, top_half_df.shape[0]),
-                            range(1 + row_metadata_df.shape[1], top_half_df.shape[1]))
-    # pd.DataFrame.at to insert into dataframe(python3)
-    top_half_df.at[col_metadata_indices[0], col_metadata_indices[1]] = (
+    col_metadata_indices = (slice(1, top_half_df.shape[0]),
+                            slice(1 + row_metadata_df.shape[1], top_half_df.shape[1]))
+    top_half_df.iloc[col_metadata_indices[0], col_metadata_indices[1]] = (
         col_metadata_df.astype(str).replace("nan", value=metadata_null).T.values)
 
     # Write top_half_df to file
@@ -105,6 +201,115 @@ def write_top_half(f, row_metadata_df, col_metadata_df, metadata_null, filler_nu
 def write_bottom_half(f, row_metadata_df, data_df, data_null, data_float_format, metadata_null):
     """ Write the bottom half of the gct file: row metadata and data.
 
+    Rows are written in blocks of about write_block_mb of text. With a fixed-point
+    data_float_format ("%.4f") and float32 data, the data of each block is formatted by
+    format_data_block, vectorized over the block; other blocks are written by
+    write_bottom_half_block with pandas. Either way, the text is the same.
+
+    Args:
+        f (file handle): handle for output file
+        row_metadata_df (pandas df)
+        data_df (pandas df)
+        data_null (string): how to represent missing values in the data
+        metadata_null (string): how to represent missing values in the metadata
+        data_float_format (string): how many decimal points to keep in representing data
+
+    Returns:
+        None
+    """
+    match = re.match(r"^%\.(\d+)f$", data_float_format or "")
+    decimals = int(match.group(1)) if match else None
+    # a float32 times 10 ** decimals is exact in float64 up to 12 decimals
+    vectorized = (decimals is not None and decimals <= 12 and data_df.dtypes.eq(np.float32).all() and
+                  " " not in data_null)
+    # formatting takes about 64 bytes of working memory per cell
+    block_rows = max(1, int((write_block_mb * 2 ** 20) // (64 * (1 + data_df.shape[1]))))
+
+    for start in range(0, data_df.shape[0], block_rows):
+        block_row_metadata_df = row_metadata_df.iloc[start:start + block_rows]
+        block_data_df = data_df.iloc[start:start + block_rows]
+        data_lines = None
+        if vectorized:
+            data_lines = format_data_block(block_data_df.values, decimals, data_null)
+        if data_lines is None:
+            write_bottom_half_block(f, block_row_metadata_df, block_data_df, data_null, data_float_format,
+                                    metadata_null)
+            continue
+
+        # rids and row metadata, with NaNs replaced, quoted as to_csv quotes them
+        left_values = block_row_metadata_df.astype(str).replace("nan", value=metadata_null).values
+        # (a trailing empty field, dropped with the line end, keeps a lone empty rid unquoted)
+        left_lines = []
+        left_writer = csv.writer(types.SimpleNamespace(write=left_lines.append), delimiter="\t",
+                                 lineterminator="\n", quoting=csv.QUOTE_MINIMAL, quotechar='"', doublequote=True)
+        left_writer.writerows(
+            (rid,) + tuple(row_metadata) + ("",)
+            for (rid, row_metadata) in zip(block_row_metadata_df.index.astype(str), left_values))
+        f.write("".join(left_line[:-2] + data_line + "\n" for (left_line, data_line) in zip(left_lines, data_lines)))
+
+
+def format_data_block(values, decimals, data_null):
+    """ Format a block of float32 data as "%.<decimals>f" would, vectorized over the block.
+
+    Every cell is written right-aligned into a fixed-width byte field, digit by digit
+    with integer arithmetic, and the padding is then dropped.
+
+    Args:
+        values (numpy array of float32): shape (number of rows, number of columns)
+        decimals (int): number of decimals, at most 12
+        data_null (string): how to represent missing values; must not contain spaces
+
+    Returns:
+        data_lines (list of strings): for each row, its values each preceded by a tab;
+            None if the block holds values that cannot be formatted this way (infinite,
+            or too large for int64 once scaled)
+    """
+    x = values.astype(np.float64)
+    missing = np.isnan(x)
+    magnitude = np.abs(np.where(missing, 0, x))
+    if not np.isfinite(magnitude).all() or (magnitude.size > 0 and magnitude.max() * 10 ** decimals >= 1e17):
+        return None
+    scaled = np.rint(magnitude * 10 ** decimals).astype(np.int64)
+    (int_part, frac_part) = np.divmod(scaled, 10 ** decimals)
+
+    # a tab, then room for the sign, the integer digits, the point and the decimals
+    n_int_digits = len(str(int(int_part.max()))) if int_part.size > 0 else 1
+    n_frac_chars = decimals + 1 if decimals > 0 else 0
+    width = max(1 + n_int_digits + n_frac_chars, len(data_null))
+    chars = np.full(x.shape + (1 + width,), ord(" "), dtype=np.uint8)
+    chars[..., 0] = ord("\t")
+
+    for k in range(decimals):
+        chars[..., width - k] = ord("0") + frac_part % 10
+        frac_part //= 10
+    if decimals > 0:
+        chars[..., width - decimals] = ord(".")
+
+    # integer digits right to left; the sign (kept for -0.0000, as "%" does) goes just
+    # left of the leading digit
+    n_digits = np.ones(x.shape, dtype=np.int64)
+    for k in range(1, n_int_digits):
+        n_digits += int_part >= 10 ** k
+    negative = np.signbit(x) & ~missing
+    for k in range(n_int_digits + 1):
+        chars[..., width - n_frac_chars - k] = np.where(
+            k < n_digits, ord("0") + (int_part // 10 ** k) % 10,
+            np.where(negative & (k == n_digits), ord("-"), ord(" ")))
+
+    if missing.any():
+        chars[missing, 1:] = np.frombuffer(data_null.rjust(width).encode("ascii"), dtype=np.uint8)
+
+    flat = chars.reshape((x.shape[0], -1))
+    kept = flat != ord(" ")
+    text = flat[kept].tobytes().decode("ascii")
+    stops = np.cumsum(kept.sum(axis=1))
+    starts = np.concatenate(([0], stops[:-1]))
+    return [text[line_start:line_stop] for (line_start, line_stop) in zip(starts, stops)]
+
+
+def write_bottom_half_block(f, row_metadata_df, data_df, data_null, data_float_format, metadata_null):
+    """ Write rows of the bottom half of the gct file with pandas; see write_bottom_half.
+
     Args:
         f (file handle): handle for output file
         row_metadata_df (pandas df)
@@ -1,7 +1,12 @@
 import logging
+import zlib
+import concurrent.futures
 import h5py
 import numpy
+import pandas as pd
 import cmapPy.pandasGEXpress.setup_GCToo_logger as setup_logger
+import cmapPy.pandasGEXpress.lazy_gctoo as lazy_gctoo
+import cmapPy.pandasGEXpress.index_gctx as index_gctx
 
 __author__ = "Oana Enache"
 __email__ = "oana@broadinstitute.org"
@@ -10,14 +15,31 @@ logger = logging.getLogger(setup_logger.LOGGER_NAME)
 
 src_attr = "src"
 data_matrix_node = "/0/DATA/0/matrix"
+cov_matrix_node = "/0/DATA/0/coverage"
+cov_missing_attr = "missing_value"
+cov_dtypes = [numpy.uint16, numpy.uint32]
 row_meta_group_node = "/0/META/ROW"
 col_meta_group_node = "/0/META/COL"
 version_attr = "version"
 version_number = "GCTX1.0"
+access_pattern_attr = "access_pattern"
+encoding_attr = "encoding"
+categorical_encoding = "categorical"
+categories_attr = "categories"
+categories_group_nodes = {"row": "/0/META/ROW_CATEGORIES", "col": "/0/META/COL_CATEGORIES"}
+access_patterns = ["default", "by-sample", "by-cpg", "balanced", "contiguous"]
+
+# with categorical_metadata="auto", string fields with at most this fraction of distinct values are encoded
+auto_categorical_max_fraction = 0.1
+
+# amount of data (both planes) held in memory at once when writing a LazyGCToo
+lazy_write_block_kb = 256 * 1024
 
 
 def write(gctoo_object, out_file_name, convert_back_to_neg_666=False, gzip_compression_level=6,
-    max_chunk_kb=1024, matrix_dtype=numpy.float32):
+    max_chunk_kb=1024, matrix_dtype=numpy.float32, n_threads=1, access_pattern="default",
+    data_compression="gzip", data_shuffle=True, cov_dtype=None, categorical_metadata=None,
+    id_index=True):
     """
 	Writes a GCToo instance to specified file.
 
@@ -25,9 +47,29 @@ def write(gctoo_object, out_file_name, convert_back_to_neg_666=False, gzip_compr
 		- gctoo_object (GCToo): A GCToo instance.
 		- out_file_name (str): file name to write gctoo_object to.
         - convert_back_to_neg_666 (bool): whether to convert np.NAN in metadata back to "-666"
-        - gzip_compression_level (int, default=6): Compression level to use for metadata. 
+        - gzip_compression_level (int, default=6): Compression level to use for metadata and,
+            with data_compression="gzip", for the data matrix.
         - max_chunk_kb (int, default=1024): The maximum number of KB a given chunk will occupy
         - matrix_dtype (numpy dtype, default=numpy.float32): Storage data type for data matrix. 
+        - n_threads (int, default=1): If > 1, the data matrix is split into chunks that are gzip
+            compressed by a pool of n_threads threads and written with write_direct_chunk.
+        - access_pattern (str, default="default"): How the data matrix will mostly be read; sets
+            its chunk shape. One of "by-sample" (few columns, all rows), "by-cpg" (few rows,
+            all columns), "balanced", "default" (the cmapM/cmapR chunking), or "contiguous"
+            (unchunked and uncompressed, so it can be memory mapped; see parse_gctx.parse's mmap).
+        - data_compression (str or None, default="gzip"): Codec for the data matrix; "gzip",
+            "lzf" or None.
+        - data_shuffle (bool, default=True): Whether to apply the shuffle filter to the data matrix.
+        - cov_dtype (numpy dtype or None, default=None): If numpy.uint16 or numpy.uint32, coverage is
+            stored as integers in its own dataset (cov_matrix_node), with the largest value of
+            cov_dtype marking missing values, and the data matrix only holds methylation.
+            None stores both planes as matrix_dtype in the data matrix.
+        - categorical_metadata (list of str, "auto" or None, default=None): metadata fields to store
+            dictionary encoded, as integer codes plus a dataset of distinct values. "auto" encodes
+            pandas Categorical fields and string fields with few distinct values
+            (see auto_categorical_max_fraction). None stores every field as is.
+        - id_index (bool, default=True): Whether to store a sorted index of the rids and cids
+            (see index_gctx), which lets parse_gctx slice by id without reading every id.
 	"""
     # make sure out file has a .gctx suffix
     gctx_out_name = add_gctx_to_out_name(out_file_name)
@@ -41,23 +83,55 @@ def write(gctoo_object, out_file_name, convert_back_to_neg_666=False, gzip_compr
     # write src
     write_src(hdf5_out, gctoo_object, gctx_out_name)
 
-    # set chunk size for data matrix
+    # set chunk shape for data matrix
     elem_per_kb = calculate_elem_per_kb(max_chunk_kb, matrix_dtype)
-    chunk_size = set_data_matrix_chunk_size(gctoo_object.meth_df.shape, max_chunk_kb, elem_per_kb)
+    chunks = set_data_matrix_chunks(gctoo_object.meth_df.shape, access_pattern, max_chunk_kb, elem_per_kb)
 
     # write data matrix
-    # create merged array
-    merged_array = numpy.array([gctoo_object.meth_df.transpose().values,gctoo_object.cov_df.transpose().values])
-    hdf5_out.create_dataset(data_matrix_node, data=merged_array,
-        dtype=matrix_dtype)
+    n_planes = 2 if cov_dtype is None else 1
+    data_shape = (n_planes, gctoo_object.meth_df.shape[1], gctoo_object.meth_df.shape[0])
+    if cov_dtype is not None:
+        check_cov_dtype(cov_dtype)
+    if isinstance(gctoo_object, lazy_gctoo.LazyGCToo):
+        data_dset = create_data_matrix(hdf5_out, data_shape, matrix_dtype, chunks, data_compression,
+            gzip_compression_level, data_shuffle, access_pattern)
+        cov_dset = None
+        if cov_dtype is not None:
+            cov_dset = create_data_matrix(hdf5_out, data_shape, cov_dtype, chunks, data_compression,
+                gzip_compression_level, data_shuffle, access_pattern, node=cov_matrix_node)
+        write_lazy_data_matrix(data_dset, gctoo_object, cov_dset)
+    else:
+        meth_values = gctoo_object.meth_df.transpose().values
+        cov_values = gctoo_object.cov_df.transpose().values
+        if cov_dtype is None:
+            matrices = [(data_matrix_node, matrix_dtype, [meth_values, cov_values])]
+        else:
+            matrices = [(data_matrix_node, matrix_dtype, [meth_values]),
+                        (cov_matrix_node, cov_dtype, [encode_coverage(cov_values, cov_dtype)])]
+
+        for (node, dtype, plane_values) in matrices:
+            if n_threads > 1 and chunks is not None and data_compression == "gzip":
+                data_dset = create_data_matrix(hdf5_out, data_shape, dtype, chunks, data_compression,
+                    gzip_compression_level, data_shuffle, access_pattern, node=node)
+                write_data_matrix_parallel(data_dset, plane_values, gzip_compression_level, n_threads)
+            else:
+                # create merged array
+                merged_array = numpy.array(plane_values)
+                create_data_matrix(hdf5_out, data_shape, dtype, chunks, data_compression,
+                    gzip_compression_level, data_shuffle, access_pattern, data=merged_array, node=node)
 
     # write col metadata
     write_metadata(hdf5_out, "col", gctoo_object.col_metadata_df, convert_back_to_neg_666,
-        gzip_compression=gzip_compression_level)
+        gzip_compression=gzip_compression_level, categorical_fields=categorical_metadata)
 
     # write row metadata
     write_metadata(hdf5_out, "row", gctoo_object.row_metadata_df, convert_back_to_neg_666,
-        gzip_compression=gzip_compression_level)
+        gzip_compression=gzip_compression_level, categorical_fields=categorical_metadata)
+
+    # write rid and cid indexes
+    if id_index:
+        index_gctx.write_index(hdf5_out, "row", gzip_compression=gzip_compression_level)
+        index_gctx.write_index(hdf5_out, "col", gzip_compression=gzip_compression_level)
 
     # close gctx file
     hdf5_out.close()
@@ -142,7 +216,236 @@ def set_data_matrix_chunk_size(df_shape, max_chunk_kb, elem_per_kb):
     col_chunk_size = min(((max_chunk_kb*elem_per_kb)//row_chunk_size), df_shape[1])
     return (row_chunk_size, col_chunk_size)
 
-def write_metadata(hdf5_out, dim, metadata_df, convert_back_to_neg_666=False, gzip_compression=0):
+def set_data_matrix_chunks(df_shape, access_pattern, max_chunk_kb, elem_per_kb):
+    """
+    Sets the chunk shape of the (2, ncol, nrow) data matrix from the declared access pattern.
+    Each chunk holds a single plane, so methylation and coverage can be read independently.
+
+    Input:
+        - df_shape (tuple): shape of meth_df, (nrow, ncol)
+        - access_pattern (str): "default", "by-sample", "by-cpg", "balanced" or "contiguous"
+        - max_chunk_kb (int): The maximum number of KB a given chunk will occupy
+        - elem_per_kb (int): Number of elements per kb
+
+    Returns:
+        chunks (tuple or None): (1, col chunk size, row chunk size); None if the matrix is empty
+            or access_pattern is "contiguous"
+    """
+    if access_pattern not in access_patterns:
+        msg = "Invalid access_pattern: {}; must be one of {}".format(access_pattern, access_patterns)
+        logger.error(msg)
+        raise Exception("write_gctx.set_data_matrix_chunks " + msg)
+
+    (n_rows, n_cols) = df_shape
+    if n_rows == 0 or n_cols == 0 or access_pattern == "contiguous":
+        return None
+
+    elem_per_chunk = max(1, int(max_chunk_kb * elem_per_kb))
+    if access_pattern == "default":
+        (row_chunk, col_chunk) = set_data_matrix_chunk_size(df_shape, max_chunk_kb, elem_per_kb)
+    elif access_pattern == "by-sample":
+        # a chunk covers one sample and as many rows as fit
+        col_chunk = 1
+        row_chunk = min(n_rows, elem_per_chunk)
+    elif access_pattern == "by-cpg":
+        # a chunk covers as many samples as fit (ideally all) for few rows
+        col_chunk = min(n_cols, elem_per_chunk)
+        row_chunk = min(n_rows, elem_per_chunk // col_chunk)
+    else:
+        # roughly square chunks
+        side = int(numpy.sqrt(elem_per_chunk))
+        row_chunk = min(n_rows, side)
+        col_chunk = min(n_cols, elem_per_chunk // row_chunk)
+    return (1, max(1, int(col_chunk)), max(1, int(row_chunk)))
+
+
+def create_data_matrix(hdf5_out, data_shape, matrix_dtype, chunks, data_compression, gzip_compression_level,
+    data_shuffle, access_pattern, data=None, maxshape=None, node=data_matrix_node):
+    """
+    Creates the data matrix dataset with the requested storage layout and records
+    the access pattern it was laid out for as an attribute of the dataset.
+
+    Input:
+        - hdf5_out (h5py): open hdf5 file to write to
+        - data_shape (tuple): (2, ncol, nrow)
+        - matrix_dtype (numpy dtype): storage data type for data matrix
+        - chunks (tuple or None): chunk shape; None for contiguous storage
+        - data_compression (str or None): "gzip", "lzf" or None
+        - gzip_compression_level (int): gzip level, used with data_compression="gzip"
+        - data_shuffle (bool): whether to apply the shuffle filter
+        - access_pattern (str): recorded as the access_pattern attribute
+        - data (numpy array, optional): values to write
+        - maxshape (tuple, optional): maximum shape, with None for axes that can be resized
+        - node (str, optional): path of the dataset; cov_matrix_node creates the integer coverage
+            dataset, whose fill value is the missing value sentinel
+    Returns:
+        data_dset (h5py dataset)
+    """
+    if data_compression not in ["gzip", "lzf", None]:
+        msg = "Invalid data_compression: {}; must be 'gzip', 'lzf' or None".format(data_compression)
+        logger.error(msg)
+        raise Exception("write_gctx.create_data_matrix " + msg)
+
+    # filters require chunked storage
+    if chunks is None:
+        (data_compression, data_shuffle) = (None, False)
+
+    fillvalue = None
+    if node == cov_matrix_node:
+        fillvalue = numpy.iinfo(matrix_dtype).max
+
+    data_dset = hdf5_out.create_dataset(node, shape=data_shape, dtype=matrix_dtype, data=data,
+        chunks=chunks, maxshape=maxshape, compression=data_compression,
+        compression_opts=gzip_compression_level if data_compression == "gzip" else None,
+        shuffle=data_shuffle if data_compression is not None else False, fillvalue=fillvalue)
+    data_dset.attrs[access_pattern_attr] = numpy.string_(access_pattern)
+    if node == cov_matrix_node:
+        data_dset.attrs[cov_missing_attr] = fillvalue
+    return data_dset
+
+
+def check_cov_dtype(cov_dtype):
+    """
+    Checks that cov_dtype can be used to store coverage as integers.
+
+    Input:
+        - cov_dtype (numpy dtype): requested coverage storage type
+    """
+    if cov_dtype not in cov_dtypes:
+        msg = "Invalid cov_dtype: {}; must be one of {} or None".format(cov_dtype, cov_dtypes)
+        logger.error(msg)
+        raise Exception("write_gctx.check_cov_dtype " + msg)
+
+
+def encode_coverage(cov_values, cov_dtype):
+    """
+    Converts coverage values to cov_dtype, storing NaN as the largest value of
+    cov_dtype (the missing value sentinel).
+
+    Input:
+        - cov_values (numpy array): coverage values; non-negative integers or NaN
+        - cov_dtype (numpy dtype): numpy.uint16 or numpy.uint32
+    Returns:
+        encoded (numpy array of cov_dtype)
+    """
+    sentinel = numpy.iinfo(cov_dtype).max
+    cov_values = numpy.asarray(cov_values)
+    missing = numpy.isnan(cov_values) if cov_values.dtype.kind == "f" else numpy.zeros(cov_values.shape, bool)
+    present = cov_values[~missing]
+    msg = None
+    if numpy.any(present != numpy.floor(present)):
+        msg = "coverage must hold integers to be stored as {}".format(numpy.dtype(cov_dtype).name)
+    elif present.size and (present.min() < 0 or present.max() >= sentinel):
+        msg = "coverage must be between 0 and {} to be stored as {}; found values between {} and {}".format(
+            sentinel - 1, numpy.dtype(cov_dtype).name, present.min(), present.max())
+    if msg is not None:
+        logger.error(msg)
+        raise Exception("write_gctx.encode_coverage " + msg)
+
+    encoded = numpy.where(missing, 0, cov_values).astype(cov_dtype)
+    encoded[missing] = sentinel
+    return encoded
+
+
+def write_lazy_data_matrix(data_dset, gctoo_object, cov_dset=None):
+    """
+    Writes the data matrix of a LazyGCToo one block at a time, so that at most
+    lazy_write_block_kb of data is materialized at once (see get_lazy_write_blocks).
+
+    Input:
+        - data_dset (h5py dataset): data matrix created by create_data_matrix
+        - gctoo_object (LazyGCToo): lazy GCToo instance to be written
+        - cov_dset (h5py dataset or None): integer coverage dataset; None if coverage
+            is the second plane of data_dset
+    """
+    (n_rows, n_cols) = gctoo_object.meth_df.shape
+    (block_rows, block_cols) = get_lazy_write_blocks(n_rows, n_cols, data_dset.chunks)
+    for c_start in range(0, n_cols, block_cols):
+        c_stop = min(c_start + block_cols, n_cols)
+        for r_start in range(0, n_rows, block_rows):
+            r_stop = min(r_start + block_rows, n_rows)
+            (meth_block, cov_block) = lazy_gctoo.read_planes(
+                gctoo_object.meth_df.iloc[r_start:r_stop, c_start:c_stop],
+                gctoo_object.cov_df.iloc[r_start:r_stop, c_start:c_stop])
+            data_dset[0, c_start:c_stop, r_start:r_stop] = meth_block.values.transpose()
+            if cov_dset is None:
+                data_dset[1, c_start:c_stop, r_start:r_stop] = cov_block.values.transpose()
+            else:
+                cov_dset[0, c_start:c_stop, r_start:r_stop] = encode_coverage(
+                    cov_block.values.transpose(), cov_dset.dtype.type)
+
+
+def get_lazy_write_blocks(n_rows, n_cols, chunks):
+    """
+    Shape of the blocks write_lazy_data_matrix materializes: as many whole chunks as fit
+    in lazy_write_block_kb (both planes), so each chunk is compressed once. Blocks span
+    all rows when whole columns of chunks fit, and are split along rows otherwise; if a
+    single chunk does not fit, blocks are cut to the budget regardless of chunks.
+
+    Input:
+        - n_rows (int)
+        - n_cols (int)
+        - chunks (tuple or None): chunk shape of the (planes, ncol, nrow) data matrix
+    Output:
+        - block_rows (int)
+        - block_cols (int)
+    """
+    budget = max(1, (lazy_write_block_kb * 1024) // (2 * numpy.dtype(numpy.float32).itemsize))
+    n_rows = max(n_rows, 1)
+    (chunk_cols, chunk_rows) = (1, 1) if chunks is None else (chunks[1], chunks[2])
+    if budget >= chunk_cols * n_rows:
+        block_cols = (budget // n_rows // chunk_cols) * chunk_cols
+        return n_rows, max(block_cols, 1)
+    if budget >= chunk_cols * chunk_rows:
+        return (budget // chunk_cols // chunk_rows) * chunk_rows, chunk_cols
+    block_cols = min(chunk_cols, budget)
+    return max(1, budget // block_cols), block_cols
+
+
+def write_data_matrix_parallel(data_dset, plane_values, gzip_compression_level, n_threads):
+    """
+    Fills a chunked, gzip compressed data matrix by compressing chunks in a thread
+    pool (zlib releases the GIL) and writing them with write_direct_chunk. The chunks
+    are the same byte streams HDF5's shuffle and gzip filters produce, so the file
+    is readable by any HDF5 reader.
+
+    Input:
+        - data_dset (h5py dataset): data matrix created by create_data_matrix with gzip compression
+        - plane_values (list of numpy arrays): one (ncol, nrow) array per plane of data_dset
+        - gzip_compression_level (int): gzip level, 0-9
+        - n_threads (int): number of compression threads
+    """
+    (n_cols, n_rows) = plane_values[0].shape
+    chunks = data_dset.chunks
+    matrix_dtype = data_dset.dtype
+
+    def compress_chunk(origin):
+        (plane, c_start, r_start) = origin
+        values = plane_values[plane][c_start:c_start + chunks[1], r_start:r_start + chunks[2]]
+        # edge chunks are padded to the full chunk shape, as HDF5 does
+        chunk = numpy.zeros(chunks[1:], dtype=matrix_dtype)
+        chunk[:values.shape[0], :values.shape[1]] = values
+        chunk_bytes = chunk.tobytes()
+        if data_dset.shuffle:
+            chunk_bytes = numpy.frombuffer(chunk_bytes, dtype=numpy.uint8).reshape(
+                (chunk.size, matrix_dtype.itemsize)).T.tobytes()
+        return zlib.compress(chunk_bytes, gzip_compression_level)
+
+    origins = [(plane, c_start, r_start) for plane in range(len(plane_values))
+               for c_start in range(0, n_cols, chunks[1])
+               for r_start in range(0, n_rows, chunks[2])]
+
+    # compress a bounded batch at a time so compressed chunks don't pile up in memory
+    batch_size = 4 * n_threads
+    with concurrent.futures.ThreadPoolExecutor(max_workers=n_threads) as executor:
+        for batch_start in range(0, len(origins), batch_size):
+            batch = origins[batch_start:batch_start + batch_size]
+            for (origin, compressed) in zip(batch, executor.map(compress_chunk, batch)):
+                data_dset.id.write_direct_chunk(origin, compressed)
+
+
+def write_metadata(hdf5_out, dim, metadata_df, convert_back_to_neg_666=False, gzip_compression=0,
+    categorical_fields=None):
     """
 	Writes either column or row metadata to proper node of gctx out (hdf5) file.
 
@@ -152,6 +455,8 @@ def write_metadata(hdf5_out, dim, metadata_df, convert_back_to_neg_666=False, gz
 		- metadata_df (pandas DataFrame): metadata DataFrame to write to file 
 		- convert_back_to_neg_666 (bool): Whether to convert numpy.nans back to "-666",
 				as per CMap metadata null convention 
+		- categorical_fields (list of str, "auto" or None): fields to store dictionary encoded;
+				see write
 	"""
     if dim == "col":
         hdf5_out.create_group(col_meta_group_node)
@@ -173,8 +478,15 @@ def write_metadata(hdf5_out, dim, metadata_df, convert_back_to_neg_666=False, gz
         for c in metadata_fields:
             metadata_df[[c]] = metadata_df[[c]].replace([numpy.nan], ["-666"])
 
+    encoded_fields = get_categorical_fields(metadata_df, categorical_fields)
+
     # write metadata columns to their own arrays
     for field in [entry for entry in metadata_fields if entry != "ind"]:
+        if field in encoded_fields:
+            write_categorical_field(hdf5_out, dim, field, metadata_df.loc[:, field], gzip_compression,
+                convert_back_to_neg_666)
+            continue
+
         if numpy.array(metadata_df.loc[:, field]).dtype.type in (numpy.str_, numpy.object_):
             array_write = numpy.array(metadata_df.loc[:, field]).astype('S')
         else:
@@ -183,3 +495,67 @@ def write_metadata(hdf5_out, dim, metadata_df, convert_back_to_neg_666=False, gz
                                 data=array_write,
                                 compression=gzip_compression)
 
+
+def get_categorical_fields(metadata_df, categorical_fields):
+    """
+    Resolves which metadata fields to store dictionary encoded.
+
+    Input:
+        - metadata_df (pandas DataFrame): metadata to be written
+        - categorical_fields (list of str, "auto" or None): requested fields
+    Returns:
+        encoded_fields (set of str)
+    """
+    if categorical_fields is None:
+        return set()
+
+    if categorical_fields != "auto":
+        # fields missing from this dimension's metadata are simply not there to encode
+        return set(categorical_fields) & set(metadata_df.columns)
+
+    encoded_fields = set()
+    n_rows = metadata_df.shape[0]
+    for field in metadata_df.columns:
+        values = metadata_df[field]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            encoded_fields.add(field)
+        elif values.dtype == object and values.nunique(dropna=False) <= auto_categorical_max_fraction * n_rows:
+            encoded_fields.add(field)
+    return encoded_fields
+
+
+def write_categorical_field(hdf5_out, dim, field, values, gzip_compression, convert_back_to_neg_666=False):
+    """
+    Writes one metadata field dictionary encoded: the field's dataset holds integer
+    codes (-1 for missing values) and carries an encoding attribute, plus a
+    reference to a dataset of the distinct values, stored as strings.
+
+    Input:
+        - hdf5_out (h5py): open hdf5 file to write to
+        - dim (str): "row" or "col"
+        - field (str): name of the field
+        - values (pandas Series): values of the field
+        - gzip_compression (int): gzip level
+        - convert_back_to_neg_666 (bool): whether to store missing values as "-666"
+    """
+    categorical = pd.Categorical(values)
+    if convert_back_to_neg_666 and (categorical.codes < 0).any():
+        if "-666" not in categorical.categories:
+            categorical = categorical.add_categories("-666")
+        categorical = categorical.fillna("-666")
+    categories = numpy.array([str(x) for x in categorical.categories]).astype("S")
+    n_categories = len(categories)
+    if n_categories < numpy.iinfo(numpy.int8).max:
+        codes_dtype = numpy.int8
+    elif n_categories < numpy.iinfo(numpy.int16).max:
+        codes_dtype = numpy.int16
+    else:
+        codes_dtype = numpy.int32
+
+    categories_dset = hdf5_out.create_dataset(categories_group_nodes[dim] + "/" + field, data=categories,
+        compression=gzip_compression)
+    meta_node = row_meta_group_node if dim == "row" else col_meta_group_node
+    codes_dset = hdf5_out.create_dataset(meta_node + "/" + field, data=categorical.codes.astype(codes_dtype),
+        compression=gzip_compression)
+    codes_dset.attrs[encoding_attr] = categorical_encoding
+    codes_dset.attrs[categories_attr] = categories_dset.ref
@@ -0,0 +1,56 @@
+# Times writing the bottom half (rids, row metadata and data) of a wide methylation GCT: the pandas to_csv
+# path (write_gct.write_bottom_half_block, which formatted the whole matrix at once) against the streaming
+# path (write_gct.write_bottom_half, which formats blocks of rows with write_gct.format_data_block).
+# A synthetic float32 matrix (n_rows CpGs x n_cols samples, with missing values) is made first; set
+# '/path/to/scratch/dir' to a local disk with enough space (~9 * n_rows * n_cols bytes per output file).
+# Cache was cleared in between consecutive operations.
+
+import os
+import time
+import filecmp
+import numpy as np
+import pandas as pd
+import cmapPy.pandasGEXpress.write_gct as write_gct
+
+# for storing timing results
+write_times = {}
+
+# size of the synthetic matrix, fraction of missing values and formats to test
+n_rows = 200000
+n_cols = 200
+missing_fraction = 0.05
+float_formats = ["%.4f", "%.2f"]
+
+scratch_dir = "/path/to/scratch/dir"
+
+# make synthetic data: methylation percentages with NaNs, and minimal row metadata
+rng = np.random.RandomState(0)
+cov = rng.poisson(20, size=(n_rows, n_cols))
+meth = (100 * rng.binomial(cov, 0.7) / np.maximum(cov, 1)).astype(np.float32)
+meth[rng.rand(n_rows, n_cols) < missing_fraction] = np.nan
+rids = pd.Index(["cg" + str(i) for i in range(n_rows)], name="rid")
+data_df = pd.DataFrame(meth, index=rids, columns=pd.Index(["s" + str(i) for i in range(n_cols)], name="cid"))
+row_metadata_df = pd.DataFrame({"chr": ["chr1"] * n_rows, "pos": np.arange(n_rows)}, index=rids)
+
+writers = {"to_csv": write_gct.write_bottom_half_block, "streaming": write_gct.write_bottom_half}
+for data_float_format in float_formats:
+	out_fnames = {}
+	for (name, writer) in writers.items():
+		out_fnames[name] = os.path.join(scratch_dir, "gct_write_test_{}_n{}x{}.gct".format(name, n_cols, n_rows))
+		start = time.time()
+		with open(out_fnames[name], "w") as f:
+			writer(f, row_metadata_df, data_df, "NaN", data_float_format, "-666")
+		end = time.time()
+		write_times[(data_float_format, name)] = end - start
+
+	# both paths must write the same text
+	assert filecmp.cmp(out_fnames["to_csv"], out_fnames["streaming"], shallow=False)
+	for out_fname in out_fnames.values():
+		os.remove(out_fname)
+
+# write results to file
+write_time_series = pd.Series(write_times)
+write_time_series.index.names = ["data_float_format", "writer"]
+write_time_df = write_time_series.unstack("writer")
+write_time_df["speedup"] = write_time_df["to_csv"] / write_time_df["streaming"]
+write_time_df.to_csv("python_gct_write_results.txt", sep="\t")
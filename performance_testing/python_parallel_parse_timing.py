@@ -0,0 +1,54 @@
+# Times parse_gctx.parse on a gzip-compressed, chunked GCTX for increasing values of n_threads.
+# A synthetic methylation GCTX (n_rows CpGs x n_cols samples, both planes) is written first; set
+# '/path/to/scratch/dir' to a local disk with enough space (~2 * n_rows * n_cols * 4 bytes before compression).
+# Cache was cleared in between consecutive operations.
+
+import os
+import time
+import numpy as np
+import pandas as pd
+import h5py
+import cmapPy.pandasGEXpress.parse_gctx as parse_gctx
+import cmapPy.pandasGEXpress.write_gctx as write_gctx
+
+# for storing timing results
+parse_times = {}
+
+# size of the synthetic file and thread counts to test
+n_rows = 2000000
+n_cols = 200
+thread_counts = [1, 2, 4, 8, 16, 32, 64]
+
+out_fname = os.path.join("/path/to/scratch/dir", "parallel_parse_test_n{}x{}.gctx".format(n_cols, n_rows))
+
+# write synthetic file: data matrix chunked and gzip compressed, minimal metadata
+rng = np.random.RandomState(0)
+hdf5_out = h5py.File(out_fname, "w")
+hdf5_out.attrs[write_gctx.version_attr] = np.string_(write_gctx.version_number)
+data_dset = hdf5_out.create_dataset(write_gctx.data_matrix_node, shape=(2, n_cols, n_rows), dtype=np.float32,
+                                    chunks=(1, n_cols, 1000), compression="gzip", shuffle=True)
+for start in range(0, n_rows, 100000):
+	stop = min(start + 100000, n_rows)
+	cov = rng.poisson(20, size=(n_cols, stop - start)).astype(np.float32)
+	meth = np.round(100 * rng.binomial(cov.astype(int), 0.7) / np.maximum(cov, 1), 2)
+	data_dset[0, :, start:stop] = meth
+	data_dset[1, :, start:stop] = cov
+hdf5_out.create_dataset(write_gctx.row_meta_group_node + "/id", data=np.array(["cg" + str(i) for i in range(n_rows)], dtype="S"))
+hdf5_out.create_dataset(write_gctx.col_meta_group_node + "/id", data=np.array(["s" + str(i) for i in range(n_cols)], dtype="S"))
+hdf5_out.close()
+
+for n_threads in thread_counts:
+	start = time.time()
+	in_gctoo = parse_gctx.parse(out_fname, n_threads=n_threads)
+	end = time.time()
+	elapsed_time = end - start
+	parse_times[n_threads] = elapsed_time
+	del in_gctoo
+
+os.remove(out_fname)
+
+# write results to file
+parse_time_series = pd.Series(parse_times)
+parse_time_series.index.name = "n_threads"
+speedup_df = pd.DataFrame({"parse_time": parse_time_series, "speedup": parse_time_series[1] / parse_time_series})
+speedup_df.to_csv("python_parallel_parsing_results.txt", sep="\t")
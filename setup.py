@@ -85,7 +85,9 @@ setup(
     entry_points={'console_scripts': ['gctx2gct=cmapPy.pandasGEXpress.gctx2gct:main', 
         'gct2gctx=cmapPy.pandasGEXpress.gct2gctx:main', 
         'concat=cmapPy.pandasGEXpress.concat:main', 
-        'subset=cmapPy.pandasGEXpress.subset:main',]},
+        'subset=cmapPy.pandasGEXpress.subset:main', 
+        'index_gctx=cmapPy.pandasGEXpress.index_gctx:main',
+        'virtual_gctx=cmapPy.pandasGEXpress.virtual_gctx:main',]},
 
     tests_require=['unittest']
 )